@@ -1,34 +1,18 @@
-const STORAGE_KEY_PRINTERS = "pm_printers";
-const PRINTERS_STORAGE_KEY = "moonrakerPrinters";
-const STORAGE_KEY_JOB_TRACKING = "pm_job_tracking";
-const TIMELINE_REFRESH_MS = 60000;
+const API_URL = (window.PM_API_URL || "/api").replace(/\/$/, "");
+const STORAGE_KEY_TOKEN = "pm_token";
+const SOCKET_RETRY_MS = 3000;
 const TIMELINE_SECONDS_RANGE = 24 * 3600;
 const TIMELINE_MIN_JOB_WIDTH = 12;
-
-const defaultPrinters = [
-  { name: "Bambu X1", type: "CoreXY", status: "Printing", job: "Drone Arm", progress: 62, url: "" },
-  { name: "Voron 2.4", type: "CoreXY", status: "Online", job: "-", progress: 30, url: "" },
-  { name: "Prusa MK4", type: "Bedslinger", status: "Idle", job: "Spool Bracket", progress: 48, url: "" },
-  { name: "Form 3", type: "SLA", status: "Paused", job: "Dental Model", progress: 52, url: "" },
-  { name: "Anycubic Kobra", type: "Bedslinger", status: "Offline", job: "-", progress: 0, url: "" },
-  { name: "Bambu P1P", type: "CoreXY", status: "Printing", job: "Case Raspberry", progress: 74, url: "" },
-];
+const RUNNING_STATES = ["printing", "paused"];
+// Pages that show printer state; the others never open the timeline feed
+const FEED_SELECTORS = "#printers-grid, #timeline-rows, #prints-table-body, [data-printer-cards], [data-overview-active]";
 
 let printers = [];
-let timelineRefreshIntervalId = null;
-
-function loadJobTracking() {
-  try {
-    const raw = localStorage.getItem(STORAGE_KEY_JOB_TRACKING);
-    return raw ? JSON.parse(raw) : {};
-  } catch {
-    return {};
-  }
-}
-
-function saveJobTracking(data) {
-  localStorage.setItem(STORAGE_KEY_JOB_TRACKING, JSON.stringify(data));
-}
+let timelineItems = [];
+let loginPromise = null;
+const timelineListeners = [];
+// printer id -> { filename, promise }: metadata is fetched again only when the file changes
+const metadataCache = new Map();
 
 const jobs = [
   { code: "A1", name: "Case Raspberry", printer: "Bambu X1", material: "PETG", status: "Printing", remaining: "01h 25m" },
@@ -112,222 +96,163 @@ function getLayerLabel(displayStatus = {}) {
   return "N/A";
 }
 
-function computeLayerInfo(currentZ, layerHeight, objectHeight, fallbackLabel = "N/A") {
-  const validLayerHeight = Number.isFinite(layerHeight) && layerHeight > 0;
-  const validObjectHeight = Number.isFinite(objectHeight) && objectHeight > 0;
-  const totalLayers = validLayerHeight && validObjectHeight ? Math.round(objectHeight / layerHeight) : null;
-  const currentLayer =
-    validLayerHeight && Number.isFinite(currentZ) ? Math.max(1, Math.round(currentZ / layerHeight)) : null;
-
-  if (Number.isFinite(currentLayer) && Number.isFinite(totalLayers)) {
-    return `${currentLayer} / ${totalLayers}`;
-  }
-
-  return fallbackLabel || "N/A";
+function normalizeUrl(url) {
+  return url.trim().replace(/\/$/, "");
 }
 
-function estimateRemaining(printDuration, progress) {
-  if (!Number.isFinite(printDuration) || !Number.isFinite(progress) || progress <= 0) return null;
-  const remaining = printDuration * (1 / progress - 1);
-  return remaining >= 0 ? remaining : null;
+function parseUtc(value) {
+  // The API sends naive UTC datetimes
+  if (!value) return null;
+  const time = Date.parse(/(Z|[+-]\d\d:\d\d)$/.test(value) ? value : `${value}Z`);
+  return Number.isFinite(time) ? time / 1000 : null;
+}
+
+async function login() {
+  if (!loginPromise) {
+    loginPromise = (async () => {
+      const username = window.prompt("E-mail");
+      const password = username ? window.prompt("Senha") : null;
+      if (!username || !password) throw new Error("Login cancelado");
+      const response = await fetch(`${API_URL}/auth/login`, {
+        method: "POST",
+        body: new URLSearchParams({ username, password }),
+      });
+      if (!response.ok) throw new Error("Falha no login");
+      const { access_token: token } = await response.json();
+      localStorage.setItem(STORAGE_KEY_TOKEN, token);
+      return token;
+    })().finally(() => {
+      loginPromise = null;
+    });
+  }
+  return loginPromise;
 }
 
-function loadPrinters() {
-  const parseList = (raw) => {
-    if (!raw) return null;
-    try {
-      const parsed = JSON.parse(raw);
-      return Array.isArray(parsed) ? parsed : null;
-    } catch (error) {
-      console.error("Erro ao ler impressoras salvas", error);
-      return null;
-    }
-  };
-
-  const stored = parseList(localStorage.getItem(STORAGE_KEY_PRINTERS));
-  if (stored) return stored;
+async function apiFetch(path, options = {}) {
+  const send = (token) =>
+    fetch(`${API_URL}${path}`, {
+      ...options,
+      headers: { ...options.headers, Authorization: `Bearer ${token}` },
+    });
 
-  const legacy = parseList(localStorage.getItem(PRINTERS_STORAGE_KEY));
-  if (legacy) {
-    savePrinters(legacy);
-    return legacy;
+  let response = await send(localStorage.getItem(STORAGE_KEY_TOKEN) || (await login()));
+  if (response.status === 401) {
+    localStorage.removeItem(STORAGE_KEY_TOKEN);
+    response = await send(await login());
   }
-
-  savePrinters(defaultPrinters);
-  return [...defaultPrinters];
+  if (!response.ok) throw new Error(`Falha em ${path} (${response.status})`);
+  return response.status === 204 ? null : response.json();
 }
 
-function savePrinters(list) {
-  localStorage.setItem(STORAGE_KEY_PRINTERS, JSON.stringify(list));
-  localStorage.setItem(PRINTERS_STORAGE_KEY, JSON.stringify(list));
+function sortJobs(list) {
+  return [...list].sort((a, b) => {
+    if (!a.start_time || !b.start_time) return a.start_time ? -1 : b.start_time ? 1 : 0;
+    return b.start_time.localeCompare(a.start_time);
+  });
 }
 
-function normalizeUrl(url) {
-  return url.trim().replace(/\/$/, "");
+function applyTimelineEvent(items, event) {
+  switch (event.type) {
+    case "printer_added":
+      return [...items, { ...event.printer, jobs: [] }].sort((a, b) => a.id - b.id);
+    case "printer_changed":
+      return items.map((p) => (p.id === event.printer.id ? { ...p, ...event.printer } : p));
+    case "printer_removed":
+      return items.filter((p) => p.id !== event.printer_id);
+    case "job_added":
+    case "job_changed":
+      return items.map((p) => {
+        const printerJobs = (p.jobs || []).filter((job) => job.id !== event.job.id);
+        if (p.id === event.printer_id) return { ...p, jobs: sortJobs([...printerJobs, event.job]) };
+        if (p.id === event.previous_printer_id) return { ...p, jobs: printerJobs };
+        return p;
+      });
+    case "job_removed":
+      return items.map((p) =>
+        p.id === event.printer_id ? { ...p, jobs: (p.jobs || []).filter((job) => job.id !== event.job_id) } : p
+      );
+    case "etas":
+      return items.map((p) => ({
+        ...p,
+        jobs: (p.jobs || []).map((job) => (job.id in event.etas ? { ...job, eta: event.etas[job.id] } : job)),
+      }));
+    default:
+      return items;
+  }
 }
 
-function resolvePrinterId(printer, index) {
-  return printer.id || printer.url || printer.name || String(index);
+function runningJob(item) {
+  return (item.jobs || []).find((job) => RUNNING_STATES.includes(job.status)) || null;
 }
 
-async function fetchTimelineDataForPrinter(printer, index, jobTracking, nowSecs) {
-  const printerId = resolvePrinterId(printer, index);
-  const baseUrl = normalizeUrl(printer.url || "");
-  const timelinePrinter = {
-    id: printerId,
-    name: printer.name || printerId,
-    moonrakerUrl: baseUrl,
-    isOnline: false,
-    state: (printer.status || "standby").toLowerCase(),
-    job: null,
-    jobs: [],
+function toDashboardPrinter(item) {
+  const job = runningJob(item);
+  const nowSecs = Date.now() / 1000;
+  const startTimestamp = parseUtc(job?.start_time);
+  const etaTimestamp = parseUtc(job?.eta);
+  return {
+    id: item.id,
+    name: item.name,
+    url: item.moonraker_url,
+    status: item.status,
+    filename: item.filename || null,
+    job: item.filename || job?.filename || "-",
+    progress: Number.isFinite(item.progress) ? Math.round(item.progress * 100) : 0,
+    printDuration: startTimestamp ? nowSecs - startTimestamp : null,
+    remainingDuration: etaTimestamp ? Math.max(etaTimestamp - nowSecs, 0) : null,
+    layerInfo: getLayerLabel(item),
   };
+}
 
-  if (!baseUrl) {
-    timelinePrinter.state = "offline";
-    return { printer, data: timelinePrinter, error: null, trackingUpdated: false };
-  }
+function setTimelineItems(items) {
+  timelineItems = items;
+  printers = items.map(toDashboardPrinter);
+  timelineListeners.forEach((listener) => listener());
+}
 
-  try {
-    const resp = await fetch(
-      `${baseUrl}/printer/objects/query?print_stats&display_status`
-    );
-    if (!resp.ok) throw new Error("Falha ao consultar status da impressora");
-
-    const payload = await resp.json();
-    const status = payload.result?.status || {};
-    const printStats = status.print_stats || {};
-    const displayStatus = status.display_status || {};
-
-    const state = printStats.state;
-    const filename = printStats.filename;
-    const elapsed = Number(printStats.print_duration) || 0;
-
-    let totalTime = null;
-    let slicerTime = null;
-    let material = null;
-
-    if (filename) {
-      try {
-        const metaResp = await fetch(
-          `${baseUrl}/server/files/metadata?filename=${encodeURIComponent(filename)}`
-        );
-        if (metaResp.ok) {
-          const meta = (await metaResp.json()).result || {};
-          totalTime = meta.total_duration ?? meta.total_time ?? meta.print_duration ?? null;
-          slicerTime = meta.slicer_time ?? meta.estimated_time ?? meta.slicer_estimated_time ?? null;
-          material = meta.filament_name ?? meta.material ?? null;
-
-          totalTime = Number.isFinite(Number(totalTime)) ? Number(totalTime) : null;
-          slicerTime = Number.isFinite(Number(slicerTime)) ? Number(slicerTime) : null;
-        }
-      } catch (metaError) {
-        console.error("Erro ao buscar metadata da impressora", printer.name, metaError);
-      }
-    }
+function onTimelineChange(listener) {
+  timelineListeners.push(listener);
+}
 
-    const progressFromStats =
-      typeof printStats.progress === "number" ? printStats.progress : null;
-    const displayProgress =
-      typeof displayStatus.progress === "number"
-        ? displayStatus.progress
-        : Number(displayStatus.progress);
-
-    let progress = null;
-    if (Number.isFinite(progressFromStats)) {
-      progress = progressFromStats;
-    } else if (Number.isFinite(displayProgress)) {
-      progress = displayProgress;
-    } else if (totalTime && elapsed >= 0) {
-      progress = Math.min(elapsed / totalTime, 1);
-    }
+function timelineSocketUrl(query) {
+  const url = new URL(`${API_URL}/ws/timeline${query}`, window.location.href);
+  url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
+  return url.href;
+}
 
-    const jobKey = `${printerId}::${filename || "sem_nome"}`;
-    const lowerState = (state || "").toLowerCase();
+// One socket to the backend replaces polling every printer from every browser:
+// a snapshot on connect, then the events since the last seq of the same epoch.
+function connectTimelineFeed() {
+  let cursor = null;
+  let resyncing = false;
 
-    let trackingUpdated = false;
-    let startTimestamp = null;
-    if (lowerState === "printing") {
-      if (jobTracking[jobKey]?.startTimestamp) {
-        startTimestamp = jobTracking[jobKey].startTimestamp;
+  const connect = () => {
+    const query = cursor ? `?since=${cursor.seq}&epoch=${cursor.epoch}` : "";
+    const socket = new WebSocket(timelineSocketUrl(query));
+    socket.onmessage = (message) => {
+      const data = JSON.parse(message.data);
+      if (data.type === "snapshot") {
+        resyncing = false;
+        setTimelineItems(data.items);
+      } else if (resyncing) {
+        return;
+      } else if (cursor && data.epoch === cursor.epoch && data.seq === cursor.seq + 1) {
+        setTimelineItems(applyTimelineEvent(timelineItems, data));
       } else {
-        startTimestamp = nowSecs - elapsed;
-        jobTracking[jobKey] = { startTimestamp };
-        trackingUpdated = true;
-      }
-    } else if (lowerState === "complete" || lowerState === "completed") {
-      if (jobTracking[jobKey]?.startTimestamp) {
-        startTimestamp = jobTracking[jobKey].startTimestamp;
-      } else if (Number.isFinite(totalTime)) {
-        startTimestamp = nowSecs - totalTime;
+        resyncing = true;
+        socket.send(JSON.stringify({ action: "snapshot" }));
+        return;
       }
-    }
-
-    const duration = totalTime || slicerTime || elapsed || null;
-    const endTimestamp = startTimestamp && duration ? startTimestamp + duration : null;
-
-    const job = {
-      printerId,
-      printerName: printer.name,
-      state,
-      filename,
-      material,
-      elapsed,
-      totalTime,
-      slicerTime,
-      startTimestamp,
-      endTimestamp,
-      progress: Number.isFinite(progress) ? progress : null,
+      cursor = { seq: data.seq, epoch: data.epoch };
     };
+    socket.onclose = () => setTimeout(connect, SOCKET_RETRY_MS);
+  };
 
-    timelinePrinter.isOnline = true;
-    timelinePrinter.state = (state || "standby").toLowerCase();
-    timelinePrinter.job = job;
-    timelinePrinter.jobs = job ? [job] : [];
-
-    return { printer, data: timelinePrinter, error: null, trackingUpdated };
-  } catch (error) {
-    console.error("Erro ao coletar job da impressora", printer.name, error);
-    timelinePrinter.isOnline = false;
-    timelinePrinter.state = "offline";
-    timelinePrinter.job = null;
-    timelinePrinter.jobs = [];
-    return { printer, data: timelinePrinter, error, trackingUpdated: false };
-  }
+  connect();
 }
 
-async function coletarJobsDasImpressoras() {
-  const storedPrinters = loadPrinters();
-  const jobTracking = loadJobTracking();
-  const nowSecs = Date.now() / 1000;
-  let trackingUpdated = false;
-
-  const results = await Promise.all(
-    storedPrinters.map((printer, index) =>
-      fetchTimelineDataForPrinter(printer, index, jobTracking, nowSecs)
-    )
-  );
-
-  const jobs = [];
-  const timelinePrinters = [];
-
-  results.forEach((result) => {
-    if (result?.trackingUpdated) {
-      trackingUpdated = true;
-    }
-    if (result?.data) {
-      timelinePrinters.push(result.data);
-      if (result.data.job) {
-        jobs.push(result.data.job);
-      }
-    }
-  });
-
-  if (trackingUpdated) {
-    saveJobTracking(jobTracking);
-  }
-
-  return { jobs, timelinePrinters };
+function collectJobs() {
+  return timelineItems.flatMap((item) => (item.jobs || []).map((job) => ({ ...job, printerName: item.name })));
 }
 
 function setPreviewVisibility(imgEl, placeholderEl, previewUrl) {
@@ -349,89 +274,47 @@ function setPreviewVisibility(imgEl, placeholderEl, previewUrl) {
   }
 }
 
-function addPrinter(name, url) {
+async function addPrinter(name, url) {
   const trimmedName = name.trim();
   const trimmedUrl = normalizeUrl(url);
 
   if (!trimmedName || !trimmedUrl) return;
 
-  printers.push({
-    name: trimmedName,
-    url: trimmedUrl,
-    status: "Desconhecido",
-    type: "Moonraker",
-    job: "-",
-    progress: 0,
-  });
-  savePrinters(printers);
-  renderPrintersCards();
-  renderPrinters();
-}
-
-function removePrinter(index) {
-  printers.splice(index, 1);
-  savePrinters(printers);
-  renderPrintersCards();
-  renderPrinters();
+  // The feed delivers printer_added; no local copy to keep in sync
+  try {
+    await apiFetch("/printers/", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ name: trimmedName, moonraker_url: trimmedUrl }),
+    });
+  } catch (error) {
+    console.error("Erro ao cadastrar impressora", error);
+  }
 }
 
-async function fetchMoonrakerStatus(printer) {
-  const url = normalizeUrl(printer.url || "");
-  if (!url) throw new Error("URL inválida");
-
-  const response = await fetch(`${url}/printer/objects/query?print_stats&display_status&gcode_move`);
-  if (!response.ok) throw new Error("Falha ao consultar Moonraker");
-
-  const payload = await response.json();
-  const status = payload?.result?.status || {};
-  const printStats = status.print_stats || {};
-  const displayStatus = status.display_status || {};
-  const gcodeMove = status.gcode_move || {};
-
-  const currentZ = gcodeMove?.position?.z;
-
-  const state = printStats.state || "Desconhecido";
-  const filename = printStats.filename || "N/A";
-  const progress = Number(displayStatus.progress);
-  const printDuration = Number(printStats.print_duration);
-  const remaining = estimateRemaining(printDuration, progress);
-  const layerLabel = getLayerLabel(displayStatus);
-
-  return {
-    state,
-    filename,
-    printDuration,
-    remaining,
-    progress: Number.isFinite(progress) ? Math.round(progress * 100) : null,
-    layerLabel,
-    displayStatus,
-    currentZ: Number.isFinite(currentZ) ? currentZ : null,
-  };
+async function removePrinter(printerId) {
+  try {
+    await apiFetch(`/printers/${printerId}`, { method: "DELETE" });
+  } catch (error) {
+    console.error("Erro ao remover impressora", error);
+  }
 }
 
 async function fetchMoonrakerMetadata(printer, filename) {
-  const baseUrl = normalizeUrl(printer.url || "");
-  if (!baseUrl || !filename || filename === "N/A") return {};
+  if (!filename) return {};
 
   try {
-    const response = await fetch(
-      `${baseUrl}/server/files/metadata?filename=${encodeURIComponent(filename)}`
+    // Through the backend, which caches metadata and thumbnails for every browser
+    const meta = await apiFetch(
+      `/moonraker/${printer.id}/metadata?filename=${encodeURIComponent(filename)}`
     );
-    if (!response.ok) throw new Error("Falha ao buscar metadata");
-
-    const metadata = await response.json();
-    console.log("Metadata result:", metadata.result);
-    const meta = metadata?.result || {};
     const thumbs = meta.thumbnails;
-    console.log("Thumbnails:", thumbs);
 
     let previewUrl = null;
     if (Array.isArray(thumbs) && thumbs.length > 0) {
-      const baseUrlTrimmed = baseUrl.replace(/\/$/, "");
-      const thumbPath = thumbs[0].relative_path;
-      const fileDir = filename.includes("/") ? filename.substring(0, filename.lastIndexOf("/")) : "";
-      const fullPath = fileDir ? `${fileDir}/${thumbPath}` : thumbPath;
-      previewUrl = `${baseUrlTrimmed}/server/files/${encodeURIComponent(fullPath)}`;
+      // The thumbnail URLs are signed, so <img> loads them without the Authorization header
+      const largest = thumbs.reduce((best, thumb) => ((thumb.width || 0) > (best.width || 0) ? thumb : best));
+      previewUrl = `${API_URL}${largest.url}`;
     }
 
     const slicerTimeRaw = meta.slicer_time ?? meta.estimated_time ?? meta.slicer_estimated_time ?? null;
@@ -478,73 +361,47 @@ function getCardElements(cardElement) {
   };
 }
 
-async function atualizarPrinterMoonraker(printer, cardElement) {
+function printerMetadata(printer) {
+  const cached = metadataCache.get(printer.id);
+  if (cached && cached.filename === printer.filename) return cached.promise;
+  const promise = fetchMoonrakerMetadata(printer, printer.filename);
+  metadataCache.set(printer.id, { filename: printer.filename, promise });
+  // Failed lookups are retried on the next event for the printer
+  promise.then((metadata) => {
+    if (!metadata.meta && metadataCache.get(printer.id)?.promise === promise) metadataCache.delete(printer.id);
+  });
+  return promise;
+}
+
+async function updatePrinterCard(printer, cardElement) {
   const elements = getCardElements(cardElement);
-  if (elements.statusEl) elements.statusEl.textContent = "Testando...";
+  const metadata = await printerMetadata(printer);
+  updatePrinterCardInfo({ ...printer, totalTime: metadata.totalTime, slicerTime: metadata.slicerTime }, elements);
 
-  let previewUrl = printer.previewUrl || null;
-  let updatedPrinter = { ...printer };
+  const previewUrl = metadata.previewUrl || "";
+  if (cardElement.dataset.previewUrl !== previewUrl) {
+    cardElement.dataset.previewUrl = previewUrl;
+    setPreviewVisibility(elements.previewImg, elements.previewPlaceholder, previewUrl || null);
+  }
+}
 
-  try {
-    const data = await fetchMoonrakerStatus(printer);
-    const metadata = await fetchMoonrakerMetadata(printer, data.filename);
-    previewUrl = metadata.previewUrl || null;
-
-    const layerInfo = computeLayerInfo(
-      data.currentZ,
-      metadata.layerHeight,
-      metadata.objectHeight,
-      getLayerLabel(data.displayStatus)
-    );
+async function testarConexaoMoonraker(printerId, cardElement) {
+  const { statusEl } = getCardElements(cardElement);
+  if (statusEl) statusEl.textContent = "Testando...";
 
-    updatedPrinter = {
-      ...printer,
-      status: data.state,
-      job: data.filename,
-      printDuration: data.printDuration,
-      remainingDuration: data.remaining,
-      layerInfo,
-      totalTime: metadata.totalTime,
-      slicerTime: metadata.slicerTime,
-      progress: data.progress ?? printer.progress ?? 0,
-      previewUrl,
-    };
+  let state = null;
+  try {
+    state = (await apiFetch(`/moonraker/sync/${printerId}`)).state;
   } catch (error) {
-    console.error("Erro ao atualizar impressora no Moonraker", error);
-    updatedPrinter = {
-      ...printer,
-      status: "Offline",
-      previewUrl: null,
-    };
-    previewUrl = null;
-  }
-
-  const printerIndex = Number(cardElement?.dataset?.printerId);
-  if (Number.isInteger(printerIndex) && printerIndex >= 0) {
-    printers[printerIndex] = updatedPrinter;
-  } else {
-    const foundIndex = printers.findIndex(
-      (stored) => stored.name === printer.name && stored.url === printer.url
-    );
-    if (foundIndex >= 0) printers[foundIndex] = updatedPrinter;
+    console.error("Erro ao testar conexão com o Moonraker", error);
   }
-
-  updatePrinterCardInfo(updatedPrinter, elements);
-  setPreviewVisibility(elements.previewImg, elements.previewPlaceholder, previewUrl);
-  savePrinters(printers);
-  renderPrinters();
-  renderOverview();
-  renderStats();
+  if (statusEl) statusEl.textContent = state || "Offline";
 }
 
-async function testarConexaoMoonraker(printer, cardElement) {
-  return atualizarPrinterMoonraker(printer, cardElement);
-}
-
-function createPrinterCard(printer, index) {
+function createPrinterCard(printer) {
   const card = document.createElement("article");
   card.className = "printer-card card";
-  card.dataset.printerId = String(index);
+  card.dataset.printerId = String(printer.id);
 
   const name = document.createElement("h2");
   name.className = "printer-card-name";
@@ -612,10 +469,10 @@ function createPrinterCard(printer, index) {
   };
 
   updatePrinterCardInfo(printer, elements);
-  setPreviewVisibility(elements.previewImg, elements.previewPlaceholder, printer.previewUrl);
+  setPreviewVisibility(elements.previewImg, elements.previewPlaceholder, null);
 
-  testButton.addEventListener("click", () => testarConexaoMoonraker(printer, card));
-  removeButton.addEventListener("click", () => removePrinter(index));
+  testButton.addEventListener("click", () => testarConexaoMoonraker(printer.id, card));
+  removeButton.addEventListener("click", () => removePrinter(printer.id));
 
   card.append(name, badge, imageBox, infoBox, footer);
   return card;
@@ -624,9 +481,9 @@ function createPrinterCard(printer, index) {
 function renderPrintersCards() {
   const grid = document.getElementById("printers-grid");
   if (!grid) return;
-  grid.innerHTML = "";
 
   if (!printers.length) {
+    grid.innerHTML = "";
     const empty = document.createElement("p");
     empty.className = "text-muted";
     empty.textContent = "Nenhuma impressora cadastrada.";
@@ -634,30 +491,19 @@ function renderPrintersCards() {
     return;
   }
 
-  printers.forEach((printer, index) => {
-    const card = createPrinterCard(printer, index);
+  // Cards are updated in place so previews are not reloaded on every event
+  grid.querySelectorAll(":scope > :not(.printer-card)").forEach((element) => element.remove());
+  const cards = new Map(
+    [...grid.querySelectorAll(".printer-card")].map((card) => [card.dataset.printerId, card])
+  );
+  printers.forEach((printer) => {
+    const key = String(printer.id);
+    const card = cards.get(key) || createPrinterCard(printer);
+    cards.delete(key);
     grid.appendChild(card);
+    updatePrinterCard(printer, card);
   });
-}
-
-function iniciarAtualizacaoAutomatica(intervalMs = 10000) {
-  const grid = document.getElementById("printers-grid");
-  if (!grid) return;
-
-  const atualizarTodas = () => {
-    printers = loadPrinters();
-    printers.forEach((printer, index) => {
-      const card = document.querySelector(
-        `.printer-card[data-printer-id="${index}"]`
-      );
-      if (card) {
-        atualizarPrinterMoonraker(printer, card);
-      }
-    });
-  };
-
-  atualizarTodas();
-  return setInterval(atualizarTodas, intervalMs);
+  cards.forEach((card) => card.remove());
 }
 
 function renderPrints(jobs = []) {
@@ -667,10 +513,6 @@ function renderPrints(jobs = []) {
 
   let index = 0;
   jobs.forEach((job) => {
-    if (!job.state || job.state === "standby" || job.state === "idle") {
-      return;
-    }
-
     const tr = document.createElement("tr");
 
     const thumbCell = document.createElement("td");
@@ -687,16 +529,12 @@ function renderPrints(jobs = []) {
     materialCell.textContent = job.material || "-";
 
     const statusCell = document.createElement("td");
-    const badge = createStatusBadgeElement(job.state || "unknown");
+    const badge = createStatusBadgeElement(job.status || "unknown");
     statusCell.appendChild(badge);
 
     const remainingCell = document.createElement("td");
-    let remainingText = "N/A";
-    if (job.totalTime && job.elapsed >= 0) {
-      const remainingSeconds = Math.max(job.totalTime - job.elapsed, 0);
-      remainingText = formatDuration(remainingSeconds);
-    }
-    remainingCell.textContent = remainingText;
+    const etaTimestamp = RUNNING_STATES.includes(job.status) ? parseUtc(job.eta) : null;
+    remainingCell.textContent = etaTimestamp ? formatDuration(Math.max(etaTimestamp - Date.now() / 1000, 0)) : "N/A";
 
     tr.appendChild(thumbCell);
     tr.appendChild(nameCell);
@@ -827,19 +665,18 @@ function renderTimelineSkeleton() {
   const rowsContainer = document.getElementById("timeline-rows");
   if (!rowsContainer) return;
 
-  const printerList = loadPrinters();
   rowsContainer.innerHTML = "";
 
-  printerList.forEach((printer, index) => {
+  timelineItems.forEach((item) => {
     const row = document.createElement("div");
     row.className = "timeline-row";
-    row.dataset.printerId = resolvePrinterId(printer, index);
+    row.dataset.printerId = String(item.id);
 
     const printerItem = document.createElement("div");
     printerItem.className = "timeline-printer-item";
 
     const nameEl = document.createElement("span");
-    nameEl.textContent = printer.name || row.dataset.printerId;
+    nameEl.textContent = item.name || row.dataset.printerId;
 
     const badge = document.createElement("span");
     badge.className = "status-badge";
@@ -896,10 +733,8 @@ function createTimelineJobElement(job, trackWidth) {
   return jobEl;
 }
 
-function updateTimelineRow(printer, data, error) {
-  if (!data) return;
-  const rowId = data.id || resolvePrinterId(printer);
-  const row = document.querySelector(`.timeline-row[data-printer-id="${rowId}"]`);
+function updateTimelineRow(item) {
+  const row = document.querySelector(`.timeline-row[data-printer-id="${item.id}"]`);
   if (!row) return;
 
   const badge = row.querySelector(".status-badge");
@@ -909,23 +744,20 @@ function updateTimelineRow(printer, data, error) {
   const trackWidth = track.getBoundingClientRect().width || track.offsetWidth;
 
   if (nameEl) {
-    nameEl.textContent = printer.name || data.name || rowId;
+    nameEl.textContent = item.name || String(item.id);
   }
 
-  const statusText = error
-    ? "Offline"
-    : data.state || printer.status || "standby";
-  applyStatusBadgeClasses(badge, statusText);
+  applyStatusBadgeClasses(badge, item.status || "standby");
 
+  // The track spans today; running jobs end at their ETA, or now without one
+  const nowSecs = Date.now() / 1000;
+  const dayStart = new Date().setHours(0, 0, 0, 0) / 1000;
   track.innerHTML = "";
-  const jobsToRender = Array.isArray(data.jobs)
-    ? data.jobs
-    : data.job
-    ? [data.job]
-    : [];
-
-  jobsToRender.forEach((job) => {
-    const jobEl = createTimelineJobElement(job, trackWidth);
+  (item.jobs || []).forEach((job) => {
+    const startTimestamp = parseUtc(job.start_time);
+    if (!startTimestamp || startTimestamp < dayStart) return;
+    const endTimestamp = parseUtc(job.end_time) || parseUtc(job.eta) || nowSecs;
+    const jobEl = createTimelineJobElement({ filename: job.filename, startTimestamp, endTimestamp }, trackWidth);
     if (jobEl) {
       track.appendChild(jobEl);
     }
@@ -952,42 +784,21 @@ function recalculateTimelineJobPositions() {
   });
 }
 
-async function refreshTimelineData() {
+function renderTimeline() {
   const rowsContainer = document.getElementById("timeline-rows");
   if (!rowsContainer) return;
 
-  const printerList = loadPrinters();
-  if (rowsContainer.childElementCount !== printerList.length) {
+  const rendered = [...rowsContainer.querySelectorAll(".timeline-row")].map((row) => row.dataset.printerId);
+  if (rendered.join() !== timelineItems.map((item) => String(item.id)).join()) {
     renderTimelineSkeleton();
   }
 
-  const jobTracking = loadJobTracking();
-  const nowSecs = Date.now() / 1000;
-  let trackingUpdated = false;
-
-  const results = await Promise.all(
-    printerList.map((printer, index) =>
-      fetchTimelineDataForPrinter(printer, index, jobTracking, nowSecs)
-    )
-  );
-
-  results.forEach((result) => {
-    if (!result) return;
-    if (result.trackingUpdated) {
-      trackingUpdated = true;
-    }
-    updateTimelineRow(result.printer, result.data, result.error);
-  });
-
-  if (trackingUpdated) {
-    saveJobTracking(jobTracking);
-  }
-
+  timelineItems.forEach(updateTimelineRow);
   updateNowIndicator();
 }
 
 function renderOverview() {
-  const activePrinters = printers.filter((p) => p.status !== "Offline");
+  const activePrinters = printers.filter((p) => p.status !== "offline");
   const overviewActive = document.querySelector("[data-overview-active]");
   if (overviewActive) overviewActive.textContent = `${activePrinters.length} / ${printers.length}`;
 
@@ -1037,44 +848,12 @@ function renderStats() {
   }
 }
 
-async function atualizarTimelineEPrints() {
-  const { jobs } = await coletarJobsDasImpressoras();
-  renderPrints(jobs);
-}
-
-function iniciarAtualizacaoTimelineEPrints() {
-  if (timelineRefreshIntervalId) {
-    clearInterval(timelineRefreshIntervalId);
-  }
-
-  atualizarTimelineEPrints();
-  timelineRefreshIntervalId = setInterval(
-    atualizarTimelineEPrints,
-    TIMELINE_REFRESH_MS
-  );
-}
-
-function initTimelinePage() {
-  const rowsContainer = document.getElementById("timeline-rows");
-  if (!rowsContainer) return;
-
-  renderTimelineSkeleton();
-
-  const startRefresh = async () => {
-    try {
-      await refreshTimelineData();
-    } catch (error) {
-      console.error("Erro ao atualizar dados da timeline", error);
-    }
-  };
-
-  startRefresh();
-
-  if (timelineRefreshIntervalId) {
-    clearInterval(timelineRefreshIntervalId);
-  }
-
-  timelineRefreshIntervalId = setInterval(startRefresh, TIMELINE_REFRESH_MS);
+function renderFromTimeline() {
+  renderPrintersCards();
+  renderPrinters();
+  renderOverview();
+  renderPrints(collectJobs());
+  renderTimeline();
 }
 
 function bindForm() {
@@ -1092,24 +871,15 @@ function bindForm() {
 }
 
 function init() {
-  printers = loadPrinters();
   bindForm();
-  renderPrintersCards();
   renderOverview();
   renderPrinters();
   renderMaterials();
   renderStats();
 
-  if (document.getElementById("printers-grid")) {
-    iniciarAtualizacaoAutomatica();
-  }
-
-  const timelineRows = document.getElementById("timeline-rows");
-  const printsTable = document.getElementById("prints-table-body");
-  if (printsTable) {
-    iniciarAtualizacaoTimelineEPrints();
-  } else if (timelineRows) {
-    initTimelinePage();
+  if (document.querySelector(FEED_SELECTORS)) {
+    onTimelineChange(renderFromTimeline);
+    connectTimelineFeed();
   }
 }
 
@@ -1120,4 +890,4 @@ window.addEventListener("resize", () => {
 
 setInterval(updateNowIndicator, 60000);
 
-document.addEventListener("DOMContentLoaded", init);
+document.addEventListener("DOMContentLoaded", init);
\ No newline at end of file
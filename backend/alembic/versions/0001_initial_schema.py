@@ -0,0 +1,82 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases bootstrapped by migrations/001_init.sql or the old
+Base.metadata.create_all already have these tables, so each one is only
+created when missing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if _missing("printers"):
+        op.create_table(
+            "printers",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(120), nullable=False),
+            sa.Column("moonraker_url", sa.String(255), nullable=True),
+            sa.Column("status", sa.String(50), nullable=False, server_default="offline"),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+    if _missing("filaments"):
+        op.create_table(
+            "filaments",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(120), nullable=False),
+            sa.Column("color", sa.String(50), nullable=True),
+            sa.Column("material", sa.String(50), nullable=True),
+            sa.Column("price_per_kg", sa.Float(), nullable=True),
+            sa.Column("stock_grams", sa.Float(), nullable=True),
+            sa.Column("brand", sa.String(120), nullable=True),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+    if _missing("jobs"):
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("printer_id", sa.Integer(), sa.ForeignKey("printers.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("filename", sa.String(255), nullable=False),
+            sa.Column("material", sa.String(80), nullable=True),
+            sa.Column("duration_estimated", sa.Float(), nullable=True),
+            sa.Column("duration_slicer", sa.Float(), nullable=True),
+            sa.Column("start_time", sa.DateTime(), nullable=True),
+            sa.Column("end_time", sa.DateTime(), nullable=True),
+            sa.Column("status", sa.String(50), nullable=False, server_default="queued"),
+        )
+    if _missing("settings"):
+        op.create_table(
+            "settings",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("key", sa.String(120), nullable=False, unique=True),
+            sa.Column("value", sa.Text(), nullable=True),
+        )
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False, unique=True),
+            sa.Column("hashed_password", sa.String(255), nullable=False),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    for table in ("jobs", "users", "settings", "filaments", "printers"):
+        op.drop_table(table)
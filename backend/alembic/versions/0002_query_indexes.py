@@ -0,0 +1,72 @@
+"""indexes for the job list, history, current and timeline queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00
+
+users.email needs no extra index: its UNIQUE constraint already provides one.
+The ix_<table>_id indexes created by the old create_all duplicated the primary
+keys and are dropped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = "status IN ('printing', 'queued')"
+FINISHED = "status NOT IN ('printing', 'queued')"
+REDUNDANT_PK_INDEXES = ("printers", "filaments", "jobs", "settings", "users")
+
+
+def upgrade() -> None:
+    # CONCURRENTLY so existing farms can upgrade without locking the jobs table.
+    with op.get_context().autocommit_block():
+        # /jobs keyset pagination: ORDER BY start_time DESC NULLS LAST, id DESC
+        op.create_index(
+            "ix_jobs_start_time_id",
+            "jobs",
+            [sa.text("start_time DESC NULLS LAST"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # /jobs/history: same ordering, finished jobs only
+        op.create_index(
+            "ix_jobs_history_start_time",
+            "jobs",
+            [sa.text("start_time DESC NULLS LAST"), sa.text("id DESC")],
+            postgresql_where=sa.text(FINISHED),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # /jobs/current and the "still active" branch of the timeline window
+        op.create_index(
+            "ix_jobs_active_printer",
+            "jobs",
+            ["printer_id", sa.text("start_time DESC NULLS LAST")],
+            postgresql_where=sa.text(ACTIVE),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Timeline grouping by printer and the printers -> jobs foreign key
+        op.create_index(
+            "ix_jobs_printer_start_time",
+            "jobs",
+            ["printer_id", sa.text("start_time DESC NULLS LAST")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for table in REDUNDANT_PK_INDEXES:
+            op.drop_index(f"ix_{table}_id", table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in ("ix_jobs_printer_start_time", "ix_jobs_active_printer", "ix_jobs_history_start_time", "ix_jobs_start_time_id"):
+            op.drop_index(name, table_name="jobs", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""columns for jobs ingested from Moonraker
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 13:00:00
+
+source_key identifies a print observed on a printer ("<printer>:<file>:<start>")
+so the ingestion batches can upsert with ON CONFLICT.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("jobs", sa.Column("progress", sa.Float(), nullable=True))
+    op.add_column("jobs", sa.Column("source_key", sa.String(255), nullable=True))
+    op.create_unique_constraint("jobs_source_key_key", "jobs", ["source_key"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("jobs_source_key_key", "jobs", type_="unique")
+    op.drop_column("jobs", "source_key")
+    op.drop_column("jobs", "progress")
@@ -0,0 +1,146 @@
+"""job statistics rollups maintained by a trigger
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:00:00
+
+Every write path (routers, bulk import, Moonraker ingestion) goes through the
+jobs table, so the rollups are kept by a row trigger instead of application
+code. Updates that only touch progress or source_key do not fire it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED_COLUMNS = "printer_id, material, status, start_time, end_time, duration_estimated, duration_slicer"
+
+APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_stats_apply(job jobs, sign integer) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    job_status text := lower(job.status);
+    sampled boolean := job.duration_estimated IS NOT NULL AND job.duration_slicer IS NOT NULL;
+BEGIN
+    IF job.start_time IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO job_stats AS s (
+        printer_id, day, material, jobs_total, jobs_succeeded, jobs_failed, print_seconds,
+        estimate_samples, estimated_seconds, slicer_seconds, estimate_abs_error
+    ) VALUES (
+        job.printer_id,
+        job.start_time::date,
+        COALESCE(job.material, ''),
+        sign,
+        CASE WHEN job_status IN ('complete', 'completed') THEN sign ELSE 0 END,
+        CASE WHEN job_status IN ('cancelled', 'canceled', 'error', 'failed') THEN sign ELSE 0 END,
+        sign * COALESCE(GREATEST(EXTRACT(EPOCH FROM job.end_time - job.start_time), 0), 0),
+        CASE WHEN sampled THEN sign ELSE 0 END,
+        CASE WHEN sampled THEN sign * job.duration_estimated ELSE 0 END,
+        CASE WHEN sampled THEN sign * job.duration_slicer ELSE 0 END,
+        CASE WHEN sampled THEN sign * abs(job.duration_estimated - job.duration_slicer) ELSE 0 END
+    )
+    ON CONFLICT (printer_id, day, material) DO UPDATE SET
+        jobs_total = s.jobs_total + EXCLUDED.jobs_total,
+        jobs_succeeded = s.jobs_succeeded + EXCLUDED.jobs_succeeded,
+        jobs_failed = s.jobs_failed + EXCLUDED.jobs_failed,
+        print_seconds = s.print_seconds + EXCLUDED.print_seconds,
+        estimate_samples = s.estimate_samples + EXCLUDED.estimate_samples,
+        estimated_seconds = s.estimated_seconds + EXCLUDED.estimated_seconds,
+        slicer_seconds = s.slicer_seconds + EXCLUDED.slicer_seconds,
+        estimate_abs_error = s.estimate_abs_error + EXCLUDED.estimate_abs_error;
+    IF sign < 0 THEN
+        DELETE FROM job_stats
+        WHERE printer_id = job.printer_id AND day = job.start_time::date
+          AND material = COALESCE(job.material, '') AND jobs_total <= 0;
+    END IF;
+END $$;
+"""
+
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_stats_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM job_stats_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM job_stats_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# Same aggregation as python -m app.stats rebuild
+BACKFILL = """
+INSERT INTO job_stats (
+    printer_id, day, material, jobs_total, jobs_succeeded, jobs_failed, print_seconds,
+    estimate_samples, estimated_seconds, slicer_seconds, estimate_abs_error
+)
+SELECT
+    printer_id,
+    start_time::date,
+    COALESCE(material, ''),
+    count(*),
+    count(*) FILTER (WHERE lower(status) IN ('complete', 'completed')),
+    count(*) FILTER (WHERE lower(status) IN ('cancelled', 'canceled', 'error', 'failed')),
+    COALESCE(sum(GREATEST(EXTRACT(EPOCH FROM end_time - start_time), 0)), 0),
+    count(*) FILTER (WHERE duration_estimated IS NOT NULL AND duration_slicer IS NOT NULL),
+    COALESCE(sum(duration_estimated) FILTER (WHERE duration_slicer IS NOT NULL), 0),
+    COALESCE(sum(duration_slicer) FILTER (WHERE duration_estimated IS NOT NULL), 0),
+    COALESCE(sum(abs(duration_estimated - duration_slicer)), 0)
+FROM jobs
+WHERE start_time IS NOT NULL
+GROUP BY 1, 2, 3
+"""
+
+
+def _tracked(alias: str) -> str:
+    return "(" + ", ".join(f"{alias}.{column.strip()}" for column in TRACKED_COLUMNS.split(",")) + ")"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_stats",
+        sa.Column("printer_id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("material", sa.String(80), primary_key=True),
+        sa.Column("jobs_total", sa.Integer(), nullable=False),
+        sa.Column("jobs_succeeded", sa.Integer(), nullable=False),
+        sa.Column("jobs_failed", sa.Integer(), nullable=False),
+        sa.Column("print_seconds", sa.Float(), nullable=False),
+        sa.Column("estimate_samples", sa.Integer(), nullable=False),
+        sa.Column("estimated_seconds", sa.Float(), nullable=False),
+        sa.Column("slicer_seconds", sa.Float(), nullable=False),
+        sa.Column("estimate_abs_error", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_job_stats_day", "job_stats", ["day"])
+    op.execute(APPLY_FUNCTION)
+    op.execute(TRIGGER_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER jobs_stats_insert_delete AFTER INSERT OR DELETE ON jobs "
+        "FOR EACH ROW EXECUTE FUNCTION job_stats_trigger()"
+    )
+    op.execute(
+        f"CREATE TRIGGER jobs_stats_update AFTER UPDATE OF {TRACKED_COLUMNS} ON jobs "
+        f"FOR EACH ROW WHEN ({_tracked('OLD')} IS DISTINCT FROM {_tracked('NEW')}) "
+        "EXECUTE FUNCTION job_stats_trigger()"
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS jobs_stats_update ON jobs")
+    op.execute("DROP TRIGGER IF EXISTS jobs_stats_insert_delete ON jobs")
+    op.execute("DROP FUNCTION IF EXISTS job_stats_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS job_stats_apply(jobs, integer)")
+    op.drop_index("ix_job_stats_day", table_name="job_stats")
+    op.drop_table("job_stats")
@@ -0,0 +1,137 @@
+"""filament usage on jobs, stock ledger and atomic stock updates
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 15:00:00
+
+Recording filament_used_grams on a job (router, bulk import or Moonraker
+ingestion) moves stock in the same transaction: the trigger appends the delta
+to filament_ledger and applies it with a single UPDATE on filaments, so
+parallel completions cannot lose writes. Editing the usage later only moves
+the difference; deleting a job does not give the filament back.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSUME_FUNCTION = """
+CREATE OR REPLACE FUNCTION filament_consume(filament integer, job integer, grams double precision) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE filaments SET stock_grams = COALESCE(stock_grams, 0) - grams WHERE id = filament;
+    -- Gone when the usage is cleared by ON DELETE SET NULL of the filament itself
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    INSERT INTO filament_ledger (filament_id, job_id, delta_grams, reason, created_at)
+    VALUES (filament, job, -grams, 'job', now() AT TIME ZONE 'utc');
+END $$;
+"""
+
+COST_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_filament_cost() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.filament_used_grams IS NULL THEN
+        NEW.filament_cost := NULL;
+        RETURN NEW;
+    END IF;
+    -- Keeps the recorded cost when the filament is deleted (ON DELETE SET NULL)
+    IF NEW.filament_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.filament_id IS NOT DISTINCT FROM OLD.filament_id
+           AND NEW.filament_used_grams IS NOT DISTINCT FROM OLD.filament_used_grams THEN
+            RETURN NEW;
+        END IF;
+    END IF;
+    -- Priced when the usage is recorded; later price changes do not rewrite history
+    NEW.filament_cost := NEW.filament_used_grams / 1000.0
+        * (SELECT price_per_kg FROM filaments WHERE id = NEW.filament_id);
+    RETURN NEW;
+END $$;
+"""
+
+USAGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_filament_usage() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    old_filament integer;
+    old_grams double precision := 0;
+    new_grams double precision := COALESCE(NEW.filament_used_grams, 0);
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        old_filament := OLD.filament_id;
+        old_grams := COALESCE(OLD.filament_used_grams, 0);
+    END IF;
+    IF old_filament IS NOT NULL AND old_filament = NEW.filament_id THEN
+        IF new_grams <> old_grams THEN
+            PERFORM filament_consume(NEW.filament_id, NEW.id, new_grams - old_grams);
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF old_filament IS NOT NULL AND old_grams <> 0 THEN
+        PERFORM filament_consume(old_filament, NEW.id, -old_grams);
+    END IF;
+    IF NEW.filament_id IS NOT NULL AND new_grams <> 0 THEN
+        PERFORM filament_consume(NEW.filament_id, NEW.id, new_grams);
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.add_column("printers", sa.Column("filament_id", sa.Integer(), nullable=True))
+    op.create_foreign_key("printers_filament_id_fkey", "printers", "filaments", ["filament_id"], ["id"], ondelete="SET NULL")
+    op.add_column("jobs", sa.Column("filament_id", sa.Integer(), nullable=True))
+    op.add_column("jobs", sa.Column("filament_used_grams", sa.Float(), nullable=True))
+    op.add_column("jobs", sa.Column("filament_cost", sa.Float(), nullable=True))
+    op.create_foreign_key("jobs_filament_id_fkey", "jobs", "filaments", ["filament_id"], ["id"], ondelete="SET NULL")
+    op.create_table(
+        "filament_ledger",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("filament_id", sa.Integer(), sa.ForeignKey("filaments.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=True),
+        sa.Column("delta_grams", sa.Float(), nullable=False),
+        sa.Column("reason", sa.String(30), nullable=False),
+        sa.Column("note", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_filament_ledger_filament_id", "filament_ledger", ["filament_id", sa.text("id DESC")])
+    op.execute(CONSUME_FUNCTION)
+    op.execute(COST_FUNCTION)
+    op.execute(USAGE_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER jobs_filament_cost BEFORE INSERT OR UPDATE OF filament_id, filament_used_grams ON jobs "
+        "FOR EACH ROW EXECUTE FUNCTION job_filament_cost()"
+    )
+    op.execute(
+        "CREATE TRIGGER jobs_filament_usage AFTER INSERT OR UPDATE OF filament_id, filament_used_grams ON jobs "
+        "FOR EACH ROW EXECUTE FUNCTION job_filament_usage()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS jobs_filament_usage ON jobs")
+    op.execute("DROP TRIGGER IF EXISTS jobs_filament_cost ON jobs")
+    op.execute("DROP FUNCTION IF EXISTS job_filament_usage()")
+    op.execute("DROP FUNCTION IF EXISTS job_filament_cost()")
+    op.execute("DROP FUNCTION IF EXISTS filament_consume(integer, integer, double precision)")
+    op.drop_index("ix_filament_ledger_filament_id", table_name="filament_ledger")
+    op.drop_table("filament_ledger")
+    op.drop_constraint("jobs_filament_id_fkey", "jobs", type_="foreignkey")
+    op.drop_column("jobs", "filament_cost")
+    op.drop_column("jobs", "filament_used_grams")
+    op.drop_column("jobs", "filament_id")
+    op.drop_constraint("printers_filament_id_fkey", "printers", type_="foreignkey")
+    op.drop_column("printers", "filament_id")
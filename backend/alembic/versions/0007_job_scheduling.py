@@ -0,0 +1,38 @@
+"""job priority, printer materials and the queue index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 16:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("printers", sa.Column("materials", sa.String(255), nullable=True))
+    op.add_column("jobs", sa.Column("priority", sa.Integer(), nullable=False, server_default="0"))
+    # The scheduler reads the queue as: WHERE status = 'queued' ORDER BY priority DESC, id
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_jobs_queue",
+            "jobs",
+            [sa.text("priority DESC"), "id"],
+            postgresql_where=sa.text("status = 'queued'"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_queue", table_name="jobs")
+    op.drop_column("jobs", "priority")
+    op.drop_column("printers", "materials")
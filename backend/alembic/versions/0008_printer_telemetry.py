@@ -0,0 +1,43 @@
+"""printer telemetry rollups, partitioned by day
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00
+
+Only the parent table is created here. app.telemetry adds one partition per
+UTC day before writing to it and drops the ones older than
+TELEMETRY_RETENTION_DAYS, so retention is a DROP TABLE instead of a DELETE.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "printer_telemetry",
+        sa.Column("printer_id", sa.Integer(), nullable=False),
+        sa.Column("ts", sa.DateTime(), nullable=False),
+        sa.Column("samples", sa.SmallInteger(), nullable=False),
+        sa.Column("extruder_temp", sa.REAL(), nullable=True),
+        sa.Column("extruder_target", sa.REAL(), nullable=True),
+        sa.Column("bed_temp", sa.REAL(), nullable=True),
+        sa.Column("bed_target", sa.REAL(), nullable=True),
+        sa.Column("progress", sa.REAL(), nullable=True),
+        sa.Column("speed", sa.REAL(), nullable=True),
+        sa.PrimaryKeyConstraint("printer_id", "ts"),
+        postgresql_partition_by="RANGE (ts)",
+    )
+
+
+def downgrade() -> None:
+    # Drops the partitions with it
+    op.drop_table("printer_telemetry")
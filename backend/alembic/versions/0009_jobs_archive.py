@@ -0,0 +1,137 @@
+"""cold job history: jobs_archive, partitioned by month
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 20:00:00
+
+jobs stays the hot table (active jobs and recent history, with the unique
+source_key the ingestion upserts on and nullable start_time for queued jobs,
+neither of which a partitioned table allows). app.job_archive moves finished
+jobs older than job_archive_after_days into jobs_archive, which is partitioned
+by start_time month, so queries with a time range only open the months they
+need. Only the parent table is created here; the archiver adds the partitions.
+
+job_stats already counts archived jobs, so the DELETE side of the move must
+not subtract them: the archiver sets print_manager.archiving for its
+transaction and job_stats_trigger skips moves. Deleting archived rows (e.g. by
+the printers cascade) still updates the rollups.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    "id, printer_id, filename, material, duration_estimated, duration_slicer, start_time, end_time, "
+    "status, progress, priority, filament_id, filament_used_grams, filament_cost, source_key"
+)
+
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_stats_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Rows moving between jobs and jobs_archive stay counted
+    IF current_setting('print_manager.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM job_stats_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM job_stats_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+PREVIOUS_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_stats_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM job_stats_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM job_stats_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# job_stats_apply takes a jobs row; copy the tracked columns into one
+ARCHIVE_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_stats_archive_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    job jobs;
+BEGIN
+    IF current_setting('print_manager.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    job.printer_id := OLD.printer_id;
+    job.material := OLD.material;
+    job.status := OLD.status;
+    job.start_time := OLD.start_time;
+    job.end_time := OLD.end_time;
+    job.duration_estimated := OLD.duration_estimated;
+    job.duration_slicer := OLD.duration_slicer;
+    PERFORM job_stats_apply(job, -1);
+    RETURN NULL;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("printer_id", sa.Integer(), sa.ForeignKey("printers.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("material", sa.String(80), nullable=True),
+        sa.Column("duration_estimated", sa.Float(), nullable=True),
+        sa.Column("duration_slicer", sa.Float(), nullable=True),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=True),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("progress", sa.Float(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("filament_id", sa.Integer(), sa.ForeignKey("filaments.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("filament_used_grams", sa.Float(), nullable=True),
+        sa.Column("filament_cost", sa.Float(), nullable=True),
+        sa.Column("source_key", sa.String(255), nullable=True),
+        sa.PrimaryKeyConstraint("id", "start_time"),
+        postgresql_partition_by="RANGE (start_time)",
+    )
+    # Same orderings as ix_jobs_start_time_id and ix_jobs_printer_start_time, so the
+    # archive branch of the keyset pages walks the index too
+    op.create_index(
+        "ix_jobs_archive_start_time_id", "jobs_archive", [sa.text("start_time DESC NULLS LAST"), sa.text("id DESC")]
+    )
+    op.create_index(
+        "ix_jobs_archive_printer_start_time", "jobs_archive", ["printer_id", sa.text("start_time DESC NULLS LAST")]
+    )
+    op.execute(TRIGGER_FUNCTION)
+    op.execute(ARCHIVE_TRIGGER_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER jobs_archive_stats_delete AFTER DELETE ON jobs_archive "
+        "FOR EACH ROW EXECUTE FUNCTION job_stats_archive_trigger()"
+    )
+
+
+def downgrade() -> None:
+    # Archived jobs go back to jobs as they are: no rollup, stock or cost triggers
+    op.execute("ALTER TABLE jobs DISABLE TRIGGER USER")
+    op.execute(f"INSERT INTO jobs ({COLUMNS}) SELECT {COLUMNS} FROM jobs_archive")
+    op.execute("ALTER TABLE jobs ENABLE TRIGGER USER")
+    op.execute("DROP TRIGGER IF EXISTS jobs_archive_stats_delete ON jobs_archive")
+    op.execute("DROP FUNCTION IF EXISTS job_stats_archive_trigger()")
+    op.execute(PREVIOUS_TRIGGER_FUNCTION)
+    # Drops the partitions with it
+    op.drop_table("jobs_archive")
@@ -0,0 +1,28 @@
+"""users.password_version for token revocation
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 09:00:00
+
+Tokens carry the version in their pwv claim. Only a real password change bumps
+it; rehashing on login with new CryptContext parameters leaves it alone.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("password_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "password_version")
@@ -0,0 +1,49 @@
+"""count paused jobs as active in the partial job indexes
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 14:00:00
+
+Moonraker ingestion writes status 'paused'. A paused print is still live, so
+ix_jobs_active_printer and ix_jobs_history_start_time are rebuilt with the
+predicates of models.ACTIVE_JOB_STATUSES. The queries and the indexes must use
+the same set, or the planner cannot use the partial indexes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = "status IN ('printing', 'paused', 'queued')"
+FINISHED = "status NOT IN ('printing', 'paused', 'queued')"
+PREVIOUS_ACTIVE = "status IN ('printing', 'queued')"
+PREVIOUS_FINISHED = "status NOT IN ('printing', 'queued')"
+
+
+def _rebuild(active: str, finished: str):
+    # Build the replacement first, then swap names: the queries never lose their index
+    indexes = (
+        ("ix_jobs_history_start_time", [sa.text("start_time DESC NULLS LAST"), sa.text("id DESC")], finished),
+        ("ix_jobs_active_printer", ["printer_id", sa.text("start_time DESC NULLS LAST")], active),
+    )
+    with op.get_context().autocommit_block():
+        for name, columns, where in indexes:
+            op.drop_index(f"{name}_new", table_name="jobs", postgresql_concurrently=True, if_exists=True)
+            op.create_index(f"{name}_new", "jobs", columns, postgresql_where=sa.text(where), postgresql_concurrently=True)
+            op.drop_index(name, table_name="jobs", postgresql_concurrently=True, if_exists=True)
+            op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def upgrade() -> None:
+    _rebuild(ACTIVE, FINISHED)
+
+
+def downgrade() -> None:
+    _rebuild(PREVIOUS_ACTIVE, PREVIOUS_FINISHED)
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .event_bus import RESYNC, event_bus
+from .models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    created_at: datetime | None
+    password_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            created_at=user.created_at,
+            password_version=user.password_version,
+        )
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Principal | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+principal_cache = PrincipalCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+AUTH_INVALIDATE = "auth_invalidate"
+event_bus.subscribe(AUTH_INVALIDATE, lambda data: [principal_cache.invalidate(email) for email in data["emails"]])
+event_bus.subscribe(RESYNC, lambda data: principal_cache.clear())
+
+_PENDING_KEY = "auth_cache_invalidate"
+
+
+def _track(session: Session, *emails: str | None):
+    session.info.setdefault(_PENDING_KEY, set()).update(email for email in emails if email)
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User):
+    history = inspect(target).attrs.email.history
+    _track(inspect(target).session, target.email, *history.deleted)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User):
+    _track(inspect(target).session, target.email)
+
+
+# Invalidate only once the change is visible, so a concurrent request cannot
+# re-cache the old row between flush and commit.
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    emails = session.info.pop(_PENDING_KEY, None)
+    if emails:
+        event_bus.publish(AUTH_INVALIDATE, {"emails": sorted(emails)})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,267 @@
+import codecs
+import csv
+import io
+import json
+from collections.abc import Iterator
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import async_engine
+from .serialization import dumps_text
+
+MAX_REPORTED_ERRORS = 100
+# asyncpg accepts at most 32767 bind parameters per statement
+MAX_BIND_PARAMS = 32767
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    # Lines keep their terminator, as csv.reader expects
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+class _RecordLines(Iterator[str]):
+    # The lines received so far, for csv.reader. starved tells that the reader asked
+    # for more: the record continues in a quoted field on the next line.
+    def __init__(self, lines: list[str]):
+        self._lines = iter(lines)
+        self.starved = False
+
+    def __next__(self) -> str:
+        try:
+            return next(self._lines)
+        except StopIteration:
+            self.starved = True
+            raise
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[tuple[int, list[str] | str]]:
+    # Yields (first line number, values or error message). csv.reader decides where a
+    # record ends, so quoted fields may contain newlines.
+    lines: list[str] = []
+    number = 0
+    async for line in _iter_lines(request):
+        number += 1
+        lines.append(line)
+        source = _RecordLines(lines)
+        try:
+            values = next(csv.reader(source), [])
+        except csv.Error as exc:
+            values = f"CSV inválido: {exc}"
+        if source.starved and isinstance(values, list):
+            continue
+        yield number - len(lines) + 1, values
+        lines = []
+    if lines:
+        yield number - len(lines) + 1, "CSV inválido: aspas não fechadas"
+
+
+async def iter_records(request: Request) -> AsyncIterator[tuple[int, dict | str]]:
+    # Yields (line number, record) or (line number, error message).
+    if "csv" in request.headers.get("content-type", ""):
+        header = None
+        async for number, values in _iter_csv(request):
+            if isinstance(values, str):
+                yield number, values
+                continue
+            if not values or (len(values) == 1 and not values[0].strip()):
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield number, f"Esperadas {len(header)} colunas, recebidas {len(values)}"
+                continue
+            yield number, {name: value if value != "" else None for name, value in zip(header, values)}
+        return
+
+    number = 0
+    async for line in _iter_lines(request):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, "JSON inválido"
+            continue
+        yield number, record if isinstance(record, dict) else "Cada linha deve ser um objeto JSON"
+
+
+def validate_record(schema: type[BaseModel], record: dict) -> dict:
+    row = schema.model_validate(record).model_dump(exclude_unset=True)
+    if record.get("id") is not None:
+        try:
+            row["id"] = int(record["id"])
+        except (TypeError, ValueError):
+            raise ValueError("id: deve ser um inteiro")
+        if row["id"] <= 0:
+            raise ValueError("id: deve ser positivo")
+    return row
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+    return str(exc)
+
+
+class BulkImport:
+    # Validates chunk by chunk and writes each chunk with one multi-row INSERT per
+    # row shape. Rows carrying an id are upserted; the import is all-or-nothing.
+    # on_change receives (id, inserted, previous, new) for every row that wrote the
+    # tracked column, inside the import's transaction.
+    def __init__(self, db: AsyncSession, model, schema: type[BaseModel], check=None, track=None, on_change=None):
+        self.db = db
+        self.model = model
+        self.schema = schema
+        self.check = check
+        self.track = track
+        self.on_change = on_change
+        self.chunk_size = max(1, min(settings.bulk_chunk_size, MAX_BIND_PARAMS // len(model.__table__.columns)))
+        self.created = 0
+        self.updated = 0
+        self.errors: list[dict] = []
+        self._explicit_ids = False
+
+    def _error(self, line: int, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    async def run(self, request: Request) -> dict:
+        chunk: list[tuple[int, dict]] = []
+        failed = False
+        async for line, record in iter_records(request):
+            if isinstance(record, str):
+                self._error(line, record)
+                failed = True
+                continue
+            try:
+                chunk.append((line, validate_record(self.schema, record)))
+            except (ValidationError, ValueError) as exc:
+                self._error(line, _describe(exc))
+                failed = True
+            if len(chunk) >= self.chunk_size:
+                failed = await self._flush(chunk, failed)
+                chunk = []
+        failed = await self._flush(chunk, failed)
+        if failed:
+            await self.db.rollback()
+            self.errors.sort(key=lambda error: error["line"])
+            raise HTTPException(status_code=422, detail={"message": "Importação rejeitada", "errors": self.errors})
+        if self._explicit_ids:
+            table = self.model.__tablename__
+            await self.db.execute(
+                text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}")
+            )
+        await self.db.commit()
+        return {"created": self.created, "updated": self.updated}
+
+    async def _flush(self, chunk: list[tuple[int, dict]], failed: bool) -> bool:
+        if chunk and self.check is not None:
+            for line, message in await self.check(self.db, chunk):
+                self._error(line, message)
+                failed = True
+        if failed or not chunk:
+            # Keep validating the rest of the stream to report errors, but stop writing.
+            return failed
+        # One INSERT ... ON CONFLICT cannot touch the same id twice; the last row wins.
+        latest = {row.get("id", -line): row for line, row in chunk}
+        by_shape: dict[tuple, list[dict]] = {}
+        for row in latest.values():
+            by_shape.setdefault(tuple(sorted(row)), []).append(row)
+        for shape, rows in by_shape.items():
+            tracked = self.track is not None and self.track.key in shape
+            statement = insert(self.model).values(rows)
+            if "id" in shape:
+                self._explicit_ids = True
+                updates = {column: statement.excluded[column] for column in shape if column != "id"}
+                statement = statement.on_conflict_do_update(index_elements=[self.model.id], set_=updates)
+            # xmax is 0 only for freshly inserted tuples
+            returning = [literal_column("xmax = 0")]
+            if tracked:
+                returning += [self.model.id, self.track, await self._previous(shape, rows)]
+            result = (await self.db.execute(statement.returning(*returning))).all()
+            inserted = [row[0] for row in result]
+            if tracked:
+                await self.on_change(self.db, [(row[1], row[0], row[3], row[2]) for row in result])
+            created = sum(inserted)
+            self.created += created
+            self.updated += len(inserted) - created
+        return False
+
+    async def _previous(self, shape: tuple, rows: list[dict]):
+        # The RETURNING subquery reads the statement's snapshot, i.e. the value before
+        # the upsert. Locking the rows first keeps a concurrent write from landing
+        # between that snapshot and the update.
+        if "id" in shape:
+            ids = [row["id"] for row in rows]
+            await self.db.execute(select(self.model.id).where(self.model.id.in_(ids)).with_for_update())
+        table, column = self.model.__tablename__, self.track.name
+        return literal_column(f"(SELECT before.{column} FROM {table} AS before WHERE before.id = {table}.id)")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _export_rows(query, fields: list[str], export_format: str) -> AsyncIterator[str]:
+    async with async_engine.connect() as conn:
+        # stream() runs on a server-side cursor and fetches yield_per rows at a time
+        result = await conn.stream(query.execution_options(yield_per=settings.bulk_chunk_size))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if export_format == "csv":
+            writer.writerow(fields)
+        async for rows in result.partitions():
+            if export_format == "csv":
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(dumps_text(dict(zip(fields, row))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def export_response(query, fields: list[str], export_format: str, name: str) -> StreamingResponse:
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {export_format}")
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(
+        _export_rows(query, fields, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+async def missing_ids(db: AsyncSession, column, chunk: list[tuple[int, dict]], field: str, message: str) -> list[tuple[int, str]]:
+    wanted = {row[field] for _, row in chunk if row.get(field) is not None}
+    if not wanted:
+        return []
+    found = set((await db.execute(select(column).where(column.in_(wanted)))).scalars())
+    return [(line, message) for line, row in chunk if row.get(field) is not None and row[field] not in found]
@@ -13,14 +13,64 @@ def _bool_env(name: str, default: bool = False) -> bool:
 class Settings(BaseModel):
     app_name: str = Field(default="3D Print Manager")
     database_url: str = Field(default_factory=lambda: os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/print_manager"))
+    db_pool_size: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_SIZE", "10")))
+    db_max_overflow: int = Field(default_factory=lambda: int(os.getenv("DB_MAX_OVERFLOW", "20")))
+    db_pool_timeout: float = Field(default_factory=lambda: float(os.getenv("DB_POOL_TIMEOUT", "30")))
+    db_migrate_on_startup: bool = Field(default_factory=lambda: _bool_env("DB_MIGRATE_ON_STARTUP", True))
     jwt_secret: str = Field(default_factory=lambda: os.getenv("JWT_SECRET", "change-this-secret"))
     jwt_exp_minutes: int = Field(default_factory=lambda: int(os.getenv("JWT_EXPIRES_MINUTES", "120")))
+    bcrypt_rounds: int = Field(default_factory=lambda: int(os.getenv("BCRYPT_ROUNDS", "12")))
+    password_hash_workers: int = Field(default_factory=lambda: int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+    password_hash_max_queue: int = Field(default_factory=lambda: int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32")))
+    auth_cache_ttl_seconds: float = Field(default_factory=lambda: float(os.getenv("AUTH_CACHE_TTL", "60")))
+    auth_cache_max_entries: int = Field(default_factory=lambda: int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "1024")))
     cors_origins: list[str] = Field(default_factory=lambda: [origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:4173,http://127.0.0.1:5173").split(",") if origin.strip()])
     rate_limit_requests: int = Field(default_factory=lambda: int(os.getenv("RATE_LIMIT_REQUESTS", "200")))
     rate_limit_window_seconds: int = Field(default_factory=lambda: int(os.getenv("RATE_LIMIT_WINDOW", "60")))
+    # Several workers/replicas: EVENT_BUS_BACKEND=postgres (the rate limiter follows unless overridden)
+    event_bus_backend: str = Field(default_factory=lambda: os.getenv("EVENT_BUS_BACKEND", "memory"))
+    rate_limit_backend: str = Field(default_factory=lambda: os.getenv("RATE_LIMIT_BACKEND", os.getenv("EVENT_BUS_BACKEND", "memory")))
+    rate_limit_costs: str = Field(default_factory=lambda: os.getenv("RATE_LIMIT_COSTS", "/health=0,/metrics=0,/ws/=0,/auth/login=5"))
+    filament_ledger_retention_days: int = Field(default_factory=lambda: int(os.getenv("FILAMENT_LEDGER_RETENTION_DAYS", "90")))
+    # 0 disables the ledger compactor
+    filament_ledger_compact_hours: float = Field(default_factory=lambda: float(os.getenv("FILAMENT_LEDGER_COMPACT_HOURS", "6")))
+    # Finished jobs older than this move to jobs_archive; 0 keeps everything in jobs
+    job_archive_after_days: int = Field(default_factory=lambda: int(os.getenv("JOB_ARCHIVE_AFTER_DAYS", "180")))
+    job_archive_interval_hours: float = Field(default_factory=lambda: float(os.getenv("JOB_ARCHIVE_INTERVAL_HOURS", "6")))
+    schedule_changeover_minutes: float = Field(default_factory=lambda: float(os.getenv("SCHEDULE_CHANGEOVER_MINUTES", "10")))
+    schedule_default_job_minutes: float = Field(default_factory=lambda: float(os.getenv("SCHEDULE_DEFAULT_JOB_MINUTES", "60")))
+    response_cache_entries: int = Field(default_factory=lambda: int(os.getenv("RESPONSE_CACHE_ENTRIES", "256")))
+    telemetry_enabled: bool = Field(default_factory=lambda: _bool_env("TELEMETRY_ENABLED", True))
+    telemetry_flush_seconds: float = Field(default_factory=lambda: float(os.getenv("TELEMETRY_FLUSH_SECONDS", "10")))
+    telemetry_retention_days: int = Field(default_factory=lambda: int(os.getenv("TELEMETRY_RETENTION_DAYS", "30")))
+    eta_enabled: bool = Field(default_factory=lambda: _bool_env("ETA_ENABLED", True))
+    eta_refresh_seconds: float = Field(default_factory=lambda: float(os.getenv("ETA_REFRESH_SECONDS", "15")))
+    # Older completed jobs count less when fitting the corrections; 0 weighs all equally
+    eta_half_life_days: float = Field(default_factory=lambda: float(os.getenv("ETA_HALF_LIFE_DAYS", "90")))
+    metrics_enabled: bool = Field(default_factory=lambda: _bool_env("METRICS_ENABLED", True))
+    # When set, /metrics requires "Authorization: Bearer <token>"
+    metrics_token: str = Field(default_factory=lambda: os.getenv("METRICS_TOKEN", ""))
+    # 0 disables the slow-request log
+    slow_request_ms: float = Field(default_factory=lambda: float(os.getenv("SLOW_REQUEST_MS", "0")))
+    bulk_chunk_size: int = Field(default_factory=lambda: int(os.getenv("BULK_CHUNK_SIZE", "1000")))
     admin_email: str = Field(default_factory=lambda: os.getenv("ADMIN_EMAIL", "admin@local"))
     admin_password: str = Field(default_factory=lambda: os.getenv("ADMIN_PASSWORD", "admin123"))
     timezone: str = Field(default_factory=lambda: os.getenv("LOCAL_TZ", "America/Sao_Paulo"))
+    timeline_window_days: int = Field(default_factory=lambda: int(os.getenv("TIMELINE_WINDOW_DAYS", "7")))
+    timeline_max_job_hours: int = Field(default_factory=lambda: int(os.getenv("TIMELINE_MAX_JOB_HOURS", "72")))
+    moonraker_poll_enabled: bool = Field(default_factory=lambda: _bool_env("MOONRAKER_POLL_ENABLED", True))
+    moonraker_mode: str = Field(default_factory=lambda: os.getenv("MOONRAKER_MODE", "poll"))
+    moonraker_reconcile_interval: float = Field(default_factory=lambda: float(os.getenv("MOONRAKER_RECONCILE_INTERVAL", "30")))
+    moonraker_poll_interval: float = Field(default_factory=lambda: float(os.getenv("MOONRAKER_POLL_INTERVAL", "5")))
+    moonraker_timeout: float = Field(default_factory=lambda: float(os.getenv("MOONRAKER_TIMEOUT", "4")))
+    moonraker_max_backoff: float = Field(default_factory=lambda: float(os.getenv("MOONRAKER_MAX_BACKOFF", "300")))
+    moonraker_max_connections: int = Field(default_factory=lambda: int(os.getenv("MOONRAKER_MAX_CONNECTIONS", "100")))
+    job_ingest_enabled: bool = Field(default_factory=lambda: _bool_env("JOB_INGEST_ENABLED", True))
+    job_ingest_flush_seconds: float = Field(default_factory=lambda: float(os.getenv("JOB_INGEST_FLUSH_SECONDS", "2")))
+    moonraker_metadata_cache_size: int = Field(default_factory=lambda: int(os.getenv("MOONRAKER_METADATA_CACHE_SIZE", "2048")))
+    moonraker_metadata_revalidate_seconds: float = Field(default_factory=lambda: float(os.getenv("MOONRAKER_METADATA_REVALIDATE", "600")))
+    moonraker_thumbnail_dir: str = Field(default_factory=lambda: os.getenv("MOONRAKER_THUMBNAIL_DIR", "/tmp/print-manager/thumbnails"))
+    moonraker_thumbnail_max_files: int = Field(default_factory=lambda: int(os.getenv("MOONRAKER_THUMBNAIL_MAX_FILES", "5000")))
 
     @property
     def access_token_expires(self) -> timedelta:
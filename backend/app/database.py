@@ -1,15 +1,85 @@
+import time
+from pathlib import Path
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .metrics import db_pool_wait, instrument_engine, registry
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(settings.database_url, echo=False, future=True)
+def _async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgres") else url
+
+
+class _TimedCheckout:
+    # Time spent waiting for (or opening) a connection, i.e. what a request loses
+    # when the pool is exhausted
+    metrics_label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, engine=self.metrics_label)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+_pool_options = {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+    "pool_pre_ping": True,
+}
+
+engine = create_engine(settings.database_url, echo=False, future=True, poolclass=TimedQueuePool, **_pool_options)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = create_async_engine(_async_url(settings.database_url), echo=False, poolclass=TimedAsyncQueuePool, **_pool_options)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+registry.gauge(
+    "db_pool_checked_out",
+    "Conexões do pool em uso",
+    ("engine",),
+    collect=lambda: {("sync",): engine.pool.checkedout(), ("async",): async_engine.pool.checkedout()},
+)
+registry.gauge(
+    "db_pool_connections",
+    "Conexões abertas no pool, em uso ou livres",
+    ("engine",),
+    collect=lambda: {
+        ("sync",): engine.pool.checkedout() + engine.pool.checkedin(),
+        ("async",): async_engine.pool.checkedout() + async_engine.pool.checkedin(),
+    },
+)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def run_migrations(revision: str = "head"):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
+
 
 def get_db():
     db = SessionLocal()
@@ -17,3 +87,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,52 +1,51 @@
-from datetime import datetime
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from collections import defaultdict, deque
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import get_db
-from .config import settings
+from .auth_cache import Principal, principal_cache
+from .database import AsyncSessionLocal
 from .models import User
-from .security import verify_password, decode_token
+from .security import decode_token, verify_and_update_password
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-_rate_limiter_store: dict[str, deque] = defaultdict(deque)
-
-
-def rate_limiter(request: Request):
-    identifier = request.client.host if request.client else "global"
-    window_seconds = settings.rate_limit_window_seconds
-    limit = settings.rate_limit_requests
-    now = datetime.utcnow().timestamp()
-
-    window = _rate_limiter_store[identifier]
-    while window and now - window[0] > window_seconds:
-        window.popleft()
-    if len(window) >= limit:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Limite de requisições excedido. Aguarde antes de tentar novamente.",
-        )
-    window.append(now)
-
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     payload = decode_token(token)
-    if not payload or "sub" not in payload:
+    # Scoped tokens (thumbnail URLs) never authenticate a user
+    if not payload or "sub" not in payload or "scope" in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
     email = payload["sub"]
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
-    return user
-
-
-def authenticate_user(db: Session, email: str, password: str) -> User | None:
-    user = db.query(User).filter(User.email == email).first()
+    principal = principal_cache.get(email)
+    if principal is None:
+        async with AsyncSessionLocal() as db:
+            user = await db.scalar(select(User).where(User.email == email))
+            if not user:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
+            principal = Principal.from_user(user)
+        principal_cache.put(email, principal)
+    if payload.get("pwv", principal.password_version) != principal.password_version:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado")
+    return principal
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> User | None:
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Same password with new CryptContext parameters: tokens stay valid
+        user.hashed_password = new_hash
+        await db.commit()
     return user
+
+
+def change_password(user: User, hashed_password: str):
+    # Revokes every token issued for the previous password
+    user.hashed_password = hashed_password
+    user.password_version = (user.password_version or 0) + 1
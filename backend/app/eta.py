@@ -0,0 +1,484 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+import numpy as np
+from sqlalchemy import func, or_, select, union_all
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .models import ACTIVE_JOB_STATUSES, Job, JobArchive
+from .printer_state import printer_state
+from .scheduler import RUNNING_STATES, from_timestamp, normalize_material, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+COMPLETED_STATUSES = ("complete", "completed")
+# A printer or material with this many (decay-weighted) jobs gets half of its raw correction
+PRIOR_JOBS = 20.0
+FULL_ITERATIONS = 8
+# Refits start from the previous corrections, which barely move per finished job
+WARM_ITERATIONS = 2
+# Actual/estimate ratios outside this range are aborted prints or hand-edited rows
+MIN_RATIO = 0.2
+MAX_RATIO = 5.0
+MAX_TRAINING_JOBS = 200_000
+FULL_RELOAD_SECONDS = 3600
+WAKE_DEBOUNCE_SECONDS = 0.5
+# ETAs that moved less than this are not republished (keeps ETags and the WebSocket quiet)
+ETA_TOLERANCE_SECONDS = 60
+
+JOB_COLUMNS = (
+    Job.id, Job.printer_id, Job.filename, Job.material, Job.status, Job.progress,
+    Job.start_time, Job.end_time, Job.duration_slicer, Job.duration_estimated,
+)
+
+EtaListener = Callable[[], None]
+
+
+def _completed(model):
+    return select(*(getattr(model, column.key) for column in JOB_COLUMNS)).where(
+        func.lower(model.status).in_(COMPLETED_STATUSES),
+        model.start_time.is_not(None),
+        model.end_time.is_not(None),
+        or_(model.duration_slicer > 0, model.duration_estimated > 0),
+    )
+
+
+def training_query(limit: int = MAX_TRAINING_JOBS):
+    # Archived jobs are old, but still the only history of rarely used printers and materials
+    completed = union_all(_completed(Job), _completed(JobArchive)).subquery()
+    return select(completed).order_by(completed.c.end_time.desc()).limit(limit)
+
+
+class Codes:
+    # Dense integer codes for printer ids and materials, the index into the corrections
+    def __init__(self):
+        self._codes: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def code(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._codes)
+        return code
+
+    def items(self):
+        return self._codes.items()
+
+
+class TrainingSet:
+    # Completed jobs as columns; a job id keeps its row so edits overwrite it.
+    def __init__(self, capacity: int = 1024):
+        self._rows: dict[int, int] = {}
+        self.size = 0
+        self.printer = np.zeros(capacity, np.int32)
+        self.material = np.zeros(capacity, np.int32)
+        self.log_ratio = np.zeros(capacity, np.float64)
+        self.finished = np.zeros(capacity, np.float64)
+        self.valid = np.zeros(capacity, np.bool_)
+
+    def __len__(self) -> int:
+        return int(self.valid[: self.size].sum())
+
+    def _reserve(self, count: int):
+        capacity = len(self.printer)
+        if self.size + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + count)
+        for name in ("printer", "material", "log_ratio", "finished", "valid"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def extend(self, job_ids, printer, material, log_ratio, finished):
+        count = len(job_ids)
+        self._reserve(count)
+        rows = slice(self.size, self.size + count)
+        self.printer[rows] = printer
+        self.material[rows] = material
+        self.log_ratio[rows] = log_ratio
+        self.finished[rows] = finished
+        self.valid[rows] = True
+        for offset, job_id in enumerate(job_ids):
+            previous = self._rows.get(job_id)
+            if previous is not None:
+                self.valid[previous] = False
+            self._rows[job_id] = self.size + offset
+        self.size += count
+
+    def discard(self, job_id: int) -> bool:
+        row = self._rows.pop(job_id, None)
+        if row is None:
+            return False
+        self.valid[row] = False
+        return True
+
+    def columns(self):
+        mask = self.valid[: self.size]
+        return (
+            self.printer[: self.size][mask],
+            self.material[: self.size][mask],
+            self.log_ratio[: self.size][mask],
+            self.finished[: self.size][mask],
+        )
+
+
+@dataclass(frozen=True)
+class CorrectionModel:
+    # log(actual / estimate) = offset + printer[p] + material[m]
+    offset: float
+    printer: np.ndarray
+    material: np.ndarray
+    samples: int
+
+    @classmethod
+    def empty(cls) -> "CorrectionModel":
+        return cls(0.0, np.zeros(0), np.zeros(0), 0)
+
+    def factors(self, printer: np.ndarray, material: np.ndarray) -> np.ndarray:
+        return np.exp(self.offset + _lookup(self.printer, printer) + _lookup(self.material, material))
+
+
+def _lookup(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    # Codes assigned after the fit have no correction yet
+    result = np.zeros(len(codes))
+    known = codes < len(values)
+    result[known] = values[codes[known]]
+    return result
+
+
+def _padded(values: np.ndarray, size: int) -> np.ndarray:
+    result = np.zeros(size)
+    result[: min(len(values), size)] = values[:size]
+    return result
+
+
+def fit(
+    printer: np.ndarray,
+    material: np.ndarray,
+    log_ratio: np.ndarray,
+    weights: np.ndarray,
+    printer_count: int,
+    material_count: int,
+    previous: CorrectionModel | None = None,
+    iterations: int = FULL_ITERATIONS,
+) -> CorrectionModel:
+    # Two-way additive model by backfitting: each sweep is one weighted bincount per
+    # factor, shrunk towards zero by PRIOR_JOBS so a printer with three prints does
+    # not get a wild correction.
+    if not len(log_ratio) or weights.sum() <= 0:
+        return CorrectionModel(0.0, np.zeros(printer_count), np.zeros(material_count), 0)
+    offset = float(np.dot(weights, log_ratio) / weights.sum())
+    residual = log_ratio - offset
+    printer_weight = np.bincount(printer, weights, minlength=printer_count) + PRIOR_JOBS
+    material_weight = np.bincount(material, weights, minlength=material_count) + PRIOR_JOBS
+    by_printer = _padded(previous.printer, printer_count) if previous else np.zeros(printer_count)
+    by_material = _padded(previous.material, material_count) if previous else np.zeros(material_count)
+    for _ in range(iterations):
+        by_printer = np.bincount(printer, weights * (residual - by_material[material]), minlength=printer_count) / printer_weight
+        by_material = np.bincount(material, weights * (residual - by_printer[printer]), minlength=material_count) / material_weight
+    return CorrectionModel(offset, by_printer, by_material, len(log_ratio))
+
+
+def decay_weights(finished: np.ndarray, now: float, half_life_days: float) -> np.ndarray:
+    if half_life_days <= 0:
+        return np.ones(len(finished))
+    return np.exp2(-np.maximum(now - finished, 0) / (half_life_days * 86400))
+
+
+def predict(
+    model: CorrectionModel,
+    printer: np.ndarray,
+    material: np.ndarray,
+    estimate: np.ndarray,
+    elapsed: np.ndarray,
+    progress: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Returns (corrected total duration, remaining seconds), NaN where unknown. While
+    # printing, the corrected estimate is blended with the progress extrapolation,
+    # which takes over as the job advances.
+    predicted = estimate * model.factors(printer, material)
+    measurable = (progress > 0.01) & (progress < 1) & (elapsed > 0)
+    by_progress = np.divide(elapsed, progress, out=np.full(len(elapsed), np.nan), where=measurable)
+    weight = np.clip(np.nan_to_num(progress), 0, 1)
+    total = np.where(
+        np.isnan(predicted),
+        by_progress,
+        np.where(np.isnan(by_progress), predicted, (1 - weight) * predicted + weight * by_progress),
+    )
+    remaining = np.maximum(total - np.nan_to_num(elapsed), 0)
+    return predicted, remaining
+
+
+def _estimate(row) -> float | None:
+    estimate = row.duration_slicer or row.duration_estimated
+    return estimate if estimate and estimate > 0 else None
+
+
+class EtaEngine:
+    # Learns how far off the slicer estimates are per printer and material from the
+    # completed jobs, and recomputes the ETA of every active job in one pass per
+    # refresh. Every worker keeps its own copy, fed by the timeline job events.
+    def __init__(self):
+        self.printers = Codes()
+        self.materials = Codes()
+        self.training = TrainingSet()
+        self.model = CorrectionModel.empty()
+        self.version = 0
+        self.fit_seconds = 0.0
+        self._active: dict[int, tuple] = {}
+        self._etas: dict[int, tuple[float | None, datetime | None]] = {}
+        self._listeners: list[EtaListener] = []
+        self._pending: set[int] = set()
+        self._reload = True
+        self._dirty = False
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def add_listener(self, listener: EtaListener):
+        self._listeners.append(listener)
+
+    def get(self, job_id: int) -> tuple[float | None, datetime | None] | None:
+        return self._etas.get(job_id)
+
+    def eta(self, job_id: int) -> datetime | None:
+        entry = self._etas.get(job_id)
+        return entry[1] if entry else None
+
+    def on_timeline_event(self, data: dict):
+        # Runs in whatever thread published the event
+        with self._lock:
+            if data["kind"] == "job":
+                self._pending.add(data["id"])
+            elif data["kind"] == "reload":
+                self._reload = True
+            else:
+                return
+        self._wake_up()
+
+    def request_reload(self):
+        with self._lock:
+            self._reload = True
+        self._wake_up()
+
+    def _wake_up(self):
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        self._wake = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - keep the last ETAs and retry
+                logger.exception("Falha ao atualizar as previsões de término")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.eta_refresh_seconds)
+                # Job events arrive in bursts (ingestion flushes, bulk edits)
+                await asyncio.sleep(WAKE_DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def refresh(self):
+        with self._lock:
+            reload = self._reload or time.monotonic() - self._loaded_at > FULL_RELOAD_SECONDS
+            pending, self._pending = self._pending, set()
+            self._reload = False
+        try:
+            if reload:
+                await self._load_all()
+            elif pending:
+                await self._load_jobs(pending)
+        except Exception:
+            with self._lock:
+                self._reload = self._reload or reload
+                self._pending |= pending
+            raise
+        if self._dirty:
+            await asyncio.to_thread(self.refit, reload)
+        self._publish(self.compute())
+
+    async def _load_all(self):
+        async with AsyncSessionLocal() as db:
+            finished = (await db.execute(training_query())).all()
+            active = (await db.execute(select(*JOB_COLUMNS).where(func.lower(Job.status).in_(ACTIVE_JOB_STATUSES)))).all()
+        self.training = TrainingSet(max(len(finished), 1024))
+        # Converting 100k rows takes a good fraction of a second: not on the event loop
+        await asyncio.to_thread(self._add_training, finished)
+        self._active = {row.id: row for row in active}
+        self._loaded_at = time.monotonic()
+        self._dirty = True
+
+    async def _load_jobs(self, job_ids: set[int]):
+        async with AsyncSessionLocal() as db:
+            rows = {row.id: row for row in (await db.execute(select(*JOB_COLUMNS).where(Job.id.in_(job_ids)))).all()}
+        completed = []
+        for job_id in job_ids:
+            row = rows.get(job_id)
+            status = (row.status or "").lower() if row else None
+            if status in COMPLETED_STATUSES:
+                completed.append(row)
+            elif self.training.discard(job_id):
+                self._dirty = True
+            if status in ACTIVE_JOB_STATUSES:
+                self._active[job_id] = row
+            else:
+                self._active.pop(job_id, None)
+        if completed:
+            self._add_training(completed)
+
+    def _add_training(self, rows):
+        samples = []
+        for row in rows:
+            estimate = _estimate(row)
+            if estimate is None or row.start_time is None or row.end_time is None:
+                if self.training.discard(row.id):
+                    self._dirty = True
+                continue
+            ratio = (row.end_time - row.start_time).total_seconds() / estimate
+            if not MIN_RATIO <= ratio <= MAX_RATIO:
+                if self.training.discard(row.id):
+                    self._dirty = True
+                continue
+            samples.append((
+                row.id,
+                self.printers.code(row.printer_id),
+                self.materials.code(normalize_material(row.material)),
+                np.log(ratio),
+                to_timestamp(row.end_time),
+            ))
+        if samples:
+            job_ids, printer, material, log_ratio, finished = zip(*samples)
+            self.training.extend(job_ids, printer, material, log_ratio, finished)
+            self._dirty = True
+
+    def refit(self, full: bool = True):
+        started = time.perf_counter()
+        printer, material, log_ratio, finished = self.training.columns()
+        weights = decay_weights(finished, to_timestamp(datetime.utcnow()), settings.eta_half_life_days)
+        previous = None if full else self.model
+        self.model = fit(
+            printer, material, log_ratio, weights, len(self.printers), len(self.materials),
+            previous, FULL_ITERATIONS if previous is None else WARM_ITERATIONS,
+        )
+        self._dirty = False
+        self.fit_seconds = time.perf_counter() - started
+
+    def compute(self, now: datetime | None = None) -> dict[int, tuple[float | None, datetime | None]]:
+        if not self._active:
+            return {}
+        now = now or datetime.utcnow()
+        now_ts = to_timestamp(now)
+        job_ids = list(self._active)
+        count = len(job_ids)
+        printer = np.empty(count, np.int64)
+        material = np.empty(count, np.int64)
+        estimate = np.full(count, np.nan)
+        elapsed = np.zeros(count)
+        progress = np.full(count, np.nan)
+        running = np.zeros(count, np.bool_)
+        for index, job_id in enumerate(job_ids):
+            row = self._active[job_id]
+            printer[index] = self.printers.code(row.printer_id)
+            material[index] = self.materials.code(normalize_material(row.material))
+            estimate[index] = _estimate(row) or np.nan
+            if (row.status or "").lower() not in RUNNING_STATES:
+                continue
+            running[index] = True
+            snapshot = printer_state.get(row.printer_id)
+            if snapshot is not None and snapshot.state in RUNNING_STATES and snapshot.filename in (None, row.filename):
+                elapsed[index] = snapshot.print_duration or 0
+                progress[index] = snapshot.progress if snapshot.progress is not None else np.nan
+            else:
+                elapsed[index] = now_ts - to_timestamp(row.start_time) if row.start_time else np.nan
+                progress[index] = row.progress if row.progress is not None else np.nan
+
+        predicted, remaining = predict(self.model, printer, material, estimate, elapsed, progress)
+        etas = {}
+        for index, job_id in enumerate(job_ids):
+            duration = round(float(predicted[index])) if np.isfinite(predicted[index]) else None
+            eta = None
+            if running[index] and np.isfinite(remaining[index]) and np.isfinite(elapsed[index]):
+                eta = from_timestamp(round(now_ts + float(remaining[index])))
+            etas[job_id] = (duration, eta)
+        return etas
+
+    def _publish(self, etas: dict[int, tuple[float | None, datetime | None]]):
+        if not self._changed(etas):
+            return
+        self._etas = etas
+        self.version += 1
+        for listener in self._listeners:
+            try:
+                listener()
+            except Exception:  # pragma: no cover - one bad listener must not block the rest
+                logger.exception("Falha ao notificar novas previsões de término")
+
+    def _changed(self, etas: dict) -> bool:
+        if etas.keys() != self._etas.keys():
+            return True
+        tolerance = timedelta(seconds=ETA_TOLERANCE_SECONDS)
+        for job_id, (duration, eta) in etas.items():
+            old_duration, old_eta = self._etas[job_id]
+            if (duration is None) != (old_duration is None) or (eta is None) != (old_eta is None):
+                return True
+            if duration is not None and abs(duration - old_duration) >= ETA_TOLERANCE_SECONDS:
+                return True
+            if eta is not None and abs(eta - old_eta) >= tolerance:
+                return True
+        return False
+
+    def corrections(self) -> dict:
+        model = self.model
+        return {
+            "samples": model.samples,
+            "global_factor": float(np.exp(model.offset)),
+            # Multiply with the global factor: actual ≈ estimate × global × printer × material
+            "printers": {printer_id: float(np.exp(value)) for printer_id, value in _by_code(self.printers, model.printer)},
+            "materials": {material or "": float(np.exp(value)) for material, value in _by_code(self.materials, model.material)},
+        }
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "samples": self.model.samples,
+            "active": len(self._active),
+            "fit_ms": round(self.fit_seconds * 1000, 2),
+        }
+
+
+def _by_code(codes: Codes, values: np.ndarray):
+    return [(value, values[code]) for value, code in codes.items() if code < len(values)]
+
+
+eta_engine = EtaEngine()
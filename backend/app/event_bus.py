@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable
+
+import orjson
+
+from .config import settings
+from .database import async_engine
+from .serialization import dumps_text
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "print_manager_events"
+# NOTIFY payloads are limited to 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+RECONNECT_SECONDS = 2
+MAX_RECONNECT_SECONDS = 60
+# Delivered locally after the shared connection came back: events may have been missed
+RESYNC = "resync"
+
+EventHandler = Callable[[dict], None]
+
+
+class MemoryEventBus:
+    # Single-process deployments: publish() calls the local handlers and nothing else.
+    def __init__(self):
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: dict[str, list[EventHandler]] = {}
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, topic: str, handler: EventHandler):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, data: dict, local: bool = True):
+        # Handlers run synchronously in the caller's thread (often the threadpool),
+        # so they must only hand work over, like TimelineHub._notify does.
+        self.published += 1
+        if local:
+            self._dispatch(topic, data)
+
+    def _dispatch(self, topic: str, data: dict):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(data)
+            except Exception:  # pragma: no cover - one bad handler must not block the rest
+                logger.exception("Falha ao tratar evento %s", topic)
+
+    async def start(self):
+        return None
+
+    async def stop(self):
+        return None
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "origin": self.origin, "published": self.published, "received": self.received}
+
+
+class PostgresEventBus(MemoryEventBus):
+    # Several workers or replicas: events also go out through NOTIFY on one shared
+    # connection per worker, which LISTENs on the same channel. A worker skips its
+    # own notifications since local handlers already ran inside publish().
+    def __init__(self, engine=async_engine):
+        super().__init__()
+        self.engine = engine
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._outbox: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self.connected = False
+        self.dropped = 0
+
+    def publish(self, topic: str, data: dict, local: bool = True):
+        super().publish(topic, data, local)
+        if self._loop is None or self._outbox is None:
+            return
+        text = dumps_text({"o": self.origin, "t": topic, "d": data})
+        if len(text.encode()) > MAX_PAYLOAD_BYTES:
+            self.dropped += 1
+            logger.warning("Evento %s grande demais para NOTIFY (%s bytes)", topic, len(text))
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._outbox.put_nowait(text)
+        else:
+            self._loop.call_soon_threadsafe(self._outbox.put_nowait, text)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._outbox = asyncio.Queue()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        self._outbox = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            message = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return
+        if message.get("o") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(message["t"], message["d"])
+
+    async def _run(self):
+        delay = RECONNECT_SECONDS
+        first = True
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    await driver.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                    self.connected = True
+                    delay = RECONNECT_SECONDS
+                    if not first:
+                        self._dispatch(RESYNC, {})
+                    first = False
+                    try:
+                        await self._send(driver)
+                    finally:
+                        self.connected = False
+                        if not driver.is_closed():
+                            await driver.remove_listener(NOTIFY_CHANNEL, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - reconnect below
+                logger.exception("Falha na conexão do barramento de eventos")
+            first = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+
+    async def _send(self, driver):
+        while not driver.is_closed():
+            try:
+                text = await asyncio.wait_for(self._outbox.get(), timeout=MAX_RECONNECT_SECONDS)
+            except asyncio.TimeoutError:
+                # Idle: a round trip notices a dead connection before the next publish
+                await driver.execute("SELECT 1")
+                continue
+            batch = [text]
+            while not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            try:
+                await driver.executemany("SELECT pg_notify($1, $2)", [(NOTIFY_CHANNEL, item) for item in batch])
+            except Exception:
+                # Lost for the other workers; they resync when the connection comes back
+                self.dropped += len(batch)
+                raise
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend": "postgres", "connected": self.connected, "dropped": self.dropped}
+
+
+def _build_bus() -> MemoryEventBus:
+    if settings.event_bus_backend == "postgres":
+        return PostgresEventBus()
+    return MemoryEventBus()
+
+
+event_bus = _build_bus()
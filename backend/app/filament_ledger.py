@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import AsyncSessionLocal
+from .models import Filament, FilamentLedger
+from .settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+# How often a compactor disabled at runtime checks whether it was turned back on
+DISABLED_CHECK_SECONDS = 60
+
+# Old movements are folded into one "compacted" row per filament; the balance is
+# unaffected because it already lives in filaments.stock_grams.
+COMPACT_SQL = text(
+    """
+    WITH folded AS (
+        DELETE FROM filament_ledger WHERE created_at < :cutoff
+        RETURNING filament_id, delta_grams
+    )
+    INSERT INTO filament_ledger (filament_id, delta_grams, reason, created_at)
+    SELECT filament_id, sum(delta_grams), 'compacted', :cutoff FROM folded GROUP BY filament_id
+    """
+)
+
+
+def adjust_stock(db: Session, filament_id: int, delta_grams: float, reason: str, note: str | None = None) -> bool:
+    # Single UPDATE so concurrent adjustments and job completions never lose writes.
+    updated = db.execute(
+        update(Filament)
+        .where(Filament.id == filament_id)
+        .values(stock_grams=func.coalesce(Filament.stock_grams, 0) + delta_grams)
+        .returning(Filament.id)
+    ).first()
+    if updated is None:
+        return False
+    db.add(FilamentLedger(filament_id=filament_id, delta_grams=delta_grams, reason=reason, note=note))
+    return True
+
+
+def record_stock_set(db: Session | AsyncSession, filament_id: int, previous: float | None, current: float | None, reason: str = "set"):
+    # Writes that set stock_grams outright (create, PUT, bulk import) log the difference.
+    delta = (current or 0) - (previous or 0)
+    if delta:
+        db.add(FilamentLedger(filament_id=filament_id, delta_grams=delta, reason=reason))
+
+
+async def record_imported_stock(db: AsyncSession, changes: list[tuple[int, bool, float | None, float | None]]):
+    for filament_id, inserted, previous, current in changes:
+        record_stock_set(db, filament_id, previous, current, "initial" if inserted else "import")
+
+
+class LedgerCompactor:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def compact(self, retention_days: int | None = None) -> int:
+        days = settings_service.current.filament_ledger_retention_days if retention_days is None else retention_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(COMPACT_SQL, {"cutoff": cutoff})
+            await db.commit()
+        return result.rowcount
+
+    async def _run(self):
+        while True:
+            hours = settings_service.current.filament_ledger_compact_hours
+            if hours <= 0:
+                await asyncio.sleep(DISABLED_CHECK_SECONDS)
+                continue
+            try:
+                await self.compact()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retried on the next interval
+                logger.exception("Falha ao compactar o histórico de filamento")
+            await asyncio.sleep(hours * 3600)
+
+
+ledger_compactor = LedgerCompactor()
@@ -0,0 +1,163 @@
+# Finished jobs older than job_archive_after_days move from jobs to the monthly
+# partitions of jobs_archive (migration 0009). Runs on the leader; by hand:
+#
+#     python -m app.job_archive run [--after-days N]
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+from .event_bus import event_bus
+from .models import ACTIVE_JOB_STATUSES, JobArchive
+from .response_cache import CACHE_TABLES
+from .settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "jobs_archive_p"
+# Rows per transaction, so the move never holds locks on a large part of jobs
+ARCHIVE_BATCH = 5000
+# Matches the partial index ix_jobs_history_start_time
+ARCHIVABLE = f"status NOT IN ({', '.join(repr(status) for status in ACTIVE_JOB_STATUSES)}) AND start_time < :cutoff"
+COLUMNS = ", ".join(column.name for column in JobArchive.__table__.columns)
+
+# Called with the number of jobs moved (timeline_hub reloads its window)
+ArchiveListener = Callable[[int], None]
+
+MONTHS_SQL = text(f"SELECT DISTINCT date_trunc('month', start_time) FROM jobs WHERE {ARCHIVABLE}")
+MOVE_SQL = text(
+    f"""
+    WITH moved AS (
+        DELETE FROM jobs WHERE id IN (
+            SELECT id FROM jobs WHERE {ARCHIVABLE}
+            ORDER BY start_time
+            LIMIT :batch
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {COLUMNS}
+    )
+    INSERT INTO jobs_archive ({COLUMNS}) SELECT {COLUMNS} FROM moved
+    """
+)
+
+
+def archive_horizon() -> datetime | None:
+    # Jobs that started before this may live in jobs_archive; None when archival is off
+    days = settings_service.current.job_archive_after_days
+    return datetime.utcnow() - timedelta(days=days) if days > 0 else None
+
+
+def reaches_archive(start: datetime | None) -> bool:
+    # Open-ended ranges stay on the hot table unless the caller asks for the archive
+    horizon = archive_horizon()
+    return horizon is not None and start is not None and start < horizon
+
+
+class JobArchiver:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._partitions: set[str] = set()
+        self._listeners: list[ArchiveListener] = []
+
+    def add_listener(self, listener: ArchiveListener):
+        self._listeners.append(listener)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def archive(self, after_days: int | None = None) -> int:
+        days = settings_service.current.job_archive_after_days if after_days is None else after_days
+        if days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        try:
+            async with AsyncSessionLocal() as db:
+                for month in (await db.execute(MONTHS_SQL, {"cutoff": cutoff})).scalars():
+                    await self._ensure_partition(db, month.date())
+                await db.commit()
+        except Exception:
+            self._partitions.clear()
+            raise
+        moved = 0
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    # job_stats_trigger leaves the rollups alone for this transaction
+                    await db.execute(text("SELECT set_config('print_manager.archiving', 'on', true)"))
+                    count = (await db.execute(MOVE_SQL, {"cutoff": cutoff, "batch": ARCHIVE_BATCH})).rowcount
+                    await db.commit()
+                moved += count
+                if count < ARCHIVE_BATCH:
+                    break
+        finally:
+            if moved:
+                event_bus.publish(CACHE_TABLES, {"tables": ["jobs"]})
+                logger.info("%s jobs movidos para o arquivo", moved)
+                for listener in self._listeners:
+                    try:
+                        listener(moved)
+                    except Exception:  # pragma: no cover - one bad listener must not block the rest
+                        logger.exception("Falha ao notificar o arquivamento de jobs")
+        return moved
+
+    async def _ensure_partition(self, db: AsyncSession, month: date):
+        name = f"{PARTITION_PREFIX}{month:%Y%m}"
+        if name in self._partitions:
+            return
+        following = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        await db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF jobs_archive "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            )
+        )
+        self._partitions.add(name)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.archive()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retried on the next interval
+                logger.exception("Falha ao arquivar jobs antigos")
+            await asyncio.sleep(settings_service.current.job_archive_interval_hours * 3600)
+
+
+job_archiver = JobArchiver()
+
+
+async def _run_once(after_days: int | None) -> int:
+    await settings_service.load_async()
+    return await job_archiver.archive(after_days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job history archival")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="move old finished jobs to jobs_archive now")
+    run_parser.add_argument("--after-days", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "run":
+        moved = asyncio.run(_run_once(args.after_days))
+        logger.info("jobs_archive: %s jobs movidos", moved)
+
+
+if __name__ == "__main__":
+    main()
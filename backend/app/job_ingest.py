@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from .database import AsyncSessionLocal
+from .models import Job, Printer
+from .moonraker_files import metadata_cache
+from .printer_state import PrinterSnapshot, printer_state
+from .settings_service import settings_service
+from .timeline_hub import timeline_hub
+
+logger = logging.getLogger(__name__)
+
+RUNNING_STATES = {"printing", "paused"}
+FINAL_STATES = {"complete", "cancelled", "error"}
+# Seen when the print ended without Moonraker reporting how (e.g. firmware restart).
+LOST_STATUS = "cancelled"
+
+
+@dataclass
+class ActiveJob:
+    source_key: str
+    printer_id: int
+    filename: str
+    start_time: datetime
+    row: dict = field(default_factory=dict)
+    filament_mm: float | None = None
+    grams_per_mm: float | None = None
+
+
+def _source_key(printer_id: int, filename: str, start_time: datetime) -> str:
+    return f"{printer_id}:{filename}:{int(start_time.timestamp())}"[:255]
+
+
+class JobIngestor:
+    # Turns observed print_stats transitions into Job rows, written in periodic bulk upserts.
+    def __init__(self):
+        self._active: dict[int, ActiveJob] = {}
+        self._pending: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(Job.printer_id, Job.filename, Job.start_time, Job.source_key).where(
+                    Job.source_key.is_not(None), Job.status.in_(RUNNING_STATES)
+                )
+            )
+            for printer_id, filename, start_time, source_key in rows:
+                self._active[printer_id] = ActiveJob(source_key, printer_id, filename, start_time)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def on_snapshot(self, snapshot: PrinterSnapshot, previous: PrinterSnapshot | None):
+        if self._task is None or snapshot.error:
+            # Offline printers keep their running job open until they report again.
+            return
+        now = snapshot.updated_at or datetime.utcnow()
+        active = self._active.get(snapshot.printer_id)
+        if snapshot.state in RUNNING_STATES and snapshot.filename:
+            if active is not None and active.filename != snapshot.filename:
+                self._finish(active, LOST_STATUS, now)
+                active = None
+            if active is None:
+                active = self._begin(snapshot, now)
+            active.filament_mm = snapshot.status.get("print_stats", {}).get("filament_used", active.filament_mm)
+            self._queue(active, status=snapshot.state, progress=snapshot.progress)
+        elif active is not None and snapshot.state in FINAL_STATES:
+            active.filament_mm = snapshot.status.get("print_stats", {}).get("filament_used", active.filament_mm)
+            self._finish(active, snapshot.state, now, snapshot.progress)
+        elif active is not None and snapshot.state == "standby":
+            self._finish(active, LOST_STATUS, now)
+
+    def _begin(self, snapshot: PrinterSnapshot, now: datetime) -> ActiveJob:
+        elapsed = snapshot.status.get("print_stats", {}).get("total_duration") or snapshot.print_duration or 0
+        start_time = now - timedelta(seconds=float(elapsed))
+        active = ActiveJob(_source_key(snapshot.printer_id, snapshot.filename, start_time), snapshot.printer_id, snapshot.filename, start_time)
+        self._active[snapshot.printer_id] = active
+        asyncio.get_running_loop().create_task(self._enrich(active))
+        return active
+
+    def _finish(self, active: ActiveJob, status: str, now: datetime, progress: float | None = None):
+        values = {"status": status, "end_time": now}
+        if progress is not None:
+            values["progress"] = progress
+        if active.filament_mm is not None and active.grams_per_mm is not None:
+            # Setting the usage charges the spool through the jobs_filament_usage trigger
+            values["filament_used_grams"] = round(active.filament_mm * active.grams_per_mm, 2)
+        self._queue(active, **values)
+        self._active.pop(active.printer_id, None)
+
+    def _queue(self, active: ActiveJob, **values):
+        active.row.update(values)
+        self._pending[active.source_key] = {
+            "source_key": active.source_key,
+            "printer_id": active.printer_id,
+            "filename": active.filename,
+            "start_time": active.start_time,
+            "status": "printing",
+            **active.row,
+        }
+
+    async def _enrich(self, active: ActiveJob):
+        try:
+            async with AsyncSessionLocal() as db:
+                printer = (
+                    await db.execute(select(Printer.moonraker_url, Printer.filament_id).where(Printer.id == active.printer_id))
+                ).first()
+            if printer is None:
+                return
+            if printer.filament_id is not None and "filament_id" not in active.row:
+                self._queue(active, filament_id=printer.filament_id)
+            if not printer.moonraker_url:
+                return
+            metadata = await metadata_cache.get(active.printer_id, printer.moonraker_url.rstrip("/"), active.filename)
+        except Exception as exc:
+            logger.info("Metadata indisponível para %s: %s", active.filename, exc)
+            return
+        if metadata.get("filament_weight_total") and metadata.get("filament_total"):
+            active.grams_per_mm = float(metadata["filament_weight_total"]) / float(metadata["filament_total"])
+        if metadata.get("estimated_time"):
+            self._queue(active, duration_slicer=float(metadata["estimated_time"]))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings_service.current.job_ingest_flush_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - rows stay pending for the next flush
+                logger.exception("Falha ao gravar jobs observados")
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        try:
+            job_ids = await self._upsert(rows)
+        except Exception:
+            for row in rows:
+                self._pending.setdefault(row["source_key"], row)
+            raise
+        for job_id in job_ids:
+            timeline_hub.notify_job(job_id)
+
+    async def _upsert(self, rows: list[dict]) -> list[int]:
+        job_ids = []
+        async with AsyncSessionLocal() as db:
+            # A printer deleted mid-print would fail the whole batch on the foreign key, forever
+            printer_ids = {row["printer_id"] for row in rows}
+            existing = set((await db.execute(select(Printer.id).where(Printer.id.in_(printer_ids)))).scalars())
+            for printer_id in printer_ids - existing:
+                self._active.pop(printer_id, None)
+            rows = [row for row in rows if row["printer_id"] in existing]
+            # Rows in one multi-row INSERT must share the same keys
+            by_shape: dict[tuple, list[dict]] = {}
+            for row in rows:
+                by_shape.setdefault(tuple(sorted(row)), []).append(row)
+            for shape, group in by_shape.items():
+                statement = insert(Job).values(group)
+                updates = {column: statement.excluded[column] for column in shape if column not in ("source_key", "printer_id", "filename", "start_time")}
+                statement = statement.on_conflict_do_update(index_elements=[Job.source_key], set_=updates).returning(Job.id)
+                job_ids.extend((await db.execute(statement)).scalars())
+            await db.commit()
+        return job_ids
+
+
+job_ingestor = JobIngestor()
+printer_state.add_observer(job_ingestor.on_snapshot)
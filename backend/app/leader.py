@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+from .config import settings
+from .database import async_engine
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "print_manager:leader"
+CHECK_SECONDS = 5
+
+LeaderCallback = Callable[[], Awaitable[None]]
+
+
+class LeaderElection:
+    # The background pollers must run in exactly one worker. With the Postgres event
+    # bus each worker competes for a session-level advisory lock held on a dedicated
+    # connection; if that connection dies the lock is released and another worker
+    # takes over within CHECK_SECONDS. In memory mode the only process is the leader.
+    def __init__(self, on_elected: LeaderCallback, on_demoted: LeaderCallback):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.enabled = settings.event_bus_backend == "postgres"
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if not self.enabled:
+            await self._elect()
+        elif self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._demote()
+
+    async def _elect(self):
+        self.is_leader = True
+        logger.info("Este worker assumiu as tarefas em segundo plano")
+        await self.on_elected()
+
+    async def _demote(self):
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                await self.on_demoted()
+            except Exception:  # pragma: no cover - must not swallow a pending cancellation
+                logger.exception("Falha ao parar as tarefas em segundo plano")
+
+    async def _run(self):
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": LOCK_KEY})
+                    await conn.commit()
+                    if acquired:
+                        try:
+                            await self._elect()
+                            while True:
+                                await asyncio.sleep(CHECK_SECONDS)
+                                await conn.execute(text("SELECT 1"))
+                                await conn.commit()
+                        finally:
+                            await self._demote()
+                            # The pooled connection outlives this block; do not leave the lock on it
+                            await self._unlock(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retried below
+                logger.exception("Falha na eleição do worker líder")
+            await asyncio.sleep(CHECK_SECONDS)
+
+    async def _unlock(self, conn):
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": LOCK_KEY})
+            await conn.commit()
+        except Exception:  # pragma: no cover - a dead connection released it already
+            await conn.invalidate()
@@ -1,16 +1,36 @@
+import asyncio
+import math
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 import pytz
-from fastapi import FastAPI, Depends, Request
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 
+from .auth_cache import principal_cache
+from .eta import eta_engine
+from .event_bus import event_bus
 from .config import settings
-from .database import Base, engine, get_db
+from .database import async_engine, get_db, run_migrations
 from .models import User
 from .security import get_password_hash
-from .dependencies import rate_limiter
-from .routers import auth, printers, filaments, jobs, settings as settings_router, moonraker, timeline
+from .rate_limit import rate_limiter
+from .settings_service import settings_service
+from .response_cache import response_cache
+from .serialization import FastJSONResponse
+from .filament_ledger import ledger_compactor
+from .job_archive import job_archiver
+from .job_ingest import job_ingestor
+from .leader import LeaderElection
+from . import metrics
+from .moonraker_poller import poller
+from .moonraker_subscriber import subscriber
+from .printer_state import printer_state
+from .telemetry import telemetry, telemetry_writer
+from .timeline_hub import timeline_hub
+from .routers import auth, printers, filaments, jobs, settings as settings_router, moonraker, timeline, stats, schedule
 
 
 def seed_admin(db: Session):
@@ -21,15 +41,59 @@ def seed_admin(db: Session):
         db.commit()
 
 
+async def start_background():
+    # Started even when disabled: filament_ledger_compact_hours can be turned on at runtime
+    await ledger_compactor.start()
+    if settings.job_ingest_enabled:
+        await job_ingestor.start()
+    await job_archiver.start()
+    if settings.telemetry_enabled:
+        await telemetry_writer.start()
+    if settings.moonraker_poll_enabled:
+        await (subscriber if settings.moonraker_mode == "subscribe" else poller).start()
+
+
+async def stop_background():
+    await subscriber.stop()
+    await poller.stop()
+    await job_ingestor.stop()
+    await job_archiver.stop()
+    await telemetry_writer.stop()
+    await ledger_compactor.stop()
+
+
+leader = LeaderElection(start_background, stop_background)
+
+metrics.registry.gauge("leader", "1 se este worker executa as tarefas em segundo plano", collect=lambda: int(leader.is_leader))
+metrics.registry.gauge("websocket_subscribers", "Clientes conectados ao WebSocket da timeline", collect=lambda: timeline_hub.subscribers)
+metrics.registry.counter("rate_limit_rejections_total", "Requisições recusadas pelo limitador", collect=lambda: rate_limiter.rejections)
+metrics.registry.gauge("printers_monitored", "Impressoras com estado ao vivo neste worker", collect=lambda: len(printer_state.all()))
+
+
 @asynccontextmanager
-def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+async def lifespan(app: FastAPI):
+    if settings.db_migrate_on_startup:
+        await asyncio.to_thread(run_migrations)
     with next(get_db()) as db:
         seed_admin(db)
-    yield
+    await settings_service.start()
+    await event_bus.start()
+    await timeline_hub.start()
+    if settings.eta_enabled:
+        await eta_engine.start()
+    await leader.start()
+    try:
+        yield
+    finally:
+        await leader.stop()
+        await eta_engine.stop()
+        await timeline_hub.stop()
+        await event_bus.stop()
+        await settings_service.stop()
+        await async_engine.dispose()
 
 
-app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app = FastAPI(title=settings.app_name, lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,14 +106,57 @@ app.add_middleware(
 
 @app.middleware("http")
 async def enforce_rate_limiting(request: Request, call_next):
-    rate_limiter(request)
+    decision = await rate_limiter.check(request)
+    if not decision.allowed:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Limite de requisições excedido. Aguarde antes de tentar novamente."},
+            headers={"Retry-After": str(max(math.ceil(decision.retry_after), 1))},
+        )
     return await call_next(request)
 
 
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    # Outermost, so rate-limited requests and the middleware above are measured too
+    slow_ms = settings_service.current.slow_request_ms
+    profile = metrics.RequestProfile(capture=slow_ms > 0)
+    token = metrics.current_profile.set(profile)
+    metrics.http_in_flight.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.http_in_flight.dec()
+        metrics.current_profile.reset(token)
+        metrics.finish_request(request, status_code, time.perf_counter() - started, profile, slow_ms)
+
+
 @app.get("/health")
 async def health():
     tz = pytz.timezone(settings.timezone)
-    return {"status": "ok", "time": datetime.now(tz).isoformat()}
+    return {
+        "status": "ok",
+        "time": datetime.now(tz).isoformat(),
+        "leader": leader.is_leader,
+        "event_bus": event_bus.stats(),
+        "auth_cache": principal_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "telemetry": telemetry.stats(),
+        "eta": eta_engine.stats(),
+    }
+
+
+if settings.metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint(request: Request):
+        if settings.metrics_token and request.headers.get("authorization") != f"Bearer {settings.metrics_token}":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 app.include_router(auth.router)
@@ -59,3 +166,5 @@ app.include_router(jobs.router)
 app.include_router(settings_router.router)
 app.include_router(moonraker.router)
 app.include_router(timeline.router)
+app.include_router(stats.router)
+app.include_router(schedule.router)
@@ -0,0 +1,268 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+UNMATCHED_ROUTE = "unmatched"
+# Distinct statements kept per request for the slow-request log
+MAX_STATEMENTS = 200
+SLOW_LOG_STATEMENTS = 10
+
+# Returns the value, or {label values: value} for a labelled metric
+Collector = Callable[[], float | dict[tuple, float]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), collect: Collector | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+
+    def _collected(self) -> dict[tuple, float]:
+        if self.collect is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.collect()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._collected().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = (), collect: Collector | None = None) -> Counter:
+        return self._register(Counter(name, documentation, labels, collect))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = (), collect: Collector | None = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:  # pragma: no cover - one broken collector must not hide the rest
+                logger.exception("Falha ao coletar a métrica %s", metric.name)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota", ("method", "route", "status")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "Requisições HTTP em andamento")
+http_sql_queries = registry.histogram(
+    "http_request_sql_queries", "Consultas SQL emitidas por requisição", ("route",), COUNT_BUCKETS
+)
+http_sql_seconds = registry.histogram(
+    "http_request_sql_seconds", "Tempo total em SQL por requisição", ("route",)
+)
+db_queries = registry.histogram("db_query_duration_seconds", "Duração de cada comando SQL", ("engine",), QUERY_BUCKETS)
+db_pool_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obter uma conexão do pool", ("engine",), QUERY_BUCKETS
+)
+moonraker_requests = registry.histogram(
+    "moonraker_request_duration_seconds", "Latência das chamadas ao Moonraker", ("printer_id", "call")
+)
+moonraker_errors = registry.counter(
+    "moonraker_errors_total", "Falhas nas chamadas ao Moonraker", ("printer_id", "call", "error")
+)
+moonraker_updates = registry.counter(
+    "moonraker_status_updates_total", "Atualizações de status recebidas pelas assinaturas WebSocket", ("printer_id",)
+)
+slow_requests = registry.counter("http_slow_requests_total", "Requisições acima do limite do log de lentidão", ("route",))
+
+
+class RequestProfile:
+    # SQL issued while serving one request. Statement texts are only kept when the
+    # slow-request log is on, aggregated so an N+1 loop shows up as one line.
+    __slots__ = ("queries", "seconds", "statements")
+
+    def __init__(self, capture: bool = False):
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements: dict[str, list] | None = {} if capture else None
+
+    def record(self, statement: str, elapsed: float):
+        self.queries += 1
+        self.seconds += elapsed
+        if self.statements is None:
+            return
+        entry = self.statements.get(statement)
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += elapsed
+        elif len(self.statements) < MAX_STATEMENTS:
+            self.statements[statement] = [1, elapsed]
+
+
+# Set by the HTTP middleware; copied into the threadpool and the endpoint task
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+def instrument_engine(engine, label: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        db_queries.observe(elapsed, engine=label)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+
+
+def route_template(request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def finish_request(request, status_code: int, elapsed: float, profile: RequestProfile, slow_ms: float):
+    route = route_template(request)
+    http_requests.observe(elapsed, method=request.method, route=route, status=str(status_code))
+    http_sql_queries.observe(profile.queries, route=route)
+    http_sql_seconds.observe(profile.seconds, route=route)
+    if slow_ms > 0 and elapsed * 1000 >= slow_ms:
+        slow_requests.inc(route=route)
+        _log_slow(request, route, status_code, elapsed, profile)
+
+
+def _log_slow(request, route: str, status_code: int, elapsed: float, profile: RequestProfile):
+    lines = [
+        f"Requisição lenta {request.method} {request.url.path} ({route}) -> {status_code}: "
+        f"{elapsed * 1000:.0f} ms, {profile.queries} consultas SQL em {profile.seconds * 1000:.0f} ms"
+    ]
+    top = sorted((profile.statements or {}).items(), key=lambda item: item[1][1], reverse=True)
+    for statement, (count, seconds) in top[:SLOW_LOG_STATEMENTS]:
+        lines.append(f"  {count}x {seconds * 1000:.1f} ms: {' '.join(statement.split())}")
+    logger.warning("\n".join(lines))
+
+
+@contextmanager
+def moonraker_call(printer_id: int | None, call: str):
+    started = time.perf_counter()
+    printer = "" if printer_id is None else str(printer_id)
+    try:
+        yield
+    except Exception as exc:
+        moonraker_errors.inc(printer_id=printer, call=call, error=type(exc).__name__)
+        raise
+    finally:
+        moonraker_requests.observe(time.perf_counter() - started, printer_id=printer, call=call)
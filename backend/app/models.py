@@ -1,22 +1,29 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text
+from sqlalchemy import BigInteger, Column, Integer, SmallInteger, String, Date, DateTime, ForeignKey, Float, REAL, Text, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
+# Live jobs: listed by /jobs/current, always on the timeline, never archived
+ACTIVE_JOB_STATUSES = ("printing", "paused", "queued")
+
 
 class Printer(Base):
     __tablename__ = "printers"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(120), nullable=False)
     moonraker_url = Column(String(255), nullable=True)
     status = Column(String(50), nullable=False, default="offline")
+    # Spool currently loaded, charged for jobs ingested from Moonraker
+    filament_id = Column(Integer, ForeignKey("filaments.id", ondelete="SET NULL"), nullable=True)
+    # Comma-separated materials the scheduler may assign; empty accepts any
+    materials = Column(String(255), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    jobs = relationship("Job", back_populates="printer")
+    jobs = relationship("Job", back_populates="printer", passive_deletes=True)
 
 
 class Filament(Base):
     __tablename__ = "filaments"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(120), nullable=False)
     color = Column(String(50), nullable=True)
     material = Column(String(50), nullable=True)
@@ -28,8 +35,8 @@ class Filament(Base):
 
 class Job(Base):
     __tablename__ = "jobs"
-    id = Column(Integer, primary_key=True, index=True)
-    printer_id = Column(Integer, ForeignKey("printers.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    printer_id = Column(Integer, ForeignKey("printers.id", ondelete="CASCADE"), nullable=False)
     filename = Column(String(255), nullable=False)
     material = Column(String(80), nullable=True)
     duration_estimated = Column(Float, nullable=True)
@@ -37,19 +44,132 @@ class Job(Base):
     start_time = Column(DateTime, nullable=True)
     end_time = Column(DateTime, nullable=True)
     status = Column(String(50), nullable=False, default="queued")
+    progress = Column(Float, nullable=True)
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+    filament_id = Column(Integer, ForeignKey("filaments.id", ondelete="SET NULL"), nullable=True)
+    filament_used_grams = Column(Float, nullable=True)
+    # Set by the jobs_filament_cost trigger from price_per_kg when the usage is recorded
+    filament_cost = Column(Float, nullable=True)
+    source_key = Column(String(255), nullable=True, unique=True)
     printer = relationship("Printer", back_populates="jobs")
 
+    __table_args__ = (
+        Index("ix_jobs_start_time_id", start_time.desc().nulls_last(), id.desc()),
+        Index(
+            "ix_jobs_history_start_time",
+            start_time.desc().nulls_last(),
+            id.desc(),
+            postgresql_where=status.not_in(ACTIVE_JOB_STATUSES),
+        ),
+        Index(
+            "ix_jobs_active_printer",
+            printer_id,
+            start_time.desc().nulls_last(),
+            postgresql_where=status.in_(ACTIVE_JOB_STATUSES),
+        ),
+        Index("ix_jobs_printer_start_time", printer_id, start_time.desc().nulls_last()),
+        Index("ix_jobs_queue", priority.desc(), id, postgresql_where=status == "queued"),
+    )
+
+
+class JobArchive(Base):
+    # Finished jobs moved out of jobs by app.job_archive once they are older than
+    # job_archive_after_days. Range-partitioned by month on start_time (migration
+    # 0009); the archiver creates the partitions. Same columns as jobs, read-only.
+    __tablename__ = "jobs_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    printer_id = Column(Integer, ForeignKey("printers.id", ondelete="CASCADE"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    material = Column(String(80), nullable=True)
+    duration_estimated = Column(Float, nullable=True)
+    duration_slicer = Column(Float, nullable=True)
+    start_time = Column(DateTime, primary_key=True)
+    end_time = Column(DateTime, nullable=True)
+    status = Column(String(50), nullable=False)
+    progress = Column(Float, nullable=True)
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+    filament_id = Column(Integer, ForeignKey("filaments.id", ondelete="SET NULL"), nullable=True)
+    filament_used_grams = Column(Float, nullable=True)
+    filament_cost = Column(Float, nullable=True)
+    source_key = Column(String(255), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_archive_start_time_id", start_time.desc().nulls_last(), id.desc()),
+        Index("ix_jobs_archive_printer_start_time", printer_id, start_time.desc().nulls_last()),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+
+
+class FilamentLedger(Base):
+    # Append-only stock movements; filaments.stock_grams is the materialized balance.
+    __tablename__ = "filament_ledger"
+    id = Column(BigInteger, primary_key=True)
+    filament_id = Column(Integer, ForeignKey("filaments.id", ondelete="CASCADE"), nullable=False)
+    job_id = Column(Integer, nullable=True)
+    delta_grams = Column(Float, nullable=False)
+    reason = Column(String(30), nullable=False)
+    note = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_filament_ledger_filament_id", filament_id, id.desc()),)
+
 
 class Setting(Base):
     __tablename__ = "settings"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     key = Column(String(120), unique=True, nullable=False)
     value = Column(Text, nullable=True)
 
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
+    # Bumped by POST /auth/password; tokens issued before carry an older pwv
+    password_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RateLimit(Base):
+    __tablename__ = "rate_limits"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+    key = Column(String(255), primary_key=True)
+    tat = Column(Float, nullable=False)
+
+
+class JobStat(Base):
+    # Maintained by the job_stats_trigger on jobs (see migration 0005), one row per
+    # printer, UTC start day and material. No FK: rows go away with their jobs.
+    __tablename__ = "job_stats"
+    printer_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    material = Column(String(80), primary_key=True, default="")
+    jobs_total = Column(Integer, nullable=False, default=0)
+    jobs_succeeded = Column(Integer, nullable=False, default=0)
+    jobs_failed = Column(Integer, nullable=False, default=0)
+    print_seconds = Column(Float, nullable=False, default=0)
+    estimate_samples = Column(Integer, nullable=False, default=0)
+    estimated_seconds = Column(Float, nullable=False, default=0)
+    slicer_seconds = Column(Float, nullable=False, default=0)
+    estimate_abs_error = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_job_stats_day", day),)
+
+
+class PrinterTelemetry(Base):
+    # Minute rollups written by app.telemetry. Range-partitioned by day on ts
+    # (migration 0008); the writer creates and drops the partitions. No FK, like
+    # job_stats: retention removes the rows of deleted printers.
+    __tablename__ = "printer_telemetry"
+    printer_id = Column(Integer, primary_key=True)
+    ts = Column(DateTime, primary_key=True)
+    samples = Column(SmallInteger, nullable=False)
+    extruder_temp = Column(REAL, nullable=True)
+    extruder_target = Column(REAL, nullable=True)
+    bed_temp = Column(REAL, nullable=True)
+    bed_target = Column(REAL, nullable=True)
+    progress = Column(REAL, nullable=True)
+    speed = Column(REAL, nullable=True)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import os
+import posixpath
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+
+from .config import settings
+from .metrics import moonraker_call
+from .moonraker_poller import poller
+from .printer_state import printer_state
+
+
+class MetadataCache:
+    # G-code metadata only changes when the file is re-uploaded, which bumps its mtime.
+    def __init__(self, max_entries: int, revalidate_seconds: float):
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: OrderedDict[tuple[int, str, float], dict] = OrderedDict()
+        self._latest: dict[tuple[int, str], tuple[float, float]] = {}
+        self._inflight: dict[tuple[int, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, printer_id: int, filename: str) -> dict | None:
+        latest = self._latest.get((printer_id, filename))
+        if latest is None:
+            return None
+        modified, checked_at = latest
+        entry = self._entries.get((printer_id, filename, modified))
+        if entry is None:
+            return None
+        snapshot = printer_state.get(printer_id)
+        printing_it = snapshot is not None and snapshot.filename == filename and snapshot.state in ("printing", "paused")
+        if printing_it or time.monotonic() - checked_at < self.revalidate_seconds:
+            self._entries.move_to_end((printer_id, filename, modified))
+            return entry
+        return None
+
+    async def get(self, printer_id: int, base_url: str, filename: str) -> dict:
+        cached = self._fresh(printer_id, filename)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        key = (printer_id, filename)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            metadata = await self._fetch(printer_id, base_url, filename)
+            future.set_result(metadata)
+            return metadata
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved here so unawaited failures are not logged
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fetch(self, printer_id: int, base_url: str, filename: str) -> dict:
+        with moonraker_call(printer_id, "metadata"):
+            response = await poller.client.get(f"{base_url}/server/files/metadata", params={"filename": filename})
+            response.raise_for_status()
+        metadata = response.json().get("result", {})
+        modified = float(metadata.get("modified") or 0)
+        self._latest[(printer_id, filename)] = (modified, time.monotonic())
+        self._entries[(printer_id, filename, modified)] = metadata
+        self._entries.move_to_end((printer_id, filename, modified))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return metadata
+
+
+class ThumbnailCache:
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._writes = 0
+
+    @staticmethod
+    def etag(printer_id: int, filename: str, modified: float, relative_path: str) -> str:
+        digest = hashlib.sha256(f"{printer_id}:{filename}:{modified}:{relative_path}".encode()).hexdigest()
+        return digest[:32]
+
+    @staticmethod
+    def source_path(filename: str, relative_path: str) -> str | None:
+        # relative_path comes from the printer's metadata; never leave the gcodes root
+        source = posixpath.normpath(posixpath.join(posixpath.dirname(filename), relative_path))
+        if posixpath.isabs(source) or source in (".", "..") or source.startswith("../"):
+            return None
+        return source
+
+    def path_for(self, etag: str) -> Path:
+        return self.directory / etag[:2] / f"{etag}.png"
+
+    async def get(self, printer_id: int, base_url: str, source: str, etag: str) -> Path:
+        path = self.path_for(etag)
+        if await asyncio.to_thread(self._touch, path):
+            return path
+        with moonraker_call(printer_id, "thumbnail"):
+            response = await poller.client.get(f"{base_url}/server/files/gcodes/{quote(source)}")
+            response.raise_for_status()
+        await asyncio.to_thread(self._write, path, response.content)
+        return path
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        # Hits bump the mtime, so eviction drops the least recently used files
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _write(self, path: Path, content: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict()
+
+    def _evict(self):
+        files = sorted(self.directory.glob("*/*.png"), key=lambda item: item.stat().st_mtime)
+        for stale in files[: max(len(files) - self.max_files, 0)]:
+            stale.unlink(missing_ok=True)
+
+
+metadata_cache = MetadataCache(settings.moonraker_metadata_cache_size, settings.moonraker_metadata_revalidate_seconds)
+thumbnail_cache = ThumbnailCache(settings.moonraker_thumbnail_dir, settings.moonraker_thumbnail_max_files)
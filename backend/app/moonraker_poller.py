@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import httpx
+from sqlalchemy import select
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .metrics import moonraker_call
+from .models import Printer
+from .printer_state import PrinterStateStore, PrinterSnapshot, printer_state
+from .settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUERY = (
+    "printer/objects/query?print_stats&display_status"
+    "&extruder=temperature,target&heater_bed=temperature,target&gcode_move=speed,speed_factor"
+)
+
+
+@dataclass
+class _Backoff:
+    failures: int = 0
+    next_attempt: float = 0.0
+
+
+async def load_targets() -> list[tuple[int, str]]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Printer.id, Printer.moonraker_url).where(Printer.moonraker_url.is_not(None)))
+        rows = result.all()
+    return [(printer_id, url.rstrip("/")) for printer_id, url in rows if url and url.strip()]
+
+
+class MoonrakerPoller:
+    def __init__(self, store: PrinterStateStore):
+        self.store = store
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._backoff: dict[int, _Backoff] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.moonraker_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.moonraker_max_connections,
+                    max_keepalive_connections=settings.moonraker_max_connections,
+                ),
+            )
+        return self._client
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - keep the loop alive
+                logger.exception("Falha no ciclo de polling do Moonraker")
+            await asyncio.sleep(settings_service.current.moonraker_poll_interval)
+
+    async def poll_once(self):
+        targets = await load_targets()
+        known = {printer_id for printer_id, _ in targets}
+        for printer_id in set(self._backoff) - known:
+            self._backoff.pop(printer_id, None)
+        for printer_id in set(self.store.all()) - known:
+            self.store.remove(printer_id)
+
+        now = time.monotonic()
+        due = [(printer_id, url) for printer_id, url in targets if self._backoff.get(printer_id, _Backoff()).next_attempt <= now]
+        if not due:
+            return
+
+        await asyncio.gather(*(self._poll_printer(printer_id, url) for printer_id, url in due))
+
+    async def _poll_printer(self, printer_id: int, base_url: str) -> PrinterSnapshot:
+        backoff = self._backoff.setdefault(printer_id, _Backoff())
+        try:
+            with moonraker_call(printer_id, "status"):
+                response = await asyncio.wait_for(
+                    self.client.get(f"{base_url}/{STATUS_QUERY}"),
+                    timeout=settings_service.current.moonraker_timeout,
+                )
+                response.raise_for_status()
+            status = response.json().get("result", {}).get("status", {})
+        except Exception as exc:
+            backoff.failures += 1
+            current = settings_service.current
+            delay = min(current.moonraker_poll_interval * 2 ** (backoff.failures - 1), current.moonraker_max_backoff)
+            backoff.next_attempt = time.monotonic() + delay
+            return self.store.mark_offline(printer_id, f"{type(exc).__name__}: {exc}")
+
+        backoff.failures = 0
+        backoff.next_attempt = 0.0
+        return self.store.apply_status(printer_id, status)
+
+
+poller = MoonrakerPoller(printer_state)
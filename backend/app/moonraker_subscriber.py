@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+
+import websockets
+
+from .metrics import moonraker_call, moonraker_errors, moonraker_updates
+from .moonraker_poller import load_targets
+from .printer_state import PrinterStateStore, printer_state
+from .settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_OBJECTS = {
+    "print_stats": None,
+    "display_status": None,
+    # Telemetry only; Klipper pushes temperatures several times per second
+    "extruder": ["temperature", "target"],
+    "heater_bed": ["temperature", "target"],
+    "gcode_move": ["speed", "speed_factor"],
+}
+SUBSCRIBE_REQUEST_ID = 1
+
+
+def websocket_url(base_url: str) -> str:
+    scheme, _, rest = base_url.partition("://")
+    return f"{'wss' if scheme == 'https' else 'ws'}://{rest}/websocket"
+
+
+def merge_status(status: dict, update: dict):
+    for name, fields in update.items():
+        if isinstance(fields, dict):
+            status.setdefault(name, {}).update(fields)
+        else:
+            status[name] = fields
+
+
+class MoonrakerSubscriber:
+    # One long-lived printer.objects.subscribe connection per configured printer.
+    def __init__(self, store: PrinterStateStore):
+        self.store = store
+        self._connections: dict[int, tuple[str, asyncio.Task]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        tasks = [task for _, task in self._connections.values()]
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._connections.clear()
+        self._task = None
+
+    async def _supervise(self):
+        while True:
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - keep supervising
+                logger.exception("Falha ao sincronizar conexões Moonraker")
+            await asyncio.sleep(settings_service.current.moonraker_reconcile_interval)
+
+    async def reconcile(self):
+        targets = dict(await load_targets())
+        for printer_id, (url, task) in list(self._connections.items()):
+            if targets.get(printer_id) != url or task.done():
+                task.cancel()
+                del self._connections[printer_id]
+                if printer_id not in targets:
+                    self.store.remove(printer_id)
+        for printer_id, url in targets.items():
+            if printer_id not in self._connections:
+                task = asyncio.create_task(self._maintain(printer_id, url))
+                self._connections[printer_id] = (url, task)
+
+    async def _maintain(self, printer_id: int, base_url: str):
+        failures = 0
+        while True:
+            try:
+                await self._listen(printer_id, base_url)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                failures += 1
+                self.store.mark_offline(printer_id, f"{type(exc).__name__}: {exc}")
+            current = settings_service.current
+            delay = min(current.moonraker_poll_interval * 2 ** max(failures - 1, 0), current.moonraker_max_backoff)
+            await asyncio.sleep(delay)
+
+    async def _listen(self, printer_id: int, base_url: str):
+        timeout = settings_service.current.moonraker_timeout
+        with moonraker_call(printer_id, "connect"):
+            connection = await websockets.connect(
+                websocket_url(base_url),
+                open_timeout=timeout,
+                ping_interval=20,
+                ping_timeout=timeout * 2,
+                max_size=2**22,
+            )
+        try:
+            await self._subscribe(connection)
+            status: dict = {}
+            async for raw in connection:
+                message = json.loads(raw)
+                method = message.get("method")
+                if message.get("id") == SUBSCRIBE_REQUEST_ID:
+                    if "error" in message:
+                        # Klippy not ready yet; Moonraker sends notify_klippy_ready later.
+                        self.store.mark_offline(printer_id, str(message["error"].get("message")))
+                        continue
+                    status = message.get("result", {}).get("status", {})
+                elif method == "notify_status_update":
+                    merge_status(status, message["params"][0])
+                    moonraker_updates.inc(printer_id=str(printer_id))
+                elif method == "notify_klippy_ready":
+                    await self._subscribe(connection)
+                    continue
+                elif method in ("notify_klippy_shutdown", "notify_klippy_disconnected"):
+                    status = {}
+                    self.store.mark_offline(printer_id, method)
+                    continue
+                else:
+                    continue
+                self.store.apply_status(printer_id, {name: dict(fields) for name, fields in status.items()})
+        except Exception as exc:
+            moonraker_errors.inc(printer_id=str(printer_id), call="subscription", error=type(exc).__name__)
+            raise
+        finally:
+            await connection.close()
+
+    async def _subscribe(self, connection):
+        await connection.send(
+            json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "method": "printer.objects.subscribe",
+                    "params": {"objects": SUBSCRIBE_OBJECTS},
+                    "id": SUBSCRIBE_REQUEST_ID,
+                }
+            )
+        )
+
+
+subscriber = MoonrakerSubscriber(printer_state)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import update
+
+from .database import AsyncSessionLocal
+from .event_bus import event_bus
+from .models import Printer
+
+logger = logging.getLogger(__name__)
+
+PRINTER_STATE = "printer_state"
+REPLICA_REFRESH_SECONDS = 5
+
+
+@dataclass
+class PrinterSnapshot:
+    printer_id: int
+    state: str = "offline"
+    filename: str | None = None
+    progress: float | None = None
+    current_layer: int | None = None
+    total_layer: int | None = None
+    print_duration: float | None = None
+    updated_at: datetime | None = None
+    error: str | None = None
+    status: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "filename": self.filename,
+            "progress": self.progress,
+            "current_layer": self.current_layer,
+            "total_layer": self.total_layer,
+            "print_duration": self.print_duration,
+            "timestamp": self.updated_at.isoformat() if self.updated_at else None,
+            "error": self.error,
+        }
+
+
+StateListener = Callable[[PrinterSnapshot, str | None], None]
+SnapshotObserver = Callable[[PrinterSnapshot, PrinterSnapshot | None], None]
+
+
+class PrinterStateStore:
+    def __init__(self):
+        self._snapshots: dict[int, PrinterSnapshot] = {}
+        self._listeners: list[StateListener] = []
+        self._observers: list[SnapshotObserver] = []
+        # Bumped when a printer's state changes: the live field in the /timeline body
+        self.version = 0
+
+    def add_listener(self, listener: StateListener):
+        # Called only when a printer's state changes
+        self._listeners.append(listener)
+
+    def add_observer(self, observer: SnapshotObserver):
+        # Called for every snapshot, e.g. to follow progress
+        self._observers.append(observer)
+
+    def get(self, printer_id: int) -> PrinterSnapshot | None:
+        return self._snapshots.get(printer_id)
+
+    def all(self) -> dict[int, PrinterSnapshot]:
+        return dict(self._snapshots)
+
+    def apply_status(self, printer_id: int, status: dict) -> PrinterSnapshot:
+        print_stats = status.get("print_stats", {})
+        display_status = status.get("display_status", {})
+        snapshot = PrinterSnapshot(
+            printer_id=printer_id,
+            state=print_stats.get("state", "offline"),
+            filename=print_stats.get("filename") or None,
+            progress=display_status.get("progress"),
+            current_layer=display_status.get("current_layer"),
+            total_layer=display_status.get("total_layer"),
+            print_duration=print_stats.get("print_duration"),
+            updated_at=datetime.utcnow(),
+            status=status,
+        )
+        return self._store(snapshot)
+
+    def mark_offline(self, printer_id: int, error: str) -> PrinterSnapshot:
+        previous = self._snapshots.get(printer_id)
+        snapshot = PrinterSnapshot(
+            printer_id=printer_id,
+            updated_at=previous.updated_at if previous else None,
+            error=error,
+        )
+        return self._store(snapshot)
+
+    def remove(self, printer_id: int):
+        if self._snapshots.pop(printer_id, None) is not None:
+            self.version += 1
+
+    def apply_remote(self, data: dict):
+        # Copy of a snapshot taken by the leader worker. Listeners and observers
+        # already ran there (status writer, ingestion, timeline events).
+        snapshot = PrinterSnapshot(**{**data, "updated_at": datetime.fromisoformat(data["updated_at"]) if data["updated_at"] else None})
+        self._replace(snapshot)
+
+    def _replace(self, snapshot: PrinterSnapshot) -> PrinterSnapshot | None:
+        previous = self._snapshots.get(snapshot.printer_id)
+        self._snapshots[snapshot.printer_id] = snapshot
+        if previous is None or previous.state != snapshot.state:
+            self.version += 1
+        return previous
+
+    def _store(self, snapshot: PrinterSnapshot) -> PrinterSnapshot:
+        previous = self._replace(snapshot)
+        previous_state = previous.state if previous else None
+        for observer in self._observers:
+            observer(snapshot, previous)
+        if previous_state != snapshot.state:
+            for listener in self._listeners:
+                listener(snapshot, previous_state)
+        return snapshot
+
+
+class PrinterStatusWriter:
+    # Coalesces state transitions and writes printer.status only when it changed.
+    def __init__(self):
+        self._pending: dict[int, str] = {}
+        self._task: asyncio.Task | None = None
+
+    def on_state_change(self, snapshot: PrinterSnapshot, previous_state: str | None):
+        self._pending[snapshot.printer_id] = snapshot.state
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        while self._pending:
+            changes, self._pending = self._pending, {}
+            try:
+                async with AsyncSessionLocal() as db:
+                    for printer_id, state in changes.items():
+                        await db.execute(update(Printer).where(Printer.id == printer_id).values(status=state))
+                    await db.commit()
+            except Exception:  # pragma: no cover - retried on the next transition
+                logger.exception("Falha ao gravar status das impressoras")
+                return
+
+
+class PrinterStateReplicator:
+    # Only the leader worker polls Moonraker. Followers need the live state too
+    # (/timeline overlay, /moonraker/sync, scheduling), so every change is published,
+    # plus a periodic refresh for duration/layer counters. The raw status stays local.
+    def __init__(self):
+        self._published: dict[int, tuple[tuple, float]] = {}
+
+    def on_snapshot(self, snapshot: PrinterSnapshot, previous: PrinterSnapshot | None):
+        key = (snapshot.state, snapshot.progress, snapshot.error, snapshot.filename, snapshot.current_layer, snapshot.total_layer)
+        now = time.monotonic()
+        last = self._published.get(snapshot.printer_id)
+        if last is not None and last[0] == key and now - last[1] < REPLICA_REFRESH_SECONDS:
+            return
+        self._published[snapshot.printer_id] = (key, now)
+        data = {
+            "printer_id": snapshot.printer_id,
+            "state": snapshot.state,
+            "filename": snapshot.filename,
+            "progress": snapshot.progress,
+            "current_layer": snapshot.current_layer,
+            "total_layer": snapshot.total_layer,
+            "print_duration": snapshot.print_duration,
+            "updated_at": snapshot.updated_at,
+            "error": snapshot.error,
+        }
+        event_bus.publish(PRINTER_STATE, data, local=False)
+
+
+printer_state = PrinterStateStore()
+status_writer = PrinterStatusWriter()
+replicator = PrinterStateReplicator()
+# Registered first so followers hold the new state before the timeline event that follows
+printer_state.add_observer(replicator.on_snapshot)
+printer_state.add_listener(status_writer.on_state_change)
+event_bus.subscribe(PRINTER_STATE, printer_state.apply_remote)
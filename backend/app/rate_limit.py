@@ -0,0 +1,128 @@
+import time
+from dataclasses import dataclass
+from typing import Protocol
+
+from fastapi import Request
+from sqlalchemy import Float, bindparam, text
+
+from .config import settings
+from .database import async_engine
+from .settings_service import settings_service
+
+SWEEP_INTERVAL_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class RateLimitStore(Protocol):
+    async def acquire(self, key: str, increment: float, window: float, now: float) -> RateLimitDecision: ...
+
+
+class MemoryRateLimitStore:
+    # GCRA: one "theoretical arrival time" per key instead of a timestamp per request.
+    def __init__(self):
+        self._tat: dict[str, float] = {}
+        self._next_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    async def acquire(self, key: str, increment: float, window: float, now: float) -> RateLimitDecision:
+        if now >= self._next_sweep:
+            self._sweep(now)
+        new_tat = max(self._tat.get(key, now), now) + increment
+        if new_tat - now > window:
+            return RateLimitDecision(False, new_tat - now - window)
+        self._tat[key] = new_tat
+        return RateLimitDecision(True)
+
+    def _sweep(self, now: float):
+        # A key whose TAT is in the past has a full bucket, same as an unknown key.
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+
+
+_FLOAT_PARAMS = [bindparam(name, type_=Float) for name in ("now", "increment", "window")]
+
+
+class PostgresRateLimitStore:
+    _ACQUIRE = text(
+        """
+        INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :increment)
+        ON CONFLICT (key) DO UPDATE SET tat = GREATEST(rate_limits.tat, :now) + :increment
+        WHERE GREATEST(rate_limits.tat, :now) + :increment - :now <= :window
+        RETURNING tat
+        """
+    ).bindparams(*_FLOAT_PARAMS)
+    _CURRENT = text("SELECT tat FROM rate_limits WHERE key = :key")
+    _SWEEP = text("DELETE FROM rate_limits WHERE tat < :now").bindparams(_FLOAT_PARAMS[0])
+
+    def __init__(self, engine=async_engine):
+        self.engine = engine
+        self._next_sweep = 0.0
+
+    async def acquire(self, key: str, increment: float, window: float, now: float) -> RateLimitDecision:
+        async with self.engine.begin() as conn:
+            if now >= self._next_sweep:
+                self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+                await conn.execute(self._SWEEP, {"now": now})
+            if increment > window:
+                return RateLimitDecision(False, increment - window)
+            params = {"key": key, "now": now, "increment": increment, "window": window}
+            if (await conn.execute(self._ACQUIRE, params)).first() is not None:
+                return RateLimitDecision(True)
+            tat = await conn.scalar(self._CURRENT, {"key": key})
+        return RateLimitDecision(False, max((tat or now) + increment - now - window, 0.0))
+
+
+def parse_costs(raw: str) -> dict[str, float]:
+    costs = {}
+    for item in raw.split(","):
+        prefix, _, cost = item.partition("=")
+        if prefix.strip() and cost.strip():
+            costs[prefix.strip()] = float(cost)
+    return costs
+
+
+class RateLimiter:
+    def __init__(self, store: RateLimitStore, costs: dict[str, float]):
+        self.store = store
+        self.set_costs(costs)
+        self.rejections = 0
+
+    def set_costs(self, costs: dict[str, float]):
+        # Longest prefix first so "/auth/login" wins over "/auth"
+        self.costs = sorted(costs.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def cost_for(self, path: str) -> float:
+        for prefix, cost in self.costs:
+            if path.startswith(prefix):
+                return cost
+        return 1.0
+
+    async def check(self, request: Request) -> RateLimitDecision:
+        cost = self.cost_for(request.url.path)
+        if cost <= 0:
+            return RateLimitDecision(True)
+        identifier = request.client.host if request.client else "global"
+        current = settings_service.current
+        window = float(current.rate_limit_window_seconds)
+        emission_interval = window / max(current.rate_limit_requests, 1)
+        decision = await self.store.acquire(identifier, cost * emission_interval, window, time.time())
+        if not decision.allowed:
+            self.rejections += 1
+        return decision
+
+
+def _build_store() -> RateLimitStore:
+    if settings.rate_limit_backend == "postgres":
+        return PostgresRateLimitStore()
+    return MemoryRateLimitStore()
+
+
+rate_limiter = RateLimiter(_build_store(), parse_costs(settings_service.current.rate_limit_costs))
+settings_service.add_listener(lambda current: rate_limiter.set_costs(parse_costs(current.rate_limit_costs)))
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .event_bus import RESYNC, event_bus
+from .serialization import dumps
+
+CACHE_CONTROL = "private, no-cache"
+CACHE_TABLES = "cache_tables"
+# Triggers on jobs also move filament stock (0006) and the stats rollups (0005).
+TABLE_RESOURCES = {
+    "printers": ("printers", "timeline"),
+    "jobs": ("jobs", "timeline", "filaments"),
+    "filaments": ("filaments",),
+    "filament_ledger": ("filaments",),
+    "settings": ("settings",),
+}
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    return etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+
+
+class ResponseCache:
+    # One version counter per resource collection, bumped after every commit that
+    # touched its tables. The ETag is derived from the versions read *before* the
+    # query, so a write racing with the query only makes the next ETag newer.
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions: dict[str, int] = {}
+        self._bodies: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, *resources: str):
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+
+    def etag(self, request: Request, resources: tuple[str, ...], extra: str = "") -> str:
+        versions = ",".join(f"{resource}={self._versions.get(resource, 0)}" for resource in resources)
+        raw = f"{self._epoch}|{versions}|{request.url.path}?{request.url.query}|{extra}"
+        return '"' + hashlib.sha1(raw.encode()).hexdigest()[:24] + '"'
+
+    def lookup(self, request: Request, resources: tuple[str, ...], extra: str = "") -> tuple[str, Response | None]:
+        etag = self.etag(request, resources, extra)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if if_none_match(request, etag):
+            self.not_modified += 1
+            return etag, Response(status_code=304, headers=headers)
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+        if body is None:
+            self.misses += 1
+            return etag, None
+        self.hits += 1
+        return etag, Response(body, media_type="application/json", headers=headers)
+
+    def store(self, etag: str, data, adapter: TypeAdapter | None = None) -> Response:
+        # Without an adapter the data is trusted (plain values read from the DB) and
+        # written as is; ORM objects go through the adapter for validation.
+        if adapter is None:
+            body = dumps(data)
+        else:
+            body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+        if self.max_entries > 0:
+            with self._lock:
+                self._bodies[etag] = body
+                self._bodies.move_to_end(etag)
+                while len(self._bodies) > self.max_entries:
+                    self._bodies.popitem(last=False)
+        return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    def mark_changed(self, *tables: str):
+        # For writes that bypass the ORM session (raw connections, other processes)
+        self.bump(*{resource for table in tables for resource in TABLE_RESOURCES.get(table, (table,))})
+
+    def reset(self):
+        # Events from other workers may have been missed: forget every ETag
+        with self._lock:
+            self._epoch = uuid.uuid4().hex[:8]
+            self._bodies.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._bodies), "hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+response_cache = ResponseCache(settings.response_cache_entries)
+event_bus.subscribe(CACHE_TABLES, lambda data: response_cache.mark_changed(*data["tables"]))
+event_bus.subscribe(RESYNC, lambda data: response_cache.reset())
+
+_CHANGED_KEY = "response_cache_tables"
+
+
+def _track(session: Session, table):
+    if table is not None and getattr(table, "name", None):
+        session.info.setdefault(_CHANGED_KEY, set()).add(table.name)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session: Session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        _track(session, getattr(instance, "__table__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statements(orm_execute_state):
+    # insert()/update()/delete() statements executed through a session (bulk import,
+    # ingestion upserts, status writer) never show up in a flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _track(orm_execute_state.session, getattr(orm_execute_state.statement, "table", None))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session):
+    tables = session.info.pop(_CHANGED_KEY, None)
+    if tables:
+        event_bus.publish(CACHE_TABLES, {"tables": sorted(tables)})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -1,19 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
-from ..dependencies import authenticate_user
-from ..database import get_db
-from ..security import create_access_token
+from ..auth_cache import Principal
+from ..dependencies import authenticate_user, change_password, get_current_user
+from ..database import get_async_db
+from ..models import User
+from ..security import PasswordHashingBusy, create_access_token, get_password_hash_async, verify_and_update_password
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+HASHING_BUSY = HTTPException(
+    status_code=503,
+    detail="Muitos logins simultâneos. Tente novamente em instantes.",
+    headers={"Retry-After": "1"},
+)
+
 
 @router.post("/login", response_model=schemas.Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHashingBusy:
+        raise HASHING_BUSY
     if not user:
         raise HTTPException(status_code=400, detail="Credenciais inválidas")
-    token = create_access_token(user.email)
+    token = create_access_token(user.email, password_version=user.password_version)
     return schemas.Token(access_token=token)
+
+
+@router.post("/password", response_model=schemas.Token)
+async def update_password(
+    payload: schemas.PasswordChange,
+    principal: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await db.get(User, principal.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
+    try:
+        valid, _ = await verify_and_update_password(payload.current_password, user.hashed_password)
+        if not valid:
+            raise HTTPException(status_code=400, detail="Senha atual incorreta")
+        hashed_password = await get_password_hash_async(payload.new_password)
+    except PasswordHashingBusy:
+        raise HASHING_BUSY
+    change_password(user, hashed_password)
+    # The commit invalidates the cached principal on every worker (auth_cache)
+    await db.commit()
+    # Other sessions lose their tokens; the caller gets a new one
+    return schemas.Token(access_token=create_access_token(user.email, password_version=user.password_version))
@@ -1,21 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from ..database import get_db
+from ..bulk import BulkImport, export_response
+from ..database import get_async_db, get_db
+from ..filament_ledger import adjust_stock, record_imported_stock, record_stock_set
+from ..response_cache import response_cache
 from ..dependencies import get_current_user
 
 router = APIRouter(prefix="/filaments", tags=["filaments"], dependencies=[Depends(get_current_user)])
 
 
+FILAMENT_LIST = TypeAdapter(list[schemas.FilamentOut])
+
+
 @router.get("/", response_model=list[schemas.FilamentOut])
-def list_filaments(db: Session = Depends(get_db)):
-    return db.query(models.Filament).order_by(models.Filament.id).all()
+def list_filaments(request: Request, db: Session = Depends(get_db)):
+    etag, cached = response_cache.lookup(request, ("filaments",))
+    if cached is not None:
+        return cached
+    return response_cache.store(etag, db.query(models.Filament).order_by(models.Filament.id).all(), FILAMENT_LIST)
+
+
+@router.get("/bulk")
+def export_filaments(export_format: str = Query(default="ndjson", alias="format")):
+    fields = list(schemas.FilamentOut.model_fields)
+    query = select(*(getattr(models.Filament, field) for field in fields)).order_by(models.Filament.id)
+    return export_response(query, fields, export_format, "filaments")
+
+
+@router.post("/bulk")
+async def import_filaments(request: Request, db: AsyncSession = Depends(get_async_db)):
+    result = await BulkImport(
+        db, models.Filament, schemas.FilamentCreate, track=models.Filament.stock_grams, on_change=record_imported_stock
+    ).run(request)
+    return result
 
 
 @router.post("/", response_model=schemas.FilamentOut, status_code=status.HTTP_201_CREATED)
 def create_filament(payload: schemas.FilamentCreate, db: Session = Depends(get_db)):
     filament = models.Filament(**payload.model_dump())
     db.add(filament)
+    db.flush()
+    record_stock_set(db, filament.id, None, filament.stock_grams, "initial")
     db.commit()
     db.refresh(filament)
     return filament
@@ -23,16 +52,41 @@ def create_filament(payload: schemas.FilamentCreate, db: Session = Depends(get_d
 
 @router.put("/{filament_id}", response_model=schemas.FilamentOut)
 def update_filament(filament_id: int, payload: schemas.FilamentUpdate, db: Session = Depends(get_db)):
-    filament = db.query(models.Filament).filter(models.Filament.id == filament_id).first()
+    # Row lock so a manual stock correction cannot interleave with job consumption
+    filament = db.query(models.Filament).filter(models.Filament.id == filament_id).with_for_update().first()
     if not filament:
         raise HTTPException(status_code=404, detail="Filamento não encontrado")
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    if "stock_grams" in update_data:
+        record_stock_set(db, filament.id, filament.stock_grams, update_data["stock_grams"])
+    for field, value in update_data.items():
         setattr(filament, field, value)
     db.commit()
     db.refresh(filament)
     return filament
 
 
+@router.post("/{filament_id}/adjust", response_model=schemas.FilamentOut)
+def adjust_filament(filament_id: int, payload: schemas.FilamentAdjust, db: Session = Depends(get_db)):
+    if not adjust_stock(db, filament_id, payload.delta_grams, "adjust", payload.note):
+        raise HTTPException(status_code=404, detail="Filamento não encontrado")
+    db.commit()
+    return db.get(models.Filament, filament_id)
+
+
+@router.get("/{filament_id}/ledger", response_model=list[schemas.FilamentLedgerOut])
+def filament_ledger(
+    filament_id: int,
+    before: int | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    query = db.query(models.FilamentLedger).filter(models.FilamentLedger.filament_id == filament_id)
+    if before is not None:
+        query = query.filter(models.FilamentLedger.id < before)
+    return query.order_by(models.FilamentLedger.id.desc()).limit(limit).all()
+
+
 @router.delete("/{filament_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_filament(filament_id: int, db: Session = Depends(get_db)):
     filament = db.query(models.Filament).filter(models.Filament.id == filament_id).first()
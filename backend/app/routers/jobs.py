@@ -1,29 +1,216 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select, union_all
 
 from .. import models, schemas
-from ..database import get_db
+from ..bulk import BulkImport, export_response, missing_ids
+from ..database import get_async_db, get_db
 from ..dependencies import get_current_user
+from ..eta import eta_engine
+from ..job_archive import reaches_archive
+from ..response_cache import response_cache
+from ..timeline_hub import timeline_hub
 
 router = APIRouter(prefix="/jobs", tags=["jobs"], dependencies=[Depends(get_current_user)])
 
+JOB_FIELDS = tuple(schemas.JobOut.model_fields)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
-@router.get("/", response_model=list[schemas.JobOut])
-def list_jobs(db: Session = Depends(get_db)):
-    return db.scalars(select(models.Job).order_by(models.Job.start_time.desc().nullslast())).all()
 
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
-@router.get("/current", response_model=list[schemas.JobOut])
-def current_jobs(db: Session = Depends(get_db)):
-    active_status = {"printing", "queued"}
-    return db.query(models.Job).filter(models.Job.status.in_(active_status)).all()
 
+class JobFilters:
+    def __init__(
+        self,
+        printer_id: list[int] | None = Query(default=None),
+        status_filter: list[str] | None = Query(default=None, alias="status"),
+        material: str | None = None,
+        start_from: datetime | None = Query(default=None, alias="from"),
+        start_to: datetime | None = Query(default=None, alias="to"),
+        cursor: str | None = None,
+        limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        fields: str | None = None,
+        archive: bool = False,
+    ):
+        self.printer_id = printer_id
+        self.status = status_filter
+        self.material = material
+        self.start_from = _as_utc(start_from)
+        self.start_to = _as_utc(start_to)
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = fields
+        # Finished jobs past job_archive_after_days are only read when asked for,
+        # or when the range starts before the archive horizon
+        self.archive = archive or reaches_archive(self.start_from)
 
-@router.get("/history", response_model=list[schemas.JobOut])
-def job_history(db: Session = Depends(get_db)):
-    return db.query(models.Job).filter(models.Job.status.not_in(("printing", "queued"))).all()
+
+def _encode_cursor(start_time: datetime | None, job_id: int) -> str:
+    raw = json.dumps([start_time.isoformat() if start_time else None, job_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_time, job_id = json.loads(raw)
+        return (datetime.fromisoformat(start_time) if start_time else None), int(job_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _selected_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(JOB_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in JOB_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campo inválido: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", *selected]))
+
+
+def _after_cursor(model, start_time: datetime | None, job_id: int):
+    # Ordering is (start_time DESC NULLS LAST, id DESC)
+    if start_time is None:
+        return and_(model.start_time.is_(None), model.id < job_id)
+    return or_(
+        model.start_time < start_time,
+        and_(model.start_time == start_time, model.id < job_id),
+        model.start_time.is_(None),
+    )
+
+
+def _filtered(query, filters: JobFilters, model=models.Job):
+    if filters.printer_id:
+        query = query.where(model.printer_id.in_(filters.printer_id))
+    if filters.status:
+        query = query.where(model.status.in_(filters.status))
+    if filters.material:
+        query = query.where(model.material == filters.material)
+    if filters.start_from:
+        query = query.where(model.start_time >= filters.start_from)
+    if filters.start_to:
+        query = query.where(model.start_time < filters.start_to)
+    return query
+
+
+def _sources(filters: JobFilters) -> list:
+    return [models.Job, models.JobArchive] if filters.archive else [models.Job]
+
+
+def _newest_first(columns):
+    return columns.start_time.desc().nullslast(), columns.id.desc()
+
+
+def _active(model):
+    return model.status.in_(models.ACTIVE_JOB_STATUSES)
+
+
+def _finished(model):
+    return model.status.not_in(models.ACTIVE_JOB_STATUSES)
+
+
+def _cached_page(request: Request, db: Session, filters: JobFilters, *conditions):
+    etag, cached = response_cache.lookup(request, ("jobs",))
+    if cached is not None:
+        return cached
+    return response_cache.store(etag, _page_jobs(db, filters, *conditions))
+
+
+def _page_query(filters: JobFilters, *conditions):
+    # conditions take the model, so they apply to jobs_archive as well
+    fields = _selected_fields(filters.fields)
+    names = list(dict.fromkeys(["id", "start_time", *fields]))
+    cursor = _decode_cursor(filters.cursor) if filters.cursor else None
+    queries = []
+    for model in _sources(filters):
+        query = select(*(getattr(model, name) for name in names)).where(*(condition(model) for condition in conditions))
+        query = _filtered(query, filters, model)
+        if cursor:
+            query = query.where(_after_cursor(model, *cursor))
+        queries.append(query.order_by(*_newest_first(model)).limit(filters.limit + 1))
+    if len(queries) == 1:
+        query = queries[0]
+    else:
+        # Each branch stops at one page on its own index; the merge keeps the newest
+        merged = union_all(*queries).subquery()
+        query = select(merged).order_by(*_newest_first(merged.c)).limit(filters.limit + 1)
+    return query
+
+
+def _page_jobs(db: Session, filters: JobFilters, *conditions) -> dict:
+    fields = _selected_fields(filters.fields)
+    rows = db.execute(_page_query(filters, *conditions)).all()
+    next_cursor = None
+    if len(rows) > filters.limit:
+        rows = rows[: filters.limit]
+        next_cursor = _encode_cursor(rows[-1].start_time, rows[-1].id)
+    items = [{field: getattr(row, field) for field in fields} for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/", response_model=schemas.JobPage)
+def list_jobs(request: Request, filters: JobFilters = Depends(), db: Session = Depends(get_db)):
+    return _cached_page(request, db, filters)
+
+
+@router.get("/current", response_model=schemas.JobPage)
+def current_jobs(request: Request, filters: JobFilters = Depends(), db: Session = Depends(get_db)):
+    # ETAs are absolute times, so a page only changes when the engine republishes them
+    etag, cached = response_cache.lookup(request, ("jobs",), f"eta={eta_engine.version}")
+    if cached is not None:
+        return cached
+    # Only finished jobs are archived
+    filters.archive = False
+    page = _page_jobs(db, filters, _active)
+    for item in page["items"]:
+        item["predicted_duration"], item["eta"] = eta_engine.get(item["id"]) or (None, None)
+    return response_cache.store(etag, page)
+
+
+@router.get("/eta-model")
+def eta_model():
+    return eta_engine.corrections()
+
+
+@router.get("/history", response_model=schemas.JobPage)
+def job_history(request: Request, filters: JobFilters = Depends(), db: Session = Depends(get_db)):
+    return _cached_page(request, db, filters, _finished)
+
+
+@router.get("/bulk")
+def export_jobs(filters: JobFilters = Depends(), export_format: str = Query(default="ndjson", alias="format")):
+    fields = _selected_fields(filters.fields)
+    queries = [_filtered(select(*(getattr(model, field) for field in fields)), filters, model) for model in _sources(filters)]
+    if len(queries) == 1:
+        query = queries[0].order_by(models.Job.id)
+    else:
+        merged = union_all(*queries).subquery()
+        query = select(merged).order_by(merged.c.id)
+    return export_response(query, fields, export_format, "jobs")
+
+
+async def _check_references(db: AsyncSession, chunk: list[tuple[int, dict]]):
+    return [
+        *await missing_ids(db, models.Printer.id, chunk, "printer_id", "Impressora não encontrada"),
+        *await missing_ids(db, models.Filament.id, chunk, "filament_id", "Filamento não encontrado"),
+    ]
+
+
+@router.post("/bulk")
+async def import_jobs(request: Request, db: AsyncSession = Depends(get_async_db)):
+    result = await BulkImport(db, models.Job, schemas.JobCreate, check=_check_references).run(request)
+    timeline_hub.notify_reload()
+    return result
 
 
 @router.post("/", response_model=schemas.JobOut, status_code=status.HTTP_201_CREATED)
@@ -31,10 +218,13 @@ def create_job(payload: schemas.JobCreate, db: Session = Depends(get_db)):
     printer = db.get(models.Printer, payload.printer_id)
     if not printer:
         raise HTTPException(status_code=404, detail="Impressora não encontrada")
+    if payload.filament_id and not db.get(models.Filament, payload.filament_id):
+        raise HTTPException(status_code=404, detail="Filamento não encontrado")
     job = models.Job(**payload.model_dump())
     db.add(job)
     db.commit()
     db.refresh(job)
+    timeline_hub.notify_job(job.id)
     return job
 
 
@@ -48,10 +238,13 @@ def update_job(job_id: int, payload: schemas.JobUpdate, db: Session = Depends(ge
         printer = db.get(models.Printer, update_data["printer_id"])
         if not printer:
             raise HTTPException(status_code=404, detail="Impressora não encontrada")
+    if update_data.get("filament_id") and not db.get(models.Filament, update_data["filament_id"]):
+        raise HTTPException(status_code=404, detail="Filamento não encontrado")
     for field, value in update_data.items():
         setattr(job, field, value)
     db.commit()
     db.refresh(job)
+    timeline_hub.notify_job(job.id)
     return job
 
 
@@ -62,4 +255,5 @@ def delete_job(job_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Job não encontrado")
     db.delete(job)
     db.commit()
+    timeline_hub.notify_job(job_id)
     return None
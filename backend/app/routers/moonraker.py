@@ -1,48 +1,106 @@
-from datetime import datetime
-import httpx
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from urllib.parse import urlencode
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models
-from ..database import get_db
-from ..dependencies import get_current_user
+from ..database import get_async_db
+from ..dependencies import get_current_user, optional_oauth2_scheme
+from ..moonraker_files import ThumbnailCache, metadata_cache, thumbnail_cache
+from ..printer_state import printer_state
+from ..response_cache import if_none_match
+from ..security import create_thumbnail_token, verify_thumbnail_token
 
-router = APIRouter(prefix="/moonraker", tags=["moonraker"], dependencies=[Depends(get_current_user)])
+router = APIRouter(prefix="/moonraker", tags=["moonraker"])
 
+THUMBNAIL_CACHE_CONTROL = "private, max-age=86400, immutable"
 
-async def _fetch_json(url: str):
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
 
-
-@router.get("/sync/{printer_id}")
-async def sync_printer(printer_id: int, db: Session = Depends(get_db)):
-    printer = db.get(models.Printer, printer_id)
+async def _configured_printer(db: AsyncSession, printer_id: int) -> models.Printer:
+    printer = await db.get(models.Printer, printer_id)
     if not printer or not printer.moonraker_url:
         raise HTTPException(status_code=404, detail="Impressora não configurada para sincronização")
+    return printer
+
 
-    base = printer.moonraker_url.rstrip("/")
+async def _metadata(printer: models.Printer, filename: str) -> dict:
     try:
-        status = await _fetch_json(f"{base}/printer/objects/query?print_stats&display_status")
-    except Exception as exc:  # pragma: no cover - external call
+        return await metadata_cache.get(printer.id, printer.moonraker_url.rstrip("/"), filename)
+    except Exception as exc:
         raise HTTPException(status_code=502, detail=f"Erro ao consultar Moonraker: {exc}")
 
-    printer.status = status.get("result", {}).get("status", {}).get("print_stats", {}).get("state", "offline")
-    db.commit()
-
-    payload = status.get("result", {}).get("status", {})
-    display_status = payload.get("display_status", {})
-    print_stats = payload.get("print_stats", {})
-
-    return {
-        "printer": printer.name,
-        "state": printer.status,
-        "filename": print_stats.get("filename"),
-        "progress": display_status.get("progress"),
-        "current_layer": display_status.get("current_layer"),
-        "total_layer": display_status.get("total_layer"),
-        "print_duration": print_stats.get("print_duration"),
-        "timestamp": datetime.utcnow().isoformat(),
-    }
+
+async def thumbnail_access(
+    printer_id: int, filename: str, token: str | None = None, bearer: str | None = Depends(optional_oauth2_scheme)
+):
+    # The signed URLs from /metadata work in <img>; API clients can still send the header
+    if token is not None:
+        if not verify_thumbnail_token(token, printer_id, filename):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+        return
+    if bearer is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"}
+        )
+    await get_current_user(bearer)
+
+
+@router.get("/sync/{printer_id}", dependencies=[Depends(get_current_user)])
+async def sync_printer(printer_id: int, db: AsyncSession = Depends(get_async_db)):
+    printer = await _configured_printer(db, printer_id)
+
+    snapshot = printer_state.get(printer_id)
+    if snapshot is None:
+        return {
+            "printer": printer.name,
+            "state": printer.status,
+            "filename": None,
+            "progress": None,
+            "current_layer": None,
+            "total_layer": None,
+            "print_duration": None,
+            "timestamp": None,
+            "error": None,
+        }
+    return {"printer": printer.name, **snapshot.as_dict()}
+
+
+@router.get("/{printer_id}/metadata", dependencies=[Depends(get_current_user)])
+async def file_metadata(printer_id: int, filename: str, db: AsyncSession = Depends(get_async_db)):
+    printer = await _configured_printer(db, printer_id)
+    metadata = await _metadata(printer, filename)
+    token = create_thumbnail_token(printer_id, filename)
+    thumbnails = [
+        {**thumb, "url": f"/moonraker/{printer_id}/thumbnail?{urlencode({'filename': filename, 'index': index, 'token': token})}"}
+        for index, thumb in enumerate(metadata.get("thumbnails") or [])
+    ]
+    return {**metadata, "thumbnails": thumbnails}
+
+
+@router.get("/{printer_id}/thumbnail", dependencies=[Depends(thumbnail_access)])
+async def file_thumbnail(
+    printer_id: int,
+    request: Request,
+    filename: str,
+    index: int | None = Query(default=None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    printer = await _configured_printer(db, printer_id)
+    metadata = await _metadata(printer, filename)
+    thumbnails = metadata.get("thumbnails") or []
+    if not thumbnails or (index is not None and index >= len(thumbnails)):
+        raise HTTPException(status_code=404, detail="Miniatura não encontrada")
+    thumb = thumbnails[index] if index is not None else max(thumbnails, key=lambda item: item.get("width") or 0)
+    source = ThumbnailCache.source_path(filename, thumb.get("relative_path") or "")
+    if source is None:
+        raise HTTPException(status_code=404, detail="Miniatura não encontrada")
+
+    tag = ThumbnailCache.etag(printer_id, filename, float(metadata.get("modified") or 0), thumb["relative_path"])
+    headers = {"ETag": f'"{tag}"', "Cache-Control": THUMBNAIL_CACHE_CONTROL}
+    if if_none_match(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        path = await thumbnail_cache.get(printer.id, printer.moonraker_url.rstrip("/"), source, tag)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Erro ao baixar miniatura: {exc}")
+    return FileResponse(path, media_type="image/png", headers=headers)
@@ -1,23 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from ..database import get_db
+from ..bulk import BulkImport, export_response, missing_ids
+from ..database import get_async_db, get_db
 from ..dependencies import get_current_user
+from ..response_cache import response_cache
+from ..telemetry import RESOLUTIONS, series
+from ..timeline_hub import timeline_hub
 
 router = APIRouter(prefix="/printers", tags=["printers"], dependencies=[Depends(get_current_user)])
 
+PRINTER_LIST = TypeAdapter(list[schemas.PrinterOut])
+MAX_TELEMETRY_POINTS = 20000
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _telemetry_resolution(span: timedelta) -> str:
+    if span <= timedelta(hours=1):
+        return "1s"
+    if span <= timedelta(days=2):
+        return "1m"
+    return "1h"
+
 
 @router.get("/", response_model=list[schemas.PrinterOut])
-def list_printers(db: Session = Depends(get_db)):
-    return db.query(models.Printer).order_by(models.Printer.id).all()
+def list_printers(request: Request, db: Session = Depends(get_db)):
+    etag, cached = response_cache.lookup(request, ("printers",))
+    if cached is not None:
+        return cached
+    return response_cache.store(etag, db.query(models.Printer).order_by(models.Printer.id).all(), PRINTER_LIST)
+
+
+@router.get("/bulk")
+def export_printers(export_format: str = Query(default="ndjson", alias="format")):
+    fields = list(schemas.PrinterOut.model_fields)
+    query = select(*(getattr(models.Printer, field) for field in fields)).order_by(models.Printer.id)
+    return export_response(query, fields, export_format, "printers")
+
+
+async def _check_filaments(db: AsyncSession, chunk: list[tuple[int, dict]]):
+    return await missing_ids(db, models.Filament.id, chunk, "filament_id", "Filamento não encontrado")
+
+
+@router.post("/bulk")
+async def import_printers(request: Request, db: AsyncSession = Depends(get_async_db)):
+    result = await BulkImport(db, models.Printer, schemas.PrinterCreate, check=_check_filaments).run(request)
+    timeline_hub.notify_reload()
+    return result
 
 
 @router.post("/", response_model=schemas.PrinterOut, status_code=status.HTTP_201_CREATED)
 def create_printer(printer: schemas.PrinterCreate, db: Session = Depends(get_db)):
+    if printer.filament_id and not db.get(models.Filament, printer.filament_id):
+        raise HTTPException(status_code=404, detail="Filamento não encontrado")
     entity = models.Printer(**printer.model_dump())
     db.add(entity)
     db.commit()
     db.refresh(entity)
+    timeline_hub.notify_printer(entity.id)
     return entity
 
 
@@ -26,10 +75,14 @@ def update_printer(printer_id: int, payload: schemas.PrinterUpdate, db: Session
     printer = db.query(models.Printer).filter(models.Printer.id == printer_id).first()
     if not printer:
         raise HTTPException(status_code=404, detail="Impressora não encontrada")
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    if update_data.get("filament_id") and not db.get(models.Filament, update_data["filament_id"]):
+        raise HTTPException(status_code=404, detail="Filamento não encontrado")
+    for field, value in update_data.items():
         setattr(printer, field, value)
     db.commit()
     db.refresh(printer)
+    timeline_hub.notify_printer(printer.id)
     return printer
 
 
@@ -40,4 +93,27 @@ def delete_printer(printer_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Impressora não encontrada")
     db.delete(printer)
     db.commit()
+    timeline_hub.notify_printer(printer_id)
     return None
+
+
+@router.get("/{printer_id}/telemetry")
+async def printer_telemetry(
+    printer_id: int,
+    start: datetime | None = Query(default=None, alias="from"),
+    end: datetime | None = Query(default=None, alias="to"),
+    resolution: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(models.Printer, printer_id) is None:
+        raise HTTPException(status_code=404, detail="Impressora não encontrada")
+    end = _as_utc(end) or datetime.utcnow()
+    start = _as_utc(start) or end - timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Intervalo inválido")
+    resolution = resolution or _telemetry_resolution(end - start)
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Resolução inválida: {resolution}")
+    if (end - start).total_seconds() / RESOLUTIONS[resolution][0] > MAX_TELEMETRY_POINTS:
+        raise HTTPException(status_code=400, detail="Intervalo grande demais para a resolução")
+    return await series(db, printer_id, resolution, start, end)
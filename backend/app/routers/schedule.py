@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..database import get_async_db
+from ..dependencies import get_current_user
+from ..scheduler import Schedule, build_schedule, from_timestamp
+from ..timeline_hub import timeline_hub
+
+router = APIRouter(prefix="/schedule", tags=["schedule"], dependencies=[Depends(get_current_user)])
+
+
+def _schedule_out(schedule: Schedule, unavailable: list[int], now) -> dict:
+    printers = []
+    makespan_end = None
+    for slot in schedule.slots:
+        assignments = schedule.assignments[slot.printer_id]
+        jobs = [
+            {
+                "job_id": item.job.job_id,
+                "filename": item.job.filename,
+                "material": item.job.material,
+                "priority": item.job.priority,
+                "start": from_timestamp(item.start),
+                "end": from_timestamp(item.end),
+                "material_change": item.material_change,
+            }
+            for item in assignments
+        ]
+        if jobs and (makespan_end is None or jobs[-1]["end"] > makespan_end):
+            makespan_end = jobs[-1]["end"]
+        printers.append({"printer_id": slot.printer_id, "name": slot.name, "available_at": from_timestamp(slot.available_at), "jobs": jobs})
+    return {
+        "generated_at": now,
+        "makespan_end": makespan_end,
+        "printers": printers,
+        "unavailable_printers": unavailable,
+        "unassigned": [{"job_id": job.job_id, "filename": job.filename, "reason": reason} for job, reason in schedule.unassigned],
+    }
+
+
+@router.get("/", response_model=schemas.ScheduleOut)
+async def get_schedule(db: AsyncSession = Depends(get_async_db)):
+    return _schedule_out(*await build_schedule(db))
+
+
+@router.post("/apply", response_model=schemas.ScheduleOut)
+async def apply_schedule(db: AsyncSession = Depends(get_async_db)):
+    schedule, unavailable, now = await build_schedule(db)
+    moves = [
+        {"job_id": item.job.job_id, "target_printer_id": item.printer_id}
+        for assignments in schedule.assignments.values()
+        for item in assignments
+        if item.job.printer_id != item.printer_id
+    ]
+    if moves:
+        # Only still-queued jobs move; one started meanwhile keeps its printer.
+        statement = (
+            update(models.Job.__table__)
+            .where(models.Job.id == bindparam("job_id"), models.Job.status == "queued")
+            .values(printer_id=bindparam("target_printer_id"))
+        )
+        await db.execute(statement, moves)
+        await db.commit()
+        timeline_hub.notify_reload()
+    return {**_schedule_out(schedule, unavailable, now), "moved": len(moves)}
@@ -1,16 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..database import get_db
 from ..dependencies import get_current_user
+from ..response_cache import response_cache
+from ..settings_service import settings_service
 
 router = APIRouter(prefix="/settings", tags=["settings"], dependencies=[Depends(get_current_user)])
 
 
+SETTING_LIST = TypeAdapter(list[schemas.SettingOut])
+
+
+def _validate(key: str, value: str | None):
+    try:
+        settings_service.validate(key, value)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Valor inválido para {key}: {exc}")
+
+
 @router.get("/", response_model=list[schemas.SettingOut])
-def list_settings(db: Session = Depends(get_db)):
-    return db.query(models.Setting).order_by(models.Setting.key).all()
+def list_settings(request: Request, db: Session = Depends(get_db)):
+    etag, cached = response_cache.lookup(request, ("settings",))
+    if cached is not None:
+        return cached
+    return response_cache.store(etag, db.query(models.Setting).order_by(models.Setting.key).all(), SETTING_LIST)
+
+
+@router.get("/runtime")
+def runtime_settings():
+    return settings_service.current.model_dump()
 
 
 @router.post("/", response_model=schemas.SettingOut, status_code=status.HTTP_201_CREATED)
@@ -18,10 +39,13 @@ def create_setting(payload: schemas.SettingCreate, db: Session = Depends(get_db)
     existing = db.query(models.Setting).filter(models.Setting.key == payload.key).first()
     if existing:
         raise HTTPException(status_code=400, detail="Chave já cadastrada")
+    _validate(payload.key, payload.value)
     setting = models.Setting(**payload.model_dump())
     db.add(setting)
+    settings_service.notify(db)
     db.commit()
     db.refresh(setting)
+    settings_service.load(db)
     return setting
 
 
@@ -30,10 +54,14 @@ def update_setting(setting_id: int, payload: schemas.SettingUpdate, db: Session
     setting = db.get(models.Setting, setting_id)
     if not setting:
         raise HTTPException(status_code=404, detail="Configuração não encontrada")
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    update_data = payload.model_dump(exclude_unset=True)
+    _validate(update_data.get("key", setting.key), update_data.get("value", setting.value))
+    for field, value in update_data.items():
         setattr(setting, field, value)
+    settings_service.notify(db)
     db.commit()
     db.refresh(setting)
+    settings_service.load(db)
     return setting
 
 
@@ -43,5 +71,7 @@ def delete_setting(setting_id: int, db: Session = Depends(get_db)):
     if not setting:
         raise HTTPException(status_code=404, detail="Configuração não encontrada")
     db.delete(setting)
+    settings_service.notify(db)
     db.commit()
+    settings_service.load(db)
     return None
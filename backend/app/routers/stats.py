@@ -0,0 +1,104 @@
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..database import get_async_db
+from ..dependencies import get_current_user
+
+router = APIRouter(prefix="/stats", tags=["stats"], dependencies=[Depends(get_current_user)])
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 3660
+SECONDS_PER_DAY = 86400
+
+# Days are UTC calendar days of Job.start_time.
+SUMS = (
+    func.sum(models.JobStat.jobs_total).label("jobs"),
+    func.sum(models.JobStat.jobs_succeeded).label("succeeded"),
+    func.sum(models.JobStat.jobs_failed).label("failed"),
+    func.sum(models.JobStat.print_seconds).label("print_seconds"),
+    func.sum(models.JobStat.estimate_samples).label("estimate_samples"),
+    func.sum(models.JobStat.slicer_seconds).label("slicer_seconds"),
+    func.sum(models.JobStat.estimate_abs_error).label("estimate_abs_error"),
+)
+
+
+class StatsWindow:
+    def __init__(
+        self,
+        start: date | None = Query(default=None, alias="from"),
+        end: date | None = Query(default=None, alias="to"),
+        printer_id: list[int] | None = Query(default=None),
+    ):
+        self.end = end or datetime.utcnow().date()
+        self.start = start or self.end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+        if self.start > self.end:
+            raise HTTPException(status_code=400, detail="Intervalo inválido")
+        if (self.end - self.start).days >= MAX_WINDOW_DAYS:
+            raise HTTPException(status_code=400, detail="Intervalo muito longo")
+        self.printer_id = printer_id
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def apply(self, query):
+        query = query.where(models.JobStat.day >= self.start, models.JobStat.day <= self.end)
+        if self.printer_id:
+            query = query.where(models.JobStat.printer_id.in_(self.printer_id))
+        return query
+
+
+def _ratio(numerator, denominator) -> float | None:
+    return float(numerator) / float(denominator) if denominator else None
+
+
+def _metrics(row, days: int | None) -> dict:
+    succeeded, failed = int(row.succeeded or 0), int(row.failed or 0)
+    print_seconds = float(row.print_seconds or 0)
+    samples = int(row.estimate_samples or 0)
+    return {
+        "jobs": int(row.jobs or 0),
+        "succeeded": succeeded,
+        "failed": failed,
+        "success_rate": _ratio(succeeded, succeeded + failed),
+        "print_hours": print_seconds / 3600,
+        "utilization": _ratio(print_seconds, days * SECONDS_PER_DAY) if days else None,
+        "estimate_samples": samples,
+        "estimate_mean_abs_error": _ratio(row.estimate_abs_error or 0, samples),
+        "estimate_error_ratio": _ratio(row.estimate_abs_error or 0, row.slicer_seconds),
+    }
+
+
+@router.get("/summary", response_model=schemas.StatsSummary)
+async def stats_summary(window: StatsWindow = Depends(), db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(window.apply(select(models.JobStat.printer_id, *SUMS)).group_by(models.JobStat.printer_id))).all()
+    names = dict((await db.execute(select(models.Printer.id, models.Printer.name))).all())
+    printers = [
+        {"printer_id": row.printer_id, "name": names.get(row.printer_id), **_metrics(row, window.days)}
+        for row in sorted(rows, key=lambda row: row.printer_id)
+    ]
+    totals = (await db.execute(window.apply(select(*SUMS)))).one()
+    # Fleet utilization: printer-days with a rollup would undercount idle printers.
+    fleet_days = window.days * (len(window.printer_id) if window.printer_id else max(len(names), 1))
+    return {"start": window.start, "end": window.end, "totals": _metrics(totals, fleet_days), "printers": printers}
+
+
+@router.get("/daily", response_model=list[schemas.DailyStats])
+async def stats_daily(window: StatsWindow = Depends(), db: AsyncSession = Depends(get_async_db)):
+    query = (
+        window.apply(select(models.JobStat.printer_id, models.JobStat.day, *SUMS))
+        .group_by(models.JobStat.printer_id, models.JobStat.day)
+        .order_by(models.JobStat.day, models.JobStat.printer_id)
+    )
+    rows = (await db.execute(query)).all()
+    return [{"printer_id": row.printer_id, "day": row.day, **_metrics(row, 1)} for row in rows]
+
+
+@router.get("/materials", response_model=list[schemas.MaterialStats])
+async def stats_materials(window: StatsWindow = Depends(), db: AsyncSession = Depends(get_async_db)):
+    query = window.apply(select(models.JobStat.material, *SUMS)).group_by(models.JobStat.material).order_by(models.JobStat.material)
+    rows = (await db.execute(query)).all()
+    return [{"material": row.material or None, **_metrics(row, None)} for row in rows]
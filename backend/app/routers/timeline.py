@@ -1,52 +1,70 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import Printer, Job
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..dependencies import get_current_user
+from ..eta import eta_engine
+from ..printer_state import printer_state
+from ..response_cache import response_cache
+from ..timeline_hub import default_window_start, fetch_timeline, timeline_hub
 
 router = APIRouter(tags=["timeline"])
 
 
-def _build_timeline(db: Session):
-    printers = db.query(Printer).order_by(Printer.id).all()
-    jobs = db.query(Job).order_by(Job.start_time.desc().nullslast()).all()
-    timeline = []
-    for printer in printers:
-        printer_jobs = [job for job in jobs if job.printer_id == printer.id]
-        timeline.append(
-            {
-                "id": printer.id,
-                "name": printer.name,
-                "status": (printer.status or "offline").lower(),
-                "moonraker_url": printer.moonraker_url,
-                "jobs": [
-                    {
-                        "id": job.id,
-                        "filename": job.filename,
-                        "status": job.status,
-                        "start_time": job.start_time.isoformat() if job.start_time else None,
-                        "end_time": job.end_time.isoformat() if job.end_time else None,
-                    }
-                    for job in printer_jobs
-                ],
-            }
-        )
-    return timeline
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_client_message(text: str) -> tuple[int | None, str | None]:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None, None
+    if isinstance(message, dict) and message.get("action") == "resume":
+        since = message.get("since")
+        return (since if isinstance(since, int) else None), message.get("epoch")
+    return None, None
 
 
 @router.get("/timeline", dependencies=[Depends(get_current_user)])
-def get_timeline(db: Session = Depends(get_db)):
-    return {"items": _build_timeline(db)}
+async def get_timeline(
+    request: Request,
+    start: datetime | None = Query(default=None, alias="from"),
+    end: datetime | None = Query(default=None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Printer states and ETAs are overlaid on the rows, and the default window slides:
+    # all are part of the ETag (the window at hour granularity). Progress and the other
+    # fields that move during a print are left to /ws/timeline, or no 304 would ever match.
+    window = "" if start else default_window_start().strftime("%Y%m%d%H")
+    etag, cached = response_cache.lookup(request, ("timeline",), f"{printer_state.version}|{eta_engine.version}|{window}")
+    if cached is not None:
+        return cached
+    start = _as_utc(start) or default_window_start()
+    end = _as_utc(end)
+    payload = {
+        "items": await fetch_timeline(db, start, end, live=False),
+        "from": start,
+        "to": end,
+    }
+    return response_cache.store(etag, payload)
 
 
 @router.websocket("/ws/timeline")
-async def timeline_socket(websocket: WebSocket, db: Session = Depends(get_db)):
+async def timeline_socket(websocket: WebSocket, since: int | None = None, epoch: str | None = None):
     await websocket.accept()
     try:
-        await websocket.send_json({"items": _build_timeline(db)})
+        await timeline_hub.subscribe(websocket, since, epoch)
         while True:
-            await websocket.receive_text()
-            await websocket.send_json({"items": _build_timeline(db), "ts": datetime.utcnow().isoformat()})
+            text = await websocket.receive_text()
+            # Any message other than {"action": "resume", ...} asks for a fresh snapshot.
+            timeline_hub.unsubscribe(websocket)
+            since, epoch = _parse_client_message(text)
+            await timeline_hub.subscribe(websocket, since, epoch)
     except WebSocketDisconnect:
         return
+    finally:
+        timeline_hub.unsubscribe(websocket)
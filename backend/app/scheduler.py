@@ -0,0 +1,187 @@
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Filament, Job, Printer
+from .printer_state import PrinterSnapshot, printer_state
+from .settings_service import settings_service
+
+EPOCH = datetime(1970, 1, 1)
+UNAVAILABLE_STATES = {"offline", "error", "shutdown", "maintenance"}
+RUNNING_STATES = {"printing", "paused"}
+
+
+def to_timestamp(value: datetime) -> float:
+    # Naive UTC like the rest of the app; datetime.timestamp() would assume local time
+    return (value - EPOCH).total_seconds()
+
+
+def from_timestamp(value: float) -> datetime:
+    return EPOCH + timedelta(seconds=value)
+
+
+def normalize_material(material: str | None) -> str | None:
+    material = (material or "").strip().upper()
+    return material or None
+
+
+def parse_materials(raw: str | None) -> frozenset[str] | None:
+    materials = frozenset(filter(None, (normalize_material(item) for item in (raw or "").split(","))))
+    return materials or None
+
+
+@dataclass
+class PrinterSlot:
+    printer_id: int
+    name: str
+    available_at: float
+    # None accepts any material
+    materials: frozenset[str] | None = None
+    loaded_material: str | None = None
+
+
+@dataclass
+class QueuedJob:
+    job_id: int
+    filename: str
+    material: str | None
+    duration: float
+    priority: int = 0
+    printer_id: int | None = None
+
+
+@dataclass
+class Assignment:
+    job: QueuedJob
+    printer_id: int
+    start: float
+    end: float
+    material_change: bool
+
+
+@dataclass
+class Schedule:
+    slots: list[PrinterSlot]
+    assignments: dict[int, list[Assignment]] = field(default_factory=dict)
+    unassigned: list[tuple[QueuedJob, str]] = field(default_factory=list)
+
+
+def plan(printers: list[PrinterSlot], jobs: list[QueuedJob], changeover_seconds: float = 0) -> Schedule:
+    # Greedy list scheduling by (priority DESC, id): each job goes to the compatible
+    # printer where it would finish first. Printers sharing accepted materials and
+    # loaded spool are interchangeable for that choice, so each such group keeps a
+    # min-heap by availability and only the group heads are compared per job.
+    schedule = Schedule(slots=printers, assignments={slot.printer_id: [] for slot in printers})
+    slots = {slot.printer_id: slot for slot in printers}
+    loaded = {slot.printer_id: slot.loaded_material for slot in printers}
+    groups: dict[tuple, list[tuple[float, int]]] = {}
+    for slot in printers:
+        groups.setdefault((slot.materials, slot.loaded_material), []).append((slot.available_at, slot.printer_id))
+    for heap in groups.values():
+        heapq.heapify(heap)
+    compatible: dict[str | None, list[tuple]] = {}
+
+    for job in sorted(jobs, key=lambda item: (-item.priority, item.job_id)):
+        material = job.material
+        keys = compatible.get(material)
+        if keys is None:
+            keys = compatible[material] = [
+                key for key in groups if material is None or key[0] is None or material in key[0]
+            ]
+        best = None
+        for key in keys:
+            heap = groups[key]
+            if not heap:
+                continue
+            available_at, printer_id = heap[0]
+            change = material is not None and key[1] is not None and key[1] != material
+            finish = available_at + (changeover_seconds if change else 0) + job.duration
+            if best is None or (finish, printer_id) < (best[0], best[2]):
+                best = (finish, key, printer_id, change)
+        if best is None:
+            reason = "Nenhuma impressora compatível" if printers else "Nenhuma impressora disponível"
+            schedule.unassigned.append((job, reason))
+            continue
+        finish, key, printer_id, change = best
+        available_at, _ = heapq.heappop(groups[key])
+        start = available_at + (changeover_seconds if change else 0)
+        schedule.assignments[printer_id].append(Assignment(job, printer_id, start, finish, change))
+        if material is not None:
+            loaded[printer_id] = material
+        new_key = (slots[printer_id].materials, loaded[printer_id])
+        if new_key not in groups:
+            groups[new_key] = []
+            compatible.clear()
+        heapq.heappush(groups[new_key], (finish, printer_id))
+    return schedule
+
+
+def _remaining_seconds(snapshot: PrinterSnapshot | None, running: Job | None, now: datetime) -> float:
+    if snapshot is not None and snapshot.progress and 0.01 < snapshot.progress < 1 and snapshot.print_duration:
+        return snapshot.print_duration * (1 - snapshot.progress) / snapshot.progress
+    if running is not None:
+        estimate = running.duration_slicer or running.duration_estimated
+        if estimate and running.start_time:
+            return max(estimate - (now - running.start_time).total_seconds(), 0)
+        if estimate:
+            return estimate * (1 - (running.progress or 0))
+    return settings_service.current.schedule_default_job_minutes * 60 * (1 - ((snapshot.progress if snapshot else None) or 0))
+
+
+def available_at(printer, snapshot: PrinterSnapshot | None, running: Job | None, now: datetime) -> datetime | None:
+    if snapshot is not None:
+        if snapshot.error or snapshot.state in UNAVAILABLE_STATES:
+            return None
+        state = snapshot.state
+    else:
+        # Not monitored live: trust printers.status, except the "offline" default of manual printers
+        state = (printer.status or "").lower()
+        if state in UNAVAILABLE_STATES and (printer.moonraker_url or state != "offline"):
+            return None
+    if state in RUNNING_STATES:
+        return now + timedelta(seconds=_remaining_seconds(snapshot, running, now))
+    return now
+
+
+async def build_schedule(db: AsyncSession, now: datetime | None = None) -> tuple[Schedule, list[int], datetime]:
+    now = now or datetime.utcnow()
+    printers = (
+        await db.execute(
+            select(Printer.id, Printer.name, Printer.status, Printer.moonraker_url, Printer.materials, Filament.material.label("loaded"))
+            .outerjoin(Filament, Filament.id == Printer.filament_id)
+            .order_by(Printer.id)
+        )
+    ).all()
+    running = {
+        job.printer_id: job
+        for job in (
+            await db.execute(
+                select(Job.printer_id, Job.start_time, Job.progress, Job.duration_slicer, Job.duration_estimated)
+                .where(Job.status.in_(RUNNING_STATES))
+                .order_by(Job.start_time.asc().nullsfirst())
+            )
+        ).all()
+    }
+    slots, unavailable = [], []
+    for printer in printers:
+        ready = available_at(printer, printer_state.get(printer.id), running.get(printer.id), now)
+        if ready is None:
+            unavailable.append(printer.id)
+            continue
+        slots.append(PrinterSlot(printer.id, printer.name, to_timestamp(ready), parse_materials(printer.materials), normalize_material(printer.loaded)))
+
+    default_duration = settings_service.current.schedule_default_job_minutes * 60
+    queued = [
+        QueuedJob(row.id, row.filename, normalize_material(row.material), row.duration_estimated or row.duration_slicer or default_duration, row.priority or 0, row.printer_id)
+        for row in (
+            await db.execute(
+                select(Job.id, Job.filename, Job.material, Job.duration_estimated, Job.duration_slicer, Job.priority, Job.printer_id)
+                .where(Job.status == "queued")
+                .order_by(Job.priority.desc(), Job.id)
+            )
+        ).all()
+    ]
+    return plan(slots, queued, settings_service.current.schedule_changeover_minutes * 60), unavailable, now
@@ -1,11 +1,13 @@
-from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from datetime import date, datetime
+from pydantic import BaseModel, EmailStr, Field
 
 
 class PrinterBase(BaseModel):
     name: str
     moonraker_url: str | None = None
     status: str | None = "offline"
+    filament_id: int | None = None
+    materials: str | None = None
 
 
 class PrinterCreate(PrinterBase):
@@ -16,6 +18,8 @@ class PrinterUpdate(BaseModel):
     name: str | None = None
     moonraker_url: str | None = None
     status: str | None = None
+    filament_id: int | None = None
+    materials: str | None = None
 
 
 class PrinterOut(PrinterBase):
@@ -56,6 +60,24 @@ class FilamentOut(FilamentBase):
         from_attributes = True
 
 
+class FilamentAdjust(BaseModel):
+    delta_grams: float
+    note: str | None = None
+
+
+class FilamentLedgerOut(BaseModel):
+    id: int
+    filament_id: int
+    job_id: int | None = None
+    delta_grams: float
+    reason: str
+    note: str | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class JobBase(BaseModel):
     printer_id: int
     filename: str
@@ -65,6 +87,10 @@ class JobBase(BaseModel):
     start_time: datetime | None = None
     end_time: datetime | None = None
     status: str
+    progress: float | None = None
+    priority: int = 0
+    filament_id: int | None = None
+    filament_used_grams: float | None = None
 
 
 class JobCreate(JobBase):
@@ -80,15 +106,90 @@ class JobUpdate(BaseModel):
     start_time: datetime | None = None
     end_time: datetime | None = None
     status: str | None = None
+    progress: float | None = None
+    priority: int | None = None
+    filament_id: int | None = None
+    filament_used_grams: float | None = None
 
 
 class JobOut(JobBase):
     id: int
+    filament_cost: float | None = None
 
     class Config:
         from_attributes = True
 
 
+class JobPage(BaseModel):
+    items: list[dict]
+    next_cursor: str | None = None
+
+
+class StatsMetrics(BaseModel):
+    jobs: int
+    succeeded: int
+    failed: int
+    success_rate: float | None = None
+    print_hours: float
+    utilization: float | None = None
+    estimate_samples: int
+    estimate_mean_abs_error: float | None = None
+    estimate_error_ratio: float | None = None
+
+
+class PrinterStats(StatsMetrics):
+    printer_id: int
+    name: str | None = None
+
+
+class DailyStats(StatsMetrics):
+    printer_id: int
+    day: date
+
+
+class MaterialStats(StatsMetrics):
+    material: str | None = None
+
+
+class StatsSummary(BaseModel):
+    start: date
+    end: date
+    totals: StatsMetrics
+    printers: list[PrinterStats]
+
+
+class ScheduledJob(BaseModel):
+    job_id: int
+    filename: str
+    material: str | None = None
+    priority: int
+    start: datetime
+    end: datetime
+    material_change: bool
+
+
+class PrinterSchedule(BaseModel):
+    printer_id: int
+    name: str
+    available_at: datetime
+    jobs: list[ScheduledJob]
+
+
+class UnassignedJob(BaseModel):
+    job_id: int
+    filename: str
+    reason: str
+
+
+class ScheduleOut(BaseModel):
+    generated_at: datetime
+    makespan_end: datetime | None = None
+    printers: list[PrinterSchedule]
+    unavailable_printers: list[int]
+    unassigned: list[UnassignedJob]
+    moved: int | None = None
+
+
 class SettingBase(BaseModel):
     key: str
     value: str | None = None
@@ -124,6 +225,11 @@ class UserLogin(BaseModel):
     password: str
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str = Field(min_length=8)
+
+
 class UserOut(BaseModel):
     id: int
     email: EmailStr
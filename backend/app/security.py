@@ -1,13 +1,25 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone
 from typing import Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from .config import settings
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 ALGORITHM = "HS256"
+THUMBNAIL_SCOPE = "thumbnail"
+
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the event
+# loop without competing with the default threadpool used by sync routes.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_hash_pending = 0
+
+
+class PasswordHashingBusy(Exception):
+    pass
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -18,9 +30,31 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+async def _run_hashing(func, *args):
+    global _hash_pending
+    if _hash_pending >= settings.password_hash_workers + settings.password_hash_max_queue:
+        raise PasswordHashingBusy()
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # Returns a new hash when the stored one uses outdated CryptContext parameters.
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+def create_access_token(subject: str, expires_delta: Optional[timedelta] = None, password_version: Optional[int] = None) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or settings.access_token_expires)
     to_encode = {"sub": subject, "exp": expire}
+    if password_version is not None:
+        to_encode["pwv"] = password_version
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=ALGORITHM)
 
 
@@ -30,3 +64,16 @@ def decode_token(token: str) -> dict | None:
         return payload
     except JWTError:
         return None
+
+
+def create_thumbnail_token(printer_id: int, filename: str) -> str:
+    # Signed into thumbnail URLs, since <img> cannot send the Authorization header.
+    # Expiring at a day boundary keeps the URL, and so the browser cache entry, stable for a day.
+    expire = datetime.combine(datetime.now(timezone.utc).date() + timedelta(days=2), time.min, tzinfo=timezone.utc)
+    to_encode = {"sub": f"{printer_id}:{filename}", "scope": THUMBNAIL_SCOPE, "exp": expire}
+    return jwt.encode(to_encode, settings.jwt_secret, algorithm=ALGORITHM)
+
+
+def verify_thumbnail_token(token: str, printer_id: int, filename: str) -> bool:
+    payload = decode_token(token)
+    return bool(payload) and payload.get("scope") == THUMBNAIL_SCOPE and payload.get("sub") == f"{printer_id}:{filename}"
@@ -0,0 +1,22 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+# Naive datetimes are written without an offset, matching what pydantic emits for
+# the same values, so the fast path does not change any payload.
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, option=OPTIONS)
+
+
+def dumps_text(data) -> str:
+    return orjson.dumps(data, option=OPTIONS).decode()
+
+
+class FastJSONResponse(JSONResponse):
+    # Default response class: endpoints with a response_model still validate, only
+    # the final encoding changes. Handlers returning trusted DB rows skip both via
+    # response_cache.store(..., adapter=None).
+    def render(self, content) -> bytes:
+        return dumps(content)
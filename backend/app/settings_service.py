@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from typing import Callable
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .event_bus import RESYNC, event_bus
+from .models import Setting
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CHANGED = "settings_changed"
+RELOAD_RETRY_SECONDS = 5
+_PENDING_KEY = "settings_changed"
+
+
+class RuntimeSettings(BaseModel):
+    # Keys of the settings table that override config.Settings while running.
+    # Anything else in the table stays a free-form string.
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+    moonraker_poll_interval: float = Field(gt=0)
+    moonraker_reconcile_interval: float = Field(gt=0)
+    moonraker_timeout: float = Field(gt=0)
+    moonraker_max_backoff: float = Field(gt=0)
+    rate_limit_requests: int = Field(gt=0)
+    rate_limit_window_seconds: int = Field(gt=0)
+    rate_limit_costs: str
+    job_ingest_flush_seconds: float = Field(gt=0)
+    timeline_window_days: int = Field(gt=0)
+    timeline_max_job_hours: int = Field(gt=0)
+    schedule_changeover_minutes: float = Field(ge=0)
+    schedule_default_job_minutes: float = Field(gt=0)
+    filament_ledger_retention_days: int = Field(ge=0)
+    filament_ledger_compact_hours: float = Field(ge=0)
+    slow_request_ms: float = Field(ge=0)
+    job_archive_after_days: int = Field(ge=0)
+    job_archive_interval_hours: float = Field(gt=0)
+    telemetry_flush_seconds: float = Field(gt=0)
+    telemetry_retention_days: int = Field(gt=0)
+
+
+def _defaults() -> dict:
+    return {name: getattr(settings, name) for name in RuntimeSettings.model_fields}
+
+
+SettingsListener = Callable[[RuntimeSettings], None]
+
+
+class SettingsService:
+    def __init__(self):
+        self.current = RuntimeSettings(**_defaults())
+        self.values: dict[str, str | None] = {}
+        self._listeners: list[SettingsListener] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def add_listener(self, listener: SettingsListener):
+        self._listeners.append(listener)
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        return self.values.get(key, default)
+
+    def validate(self, key: str, value: str | None):
+        # Raises ValueError for a typed key whose value does not parse
+        if key not in RuntimeSettings.model_fields or value is None:
+            return
+        try:
+            RuntimeSettings(**{**self.current.model_dump(), key: value})
+        except ValidationError as exc:
+            raise ValueError(exc.errors()[0]["msg"]) from None
+
+    def _apply(self, rows: list[tuple[str, str | None]]):
+        values = dict(rows)
+        typed = _defaults()
+        for key in RuntimeSettings.model_fields:
+            if values.get(key) is None:
+                continue
+            try:
+                self.validate(key, values[key])
+                typed[key] = values[key]
+            except ValueError as exc:
+                # A bad row must not take the app down; keep the env default
+                logger.warning("Configuração %s ignorada: %s", key, exc)
+        current = RuntimeSettings(**typed)
+        changed = current != self.current
+        self.values, self.current = values, current
+        if changed:
+            for listener in self._listeners:
+                listener(current)
+
+    def load(self, db: Session):
+        self._apply(db.execute(select(Setting.key, Setting.value)).all())
+
+    async def load_async(self):
+        async with AsyncSessionLocal() as db:
+            self._apply((await db.execute(select(Setting.key, Setting.value))).all())
+
+    def notify(self, db: Session):
+        # The other workers reload once the surrounding transaction commits
+        db.info[_PENDING_KEY] = True
+
+    def on_event(self, data: dict):
+        # Runs in whatever thread delivered the event
+        if self._loop is not None and self._changed is not None:
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def start(self):
+        await self.load_async()
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        self._changed = None
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                await self.load_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retried below
+                logger.exception("Falha ao recarregar configurações")
+                await asyncio.sleep(RELOAD_RETRY_SECONDS)
+                self._changed.set()
+
+
+settings_service = SettingsService()
+# Reloaded on the event bus, which also resyncs after its connection came back
+event_bus.subscribe(SETTINGS_CHANGED, settings_service.on_event)
+event_bus.subscribe(RESYNC, settings_service.on_event)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session):
+    if session.info.pop(_PENDING_KEY, False):
+        # This worker already reloaded synchronously (see routers.settings)
+        event_bus.publish(SETTINGS_CHANGED, {}, local=False)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,67 @@
+# job_stats is kept up to date by a trigger on jobs (migration 0005) and counts
+# archived jobs too (migration 0009). Rebuild recomputes it from scratch, e.g.
+# after restoring a backup:
+#
+#     python -m app.stats rebuild [--printer-id N]
+import argparse
+import logging
+
+from sqlalchemy import text
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+REBUILD_SQL = """
+INSERT INTO job_stats (
+    printer_id, day, material, jobs_total, jobs_succeeded, jobs_failed, print_seconds,
+    estimate_samples, estimated_seconds, slicer_seconds, estimate_abs_error
+)
+SELECT
+    printer_id,
+    start_time::date,
+    COALESCE(material, ''),
+    count(*),
+    count(*) FILTER (WHERE lower(status) IN ('complete', 'completed')),
+    count(*) FILTER (WHERE lower(status) IN ('cancelled', 'canceled', 'error', 'failed')),
+    COALESCE(sum(GREATEST(EXTRACT(EPOCH FROM end_time - start_time), 0)), 0),
+    count(*) FILTER (WHERE duration_estimated IS NOT NULL AND duration_slicer IS NOT NULL),
+    COALESCE(sum(duration_estimated) FILTER (WHERE duration_slicer IS NOT NULL), 0),
+    COALESCE(sum(duration_slicer) FILTER (WHERE duration_estimated IS NOT NULL), 0),
+    COALESCE(sum(abs(duration_estimated - duration_slicer)), 0)
+FROM (
+    SELECT printer_id, material, status, start_time, end_time, duration_estimated, duration_slicer FROM jobs
+    UNION ALL
+    SELECT printer_id, material, status, start_time, end_time, duration_estimated, duration_slicer FROM jobs_archive
+) AS all_jobs
+WHERE start_time IS NOT NULL {where}
+GROUP BY 1, 2, 3
+"""
+
+
+def rebuild(printer_id: int | None = None) -> int:
+    where, params = "", {}
+    if printer_id is not None:
+        where, params = "AND printer_id = :printer_id", {"printer_id": printer_id}
+    with engine.begin() as conn:
+        # Blocks job writes (not reads) so the trigger cannot interleave with the recount.
+        conn.execute(text("LOCK TABLE jobs, jobs_archive IN SHARE MODE"))
+        delete = "DELETE FROM job_stats" + (" WHERE printer_id = :printer_id" if params else "")
+        conn.execute(text(delete), params)
+        return conn.execute(text(REBUILD_SQL.format(where=where)), params).rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job statistics rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="recompute job_stats from jobs and jobs_archive")
+    rebuild_parser.add_argument("--printer-id", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "rebuild":
+        rows = rebuild(args.printer_id)
+        logger.info("job_stats: %s linhas recalculadas", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+import asyncio
+import logging
+import math
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .event_bus import event_bus
+from .models import PrinterTelemetry
+from .printer_state import PrinterSnapshot, printer_state
+from .settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("extruder_temp", "extruder_target", "bed_temp", "bed_target", "progress", "speed")
+# resolution -> (bucket seconds, ring slots): 1 h of seconds, 1 day of minutes, 30 days of hours
+RESOLUTIONS = {"1s": (1, 3600), "1m": (60, 1440), "1h": (3600, 720)}
+ROLLUPS = ("1m", "1h")
+# Bytes per ring slot: int64 time, uint16 sample count, one float32 per channel
+SLOT_BYTES = 8 + 2 + 4 * len(CHANNELS)
+SERIES_BYTES = sum(slots for _, slots in RESOLUTIONS.values()) * SLOT_BYTES
+TELEMETRY = "telemetry"
+# Printers per bus message, keeping each NOTIFY payload well under 8000 bytes
+PUBLISH_BATCH = 50
+PARTITION_PREFIX = "printer_telemetry_p"
+NAN = float("nan")
+
+
+def to_epoch(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def from_epoch(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+
+def sample_values(status: dict) -> tuple[float, ...]:
+    extruder = status.get("extruder") or {}
+    bed = status.get("heater_bed") or {}
+    gcode_move = status.get("gcode_move") or {}
+    speed = gcode_move.get("speed")
+    if speed is not None:
+        # Requested feed rate in mm/min, times the M220 speed override
+        speed = speed / 60 * (gcode_move.get("speed_factor") or 1)
+    values = (
+        extruder.get("temperature"),
+        extruder.get("target"),
+        bed.get("temperature"),
+        bed.get("target"),
+        (status.get("display_status") or {}).get("progress"),
+        speed,
+    )
+    return tuple(NAN if value is None else float(value) for value in values)
+
+
+class Ring:
+    # Fixed-size columns allocated up front; the oldest slot is overwritten.
+    def __init__(self, size: int):
+        self.size = size
+        self.times = array("q", [0]) * size
+        self.counts = array("H", [0]) * size
+        self.columns = [array("f", [NAN]) * size for _ in CHANNELS]
+        self.appended = 0
+
+    def __len__(self) -> int:
+        return min(self.appended, self.size)
+
+    def __getitem__(self, index: int) -> int:
+        # Times in append order, so bisect works across the wrap-around
+        return self.times[(self.appended - len(self) + index) % self.size]
+
+    def append(self, ts: int, count: int, values: tuple[float, ...]):
+        slot = self.appended % self.size
+        self.times[slot] = ts
+        self.counts[slot] = min(count, 65535)
+        for column, value in zip(self.columns, values):
+            column[slot] = value
+        self.appended += 1
+
+    def oldest(self) -> int | None:
+        return self[0] if self.appended else None
+
+    def rows(self, start: int, end: int):
+        first = self.appended - len(self)
+        for index in range(bisect_left(self, start), bisect_left(self, end)):
+            slot = (first + index) % self.size
+            yield self.times[slot], self.counts[slot], tuple(column[slot] for column in self.columns)
+
+
+class Bucket:
+    # Running weighted means for one rollup period; NaN channels are skipped.
+    __slots__ = ("start", "count", "sums", "weights")
+
+    def __init__(self):
+        self.start: int | None = None
+        self.count = 0
+        self.sums = [0.0] * len(CHANNELS)
+        self.weights = [0] * len(CHANNELS)
+
+    def add(self, values: tuple[float, ...], weight: int):
+        self.count += weight
+        for index, value in enumerate(values):
+            if not math.isnan(value):
+                self.sums[index] += value * weight
+                self.weights[index] += weight
+
+    def means(self) -> tuple[float, ...]:
+        return tuple(total / weight if weight else NAN for total, weight in zip(self.sums, self.weights))
+
+    def reset(self, start: int):
+        self.start = start
+        self.count = 0
+        self.sums = [0.0] * len(CHANNELS)
+        self.weights = [0] * len(CHANNELS)
+
+
+class PrinterSeries:
+    def __init__(self):
+        self.rings = {name: Ring(slots) for name, (_, slots) in RESOLUTIONS.items()}
+        self.buckets = {name: Bucket() for name in ROLLUPS}
+        self.last = 0
+
+    def record(self, ts: int, values: tuple[float, ...]) -> list[tuple[int, int, tuple]]:
+        # At most one sample per second. Returns the minutes closed by this sample.
+        if ts <= self.last:
+            return []
+        self.last = ts
+        self.rings["1s"].append(ts, 1, values)
+        return self._roll(0, ts, 1, values)
+
+    def close_expired(self, now: int) -> list[tuple[int, int, tuple]]:
+        closed = []
+        for level, name in enumerate(ROLLUPS):
+            bucket = self.buckets[name]
+            if bucket.start is not None and bucket.count and now >= bucket.start + RESOLUTIONS[name][0]:
+                closed.extend(self._close(level))
+        return closed
+
+    def _roll(self, level: int, ts: int, weight: int, values: tuple[float, ...]) -> list[tuple[int, int, tuple]]:
+        name = ROLLUPS[level]
+        bucket = self.buckets[name]
+        start = ts - ts % RESOLUTIONS[name][0]
+        closed = []
+        if bucket.start is not None and start < bucket.start:
+            # Late sample for a period that was already rolled up
+            return closed
+        if bucket.start != start:
+            if bucket.count:
+                closed = self._close(level)
+            bucket.reset(start)
+        bucket.add(values, weight)
+        return closed
+
+    def _close(self, level: int) -> list[tuple[int, int, tuple]]:
+        name = ROLLUPS[level]
+        bucket = self.buckets[name]
+        row = (bucket.start, bucket.count, bucket.means())
+        self.rings[name].append(*row)
+        bucket.reset(bucket.start)
+        closed = [row] if name == "1m" else []
+        if level + 1 < len(ROLLUPS):
+            self._roll(level + 1, row[0], row[1], row[2])
+        return closed
+
+    def rows(self, resolution: str, start: int, end: int) -> list[tuple[int, int, tuple]]:
+        rows = list(self.rings[resolution].rows(start, end))
+        bucket = self.buckets.get(resolution)
+        # The open bucket is the live tail of a rollup
+        if bucket is not None and bucket.count and start <= bucket.start < end:
+            rows.append((bucket.start, bucket.count, bucket.means()))
+        return rows
+
+
+class TelemetryStore:
+    def __init__(self):
+        self._series: dict[int, PrinterSeries] = {}
+        # Deleted printers: samples still in flight (the poller notices the deletion on its
+        # next reconcile) must not recreate the series. Printer ids are never reused.
+        self._removed: set[int] = set()
+        # Filled only while this worker persists (the leader)
+        self.pending: list[tuple[int, int, int, tuple]] | None = None
+        self.outbox: list[list] | None = None
+
+    def record(self, printer_id: int, ts: int, values: tuple[float, ...]):
+        series = self._series.get(printer_id)
+        if series is None:
+            if printer_id in self._removed:
+                return
+            series = self._series[printer_id] = PrinterSeries()
+        closed = series.record(ts, values)
+        if self.pending is not None:
+            self.pending.extend((printer_id, *row) for row in closed)
+
+    def on_snapshot(self, snapshot: PrinterSnapshot, previous: PrinterSnapshot | None):
+        if snapshot.updated_at is None or not snapshot.status:
+            return
+        ts = to_epoch(snapshot.updated_at)
+        values = sample_values(snapshot.status)
+        self.record(snapshot.printer_id, ts, values)
+        if self.outbox is not None:
+            self.outbox.append([snapshot.printer_id, ts, *values])
+
+    def apply_remote(self, data: dict):
+        for printer_id, ts, *values in data["samples"]:
+            self.record(printer_id, ts, tuple(NAN if value is None else value for value in values))
+
+    def remove(self, printer_id: int):
+        # Rows already pending are still written; retention drops them with the partition
+        self._removed.add(printer_id)
+        self._series.pop(printer_id, None)
+
+    def close_expired(self, now: int):
+        for printer_id, series in self._series.items():
+            closed = series.close_expired(now)
+            if self.pending is not None:
+                self.pending.extend((printer_id, *row) for row in closed)
+
+    def rows(self, printer_id: int, resolution: str, start: int, end: int) -> list[tuple[int, int, tuple]]:
+        series = self._series.get(printer_id)
+        return series.rows(resolution, start, end) if series else []
+
+    def oldest(self, printer_id: int, resolution: str) -> int | None:
+        series = self._series.get(printer_id)
+        return series.rings[resolution].oldest() if series else None
+
+    def stats(self) -> dict:
+        return {"printers": len(self._series), "bytes": len(self._series) * SERIES_BYTES}
+
+
+telemetry = TelemetryStore()
+if settings.telemetry_enabled:
+    printer_state.add_observer(telemetry.on_snapshot)
+    event_bus.subscribe(TELEMETRY, telemetry.apply_remote)
+
+
+class TelemetryWriter:
+    # Leader only: forwards samples to the other workers every second and appends
+    # the closed minute rollups to printer_telemetry in batches.
+    def __init__(self, store: TelemetryStore):
+        self.store = store
+        self._task: asyncio.Task | None = None
+        self._partitions: set[str] = set()
+        self._next_retention = 0.0
+
+    async def start(self):
+        if self._task is None:
+            self.store.pending = []
+            self.store.outbox = []
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:  # pragma: no cover - lost on shutdown only
+            logger.exception("Falha ao gravar telemetria")
+        self.store.pending = None
+        self.store.outbox = None
+
+    async def _run(self):
+        next_flush = time.monotonic() + settings_service.current.telemetry_flush_seconds
+        while True:
+            await asyncio.sleep(1)
+            self._publish()
+            self.store.close_expired(int(time.time()))
+            if time.monotonic() < next_flush:
+                continue
+            next_flush = time.monotonic() + settings_service.current.telemetry_flush_seconds
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - rows stay pending for the next flush
+                logger.exception("Falha ao gravar telemetria")
+
+    def _publish(self):
+        samples, self.store.outbox[:] = list(self.store.outbox), []
+        for index in range(0, len(samples), PUBLISH_BATCH):
+            event_bus.publish(TELEMETRY, {"samples": samples[index : index + PUBLISH_BATCH]}, local=False)
+
+    async def flush(self):
+        if self.store.pending is None:
+            return
+        pending, self.store.pending[:] = list(self.store.pending), []
+        if not pending and time.monotonic() < self._next_retention:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await self._write(db, pending)
+                await db.commit()
+        except Exception:
+            self.store.pending[:0] = pending
+            # Partitions created in the failed transaction were rolled back too
+            self._partitions.clear()
+            raise
+
+    async def _write(self, db: AsyncSession, pending: list[tuple[int, int, int, tuple]]):
+        days = {from_epoch(ts).date() for _, ts, _, _ in pending}
+        for day in sorted(days):
+            await self._ensure_partition(db, day)
+        rows = [
+            {
+                "printer_id": printer_id,
+                "ts": from_epoch(ts),
+                "samples": min(count, 32767),
+                **{channel: None if math.isnan(value) else value for channel, value in zip(CHANNELS, values)},
+            }
+            for printer_id, ts, count, values in pending
+        ]
+        # 11 columns per row, far below the bind parameter limit
+        for index in range(0, len(rows), 2000):
+            statement = insert(PrinterTelemetry).values(rows[index : index + 2000])
+            await db.execute(statement.on_conflict_do_nothing(index_elements=[PrinterTelemetry.printer_id, PrinterTelemetry.ts]))
+        if time.monotonic() >= self._next_retention:
+            self._next_retention = time.monotonic() + 3600
+            await self._ensure_partition(db, datetime.utcnow().date() + timedelta(days=1))
+            await self._drop_expired(db)
+
+    async def _ensure_partition(self, db: AsyncSession, day):
+        name = f"{PARTITION_PREFIX}{day:%Y%m%d}"
+        if name in self._partitions:
+            return
+        await db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF printer_telemetry "
+                f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+            )
+        )
+        self._partitions.add(name)
+
+    async def _drop_expired(self, db: AsyncSession):
+        cutoff = f"{PARTITION_PREFIX}{datetime.utcnow().date() - timedelta(days=settings_service.current.telemetry_retention_days):%Y%m%d}"
+        names = (
+            await db.execute(
+                text(
+                    "SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                    "WHERE parent.relname = 'printer_telemetry'"
+                )
+            )
+        ).scalars()
+        for name in names:
+            # Same-length names compare like their dates
+            if name.startswith(PARTITION_PREFIX) and name < cutoff:
+                await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                self._partitions.discard(name)
+
+
+telemetry_writer = TelemetryWriter(telemetry)
+
+
+async def _stored_rows(db: AsyncSession, printer_id: int, resolution: str, start: int, end: int) -> list[tuple[int, int, tuple]]:
+    table = PrinterTelemetry
+    window = and_(table.printer_id == printer_id, table.ts >= from_epoch(start), table.ts < from_epoch(end))
+    if resolution == "1m":
+        query = select(table.ts, table.samples, *(getattr(table, channel) for channel in CHANNELS)).where(window).order_by(table.ts)
+    else:
+        hour = func.date_trunc("hour", table.ts)
+        # Means weighted by the number of samples behind each minute
+        means = [
+            (func.sum(getattr(table, channel) * table.samples) / func.nullif(func.sum(table.samples).filter(getattr(table, channel).is_not(None)), 0)).label(channel)
+            for channel in CHANNELS
+        ]
+        query = select(hour.label("ts"), func.sum(table.samples).label("samples"), *means).where(window).group_by(hour).order_by(hour)
+    return [
+        (to_epoch(row[0]), int(row[1]), tuple(NAN if value is None else float(value) for value in row[2:]))
+        for row in (await db.execute(query)).all()
+    ]
+
+
+async def series(db: AsyncSession, printer_id: int, resolution: str, start: datetime, end: datetime) -> dict:
+    start_ts, end_ts = to_epoch(start), to_epoch(end)
+    buckets = {ts: (count, values) for ts, count, values in telemetry.rows(printer_id, resolution, start_ts, end_ts)}
+    oldest = telemetry.oldest(printer_id, resolution)
+    # Seconds are only kept in memory; rollups older than the rings (or from before
+    # a restart, or written by another worker) come from the table.
+    if resolution != "1s" and (oldest is None or oldest > start_ts):
+        for ts, count, values in await _stored_rows(db, printer_id, resolution, start_ts, end_ts):
+            # After a restart the first in-memory bucket is partial: keep the fuller one
+            if ts not in buckets or buckets[ts][0] < count:
+                buckets[ts] = (count, values)
+    times = sorted(buckets)
+    payload = {
+        "printer_id": printer_id,
+        "resolution": resolution,
+        "from": start,
+        "to": end,
+        "time": times,
+        "samples": [buckets[ts][0] for ts in times],
+    }
+    for index, channel in enumerate(CHANNELS):
+        column = (buckets[ts][1][index] for ts in times)
+        payload[channel] = [None if math.isnan(value) else round(value, 2) for value in column]
+    return payload
@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable
+
+from fastapi import WebSocket
+from sqlalchemy import and_, or_, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+from .eta import eta_engine
+from .event_bus import RESYNC, event_bus
+from .job_archive import job_archiver, reaches_archive
+from .models import ACTIVE_JOB_STATUSES, Job, JobArchive, Printer
+from .printer_state import PrinterSnapshot, printer_state
+from .serialization import dumps_text
+from .settings_service import settings_service
+from .telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+SEND_TIMEOUT_SECONDS = 5
+# printer_changed events for progress alone (state changes go out at once)
+PROGRESS_EVENT_SECONDS = 5
+TIMELINE = "timeline"
+JOB_COLUMNS = (Job.id, Job.printer_id, Job.filename, Job.status, Job.start_time, Job.end_time)
+PRINTER_COLUMNS = (Printer.id, Printer.name, Printer.status, Printer.moonraker_url)
+
+PrinterRemovedListener = Callable[[int], None]
+# Move during a print: sent on /ws/timeline only, so the /timeline ETag can hold
+LIVE_FIELDS = ("progress", "filename", "current_layer", "total_layer")
+
+
+def job_entry(job) -> dict:
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "start_time": job.start_time,
+        "end_time": job.end_time,
+        "eta": eta_engine.eta(job.id),
+    }
+
+
+def printer_entry(printer, live: bool = True) -> dict:
+    snapshot = printer_state.get(printer.id)
+    status = snapshot.state if snapshot else printer.status
+    entry = {
+        "id": printer.id,
+        "name": printer.name,
+        "status": (status or "offline").lower(),
+        "progress": snapshot.progress if snapshot else None,
+        "filename": snapshot.filename if snapshot else None,
+        "current_layer": snapshot.current_layer if snapshot else None,
+        "total_layer": snapshot.total_layer if snapshot else None,
+        "moonraker_url": printer.moonraker_url,
+    }
+    return entry if live else {key: value for key, value in entry.items() if key not in LIVE_FIELDS}
+
+
+def _job_sort_key(job: dict):
+    # Used with reverse=True: start_time DESC NULLS LAST, like the REST endpoint
+    return (job["start_time"] is not None, job["start_time"] or datetime.min, job["id"])
+
+
+def default_window_start() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings_service.current.timeline_window_days)
+
+
+def job_window(start: datetime | None, end: datetime | None, model=Job):
+    # Jobs overlapping [start, end), plus everything still active. The start_time
+    # lower bound keeps the predicate sargable (and prunes jobs_archive partitions);
+    # longer jobs than timeline_max_job_hours that began before the window are not shown.
+    conditions = []
+    if start is not None:
+        earliest = start - timedelta(hours=settings_service.current.timeline_max_job_hours)
+        conditions.append(model.start_time >= earliest)
+        conditions.append(or_(model.end_time.is_(None), model.end_time >= start))
+    if end is not None:
+        conditions.append(model.start_time < end)
+    if not conditions:
+        return true()
+    return or_(model.status.in_(ACTIVE_JOB_STATUSES), and_(*conditions))
+
+
+def timeline_query(start: datetime | None, end: datetime | None):
+    query = select(*JOB_COLUMNS).where(job_window(start, end))
+    # Archived jobs may still overlap a window that starts just after the horizon
+    if start is not None and reaches_archive(start - timedelta(hours=settings_service.current.timeline_max_job_hours)):
+        archived = select(*(getattr(JobArchive, column.key) for column in JOB_COLUMNS)).where(job_window(start, end, JobArchive))
+        query = select(union_all(query, archived).subquery())
+    columns = query.selected_columns
+    return query.order_by(columns.printer_id, columns.start_time.desc().nullslast(), columns.id.desc())
+
+
+async def fetch_timeline(db: AsyncSession, start: datetime | None, end: datetime | None, live: bool = True) -> list[dict]:
+    printers = (await db.execute(select(*PRINTER_COLUMNS).order_by(Printer.id))).all()
+    grouped: dict[int, list[dict]] = {printer.id: [] for printer in printers}
+    rows = await db.execute(timeline_query(start, end))
+    for row in rows:
+        jobs = grouped.get(row.printer_id)
+        if jobs is not None:
+            jobs.append(job_entry(row))
+    return [{**printer_entry(printer, live), "jobs": grouped[printer.id]} for printer in printers]
+
+
+async def _load_printer(printer_id: int):
+    async with AsyncSessionLocal() as db:
+        printer = (await db.execute(select(*PRINTER_COLUMNS).where(Printer.id == printer_id))).first()
+        return printer_entry(printer) if printer else None
+
+
+async def _load_job(job_id: int):
+    async with AsyncSessionLocal() as db:
+        query = select(*JOB_COLUMNS).where(Job.id == job_id, job_window(default_window_start(), None))
+        job = (await db.execute(query)).first()
+        return (job.printer_id, job_entry(job)) if job else None
+
+
+async def _load_all():
+    async with AsyncSessionLocal() as db:
+        items = await fetch_timeline(db, default_window_start(), None)
+    printers, jobs = {}, {}
+    for item in items:
+        printer_jobs = item.pop("jobs")
+        printers[item["id"]] = item
+        for job in printer_jobs:
+            jobs[job["id"]] = (item["id"], job)
+    return printers, jobs
+
+
+class TimelineHub:
+    def __init__(self, history_size: int = 1000):
+        self._printers: dict[int, dict] = {}
+        self._jobs: dict[int, tuple[int, dict]] = {}
+        self._seq = 0
+        self._epoch = uuid.uuid4().hex[:12]
+        self._history: deque[tuple[int, str]] = deque(maxlen=history_size)
+        self._snapshot_text: str | None = None
+        self._sockets: set[WebSocket] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # printer id -> (progress sent, when)
+        self._progress_sent: dict[int, tuple[float | None, float]] = {}
+        self._listeners: list[PrinterRemovedListener] = []
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def epoch(self) -> str:
+        return self._epoch
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._sockets)
+
+    def add_listener(self, listener: PrinterRemovedListener):
+        # Called with the id of every printer that left the timeline, on every worker
+        self._listeners.append(listener)
+
+    def _printer_removed(self, printer_id: int):
+        self._progress_sent.pop(printer_id, None)
+        for listener in self._listeners:
+            listener(printer_id)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._printers, self._jobs = await _load_all()
+        self._snapshot_text = None
+        self._task = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    # Published on the event bus so the hub of every worker refreshes its copy.
+    def notify_job(self, job_id: int):
+        event_bus.publish(TIMELINE, {"kind": "job", "id": job_id})
+
+    def notify_printer(self, printer_id: int):
+        event_bus.publish(TIMELINE, {"kind": "printer", "id": printer_id})
+
+    def notify_reload(self):
+        # For bulk writes, where one event per row would flood the history.
+        event_bus.publish(TIMELINE, {"kind": "reload", "id": 0})
+
+    def on_event(self, data: dict):
+        self._notify((data["kind"], data["id"]))
+
+    def on_printer_state(self, snapshot: PrinterSnapshot, previous_state: str | None):
+        self._progress_sent[snapshot.printer_id] = (snapshot.progress, time.monotonic())
+        self.notify_printer(snapshot.printer_id)
+
+    def on_printer_snapshot(self, snapshot: PrinterSnapshot, previous: PrinterSnapshot | None):
+        if previous is None or previous.state != snapshot.state:
+            return
+        sent = self._progress_sent.get(snapshot.printer_id)
+        now = time.monotonic()
+        if sent is not None and (sent[0] == snapshot.progress or now - sent[1] < PROGRESS_EVENT_SECONDS):
+            return
+        self._progress_sent[snapshot.printer_id] = (snapshot.progress, now)
+        self.notify_printer(snapshot.printer_id)
+
+    def _notify(self, event: tuple[str, int]):
+        # Routers run in the threadpool, so hand the event over to the loop thread.
+        if self._loop is None or self._queue is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(event)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    async def _consume(self):
+        while True:
+            kind, entity_id = await self._queue.get()
+            try:
+                if kind == "job":
+                    await self._refresh_job(entity_id)
+                elif kind == "reload":
+                    await self._reload()
+                elif kind == "etas":
+                    await self._refresh_etas()
+                else:
+                    await self._refresh_printer(entity_id)
+            except Exception:  # pragma: no cover - keep the hub alive
+                logger.exception("Falha ao atualizar timeline (%s %s)", kind, entity_id)
+
+    async def _refresh_printer(self, printer_id: int):
+        entry = await _load_printer(printer_id)
+        current = self._printers.get(printer_id)
+        if entry is None:
+            if current is None:
+                return
+            del self._printers[printer_id]
+            self._printer_removed(printer_id)
+            for job_id in [job_id for job_id, (owner, _) in self._jobs.items() if owner == printer_id]:
+                del self._jobs[job_id]
+            await self._emit({"type": "printer_removed", "printer_id": printer_id})
+        elif current != entry:
+            self._printers[printer_id] = entry
+            await self._emit({"type": "printer_added" if current is None else "printer_changed", "printer": entry})
+
+    async def _refresh_job(self, job_id: int):
+        loaded = await _load_job(job_id)
+        current = self._jobs.get(job_id)
+        if loaded is None:
+            if current is None:
+                return
+            del self._jobs[job_id]
+            await self._emit({"type": "job_removed", "printer_id": current[0], "job_id": job_id})
+        elif current != loaded:
+            self._jobs[job_id] = loaded
+            printer_id, entry = loaded
+            event = {"type": "job_added" if current is None else "job_changed", "printer_id": printer_id, "job": entry}
+            if current is not None and current[0] != printer_id:
+                event["previous_printer_id"] = current[0]
+            await self._emit(event)
+
+    async def _refresh_etas(self):
+        changed = {}
+        for job_id, (_, entry) in self._jobs.items():
+            eta = eta_engine.eta(job_id)
+            if entry["eta"] != eta:
+                entry["eta"] = eta
+                changed[job_id] = eta
+        if changed:
+            await self._emit({"type": "etas", "etas": changed})
+
+    async def _reload(self):
+        # A new epoch makes reconnecting clients fall back to a full snapshot.
+        previous = set(self._printers)
+        self._printers, self._jobs = await _load_all()
+        for printer_id in previous - set(self._printers):
+            self._printer_removed(printer_id)
+        self._epoch = uuid.uuid4().hex[:12]
+        self._history.clear()
+        self._snapshot_text = None
+        await self._broadcast(self.snapshot_text())
+
+    async def _emit(self, event: dict):
+        self._seq += 1
+        event["seq"] = self._seq
+        event["epoch"] = self._epoch
+        event["ts"] = datetime.utcnow()
+        text = dumps_text(event)
+        self._history.append((self._seq, text))
+        self._snapshot_text = None
+        await self._broadcast(text)
+
+    async def _broadcast(self, text: str):
+        sockets = list(self._sockets)
+        results = await asyncio.gather(*(self._send(socket, text) for socket in sockets), return_exceptions=True)
+        for socket, result in zip(sockets, results):
+            if isinstance(result, Exception):
+                self._sockets.discard(socket)
+
+    async def _send(self, websocket: WebSocket, text: str):
+        await asyncio.wait_for(websocket.send_text(text), timeout=SEND_TIMEOUT_SECONDS)
+
+    def items(self) -> list[dict]:
+        grouped: dict[int, list[dict]] = {printer_id: [] for printer_id in self._printers}
+        for printer_id, entry in self._jobs.values():
+            if printer_id in grouped:
+                grouped[printer_id].append(entry)
+        return [
+            {**self._printers[printer_id], "jobs": sorted(grouped[printer_id], key=_job_sort_key, reverse=True)}
+            for printer_id in sorted(self._printers)
+        ]
+
+    def snapshot_text(self) -> str:
+        if self._snapshot_text is None:
+            self._snapshot_text = dumps_text({"type": "snapshot", "seq": self._seq, "epoch": self._epoch, "items": self.items()})
+        return self._snapshot_text
+
+    def events_since(self, seq: int, epoch: str | None) -> list[str] | None:
+        if epoch != self._epoch:
+            return None
+        if seq == self._seq:
+            return []
+        if seq > self._seq or not self._history or self._history[0][0] > seq + 1:
+            return None
+        return [text for event_seq, text in self._history if event_seq > seq]
+
+    async def sync(self, websocket: WebSocket, since: int | None = None, epoch: str | None = None):
+        missed = self.events_since(since, epoch) if since is not None else None
+        if missed is None:
+            await websocket.send_text(self.snapshot_text())
+        else:
+            for text in missed:
+                await websocket.send_text(text)
+
+    async def subscribe(self, websocket: WebSocket, since: int | None = None, epoch: str | None = None):
+        # Catch up until no event was emitted while we were sending, then join the broadcast set.
+        while True:
+            synced = self._seq
+            await self.sync(websocket, since, epoch)
+            if self._seq == synced:
+                break
+            since, epoch = synced, self._epoch
+        self._sockets.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket):
+        self._sockets.discard(websocket)
+
+
+timeline_hub = TimelineHub()
+printer_state.add_listener(timeline_hub.on_printer_state)
+printer_state.add_observer(timeline_hub.on_printer_snapshot)
+event_bus.subscribe(TIMELINE, timeline_hub.on_event)
+event_bus.subscribe(TIMELINE, eta_engine.on_timeline_event)
+event_bus.subscribe(RESYNC, lambda data: eta_engine.request_reload())
+eta_engine.add_listener(lambda: timeline_hub._notify(("etas", 0)))
+job_archiver.add_listener(lambda moved: timeline_hub.notify_reload())
+timeline_hub.add_listener(telemetry.remove)
+event_bus.subscribe(RESYNC, lambda data: timeline_hub._notify(("reload", 0)))
@@ -0,0 +1,120 @@
+"""Refit and ETA pass cost of app.eta as the job history grows.
+
+    python -m bench.eta --history 10000,100000 --printers 100 --active 500
+
+Generates completed jobs whose actual duration is the slicer estimate times a
+hidden per-printer and per-material factor (plus noise), loads them into an
+EtaEngine the way a full reload does, and times the full fit, the warm refit
+after one more job finishes, and one batched ETA pass over --active printing
+jobs. Also reports the median error of the raw and the corrected estimate on
+held-out jobs. Prints one JSON document with p50/max per step.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.eta import EtaEngine
+
+MATERIALS = ["PLA", "PETG", "ABS", "ASA", "TPU", "PA-CF", None]
+
+
+def job_rows(count: int, printers: int, rng: random.Random, start_id: int = 1) -> list[SimpleNamespace]:
+    printer_factor = {index: rng.uniform(0.85, 1.35) for index in range(1, printers + 1)}
+    material_factor = {material: rng.uniform(0.9, 1.4) for material in MATERIALS}
+    now = datetime.utcnow()
+    rows = []
+    for index in range(count):
+        printer_id = rng.randrange(1, printers + 1)
+        material = rng.choice(MATERIALS)
+        estimate = rng.uniform(600, 12 * 3600)
+        actual = estimate * printer_factor[printer_id] * material_factor[material] * rng.lognormvariate(0, 0.05)
+        end = now - timedelta(seconds=rng.uniform(0, 365 * 86400))
+        rows.append(SimpleNamespace(
+            id=start_id + index, printer_id=printer_id, filename=f"part_{index}.gcode", material=material,
+            status="completed", progress=1.0, start_time=end - timedelta(seconds=actual), end_time=end,
+            duration_slicer=estimate, duration_estimated=None,
+        ))
+    return rows
+
+
+def timed(function, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings
+
+
+def summary(timings: list[float]) -> dict:
+    return {"p50_ms": round(statistics.median(timings), 3), "max_ms": round(timings[-1], 3)}
+
+
+def estimate_errors(engine: EtaEngine, rows: list[SimpleNamespace]) -> dict:
+    printer = np.array([engine.printers.code(row.printer_id) for row in rows])
+    material = np.array([engine.materials.code(row.material) for row in rows])
+    estimate = np.array([row.duration_slicer for row in rows])
+    actual = np.array([(row.end_time - row.start_time).total_seconds() for row in rows])
+    corrected = estimate * engine.model.factors(printer, material)
+    return {
+        "raw_median_error_pct": round(float(np.median(np.abs(estimate - actual) / actual)) * 100, 2),
+        "corrected_median_error_pct": round(float(np.median(np.abs(corrected - actual) / actual)) * 100, 2),
+    }
+
+
+def measure(count: int, printers: int, active: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    rows = job_rows(count + 1000, printers, rng)
+    history, holdout = rows[:count], rows[count:]
+
+    engine = EtaEngine()
+    started = time.perf_counter()
+    engine._add_training(history)
+    load_ms = (time.perf_counter() - started) * 1000
+    full = timed(lambda: engine.refit(full=True), repeat)
+
+    finished = iter(holdout)
+    warm = timed(lambda: (engine._add_training([next(finished)]), engine.refit(full=False)), repeat)
+
+    now = datetime.utcnow()
+    engine._active = {
+        row.id: SimpleNamespace(**{**vars(row), "status": "printing", "progress": rng.uniform(0.05, 0.95), "end_time": None, "start_time": now - timedelta(hours=1)})
+        for row in job_rows(active, printers, rng, start_id=10**9)
+    }
+    etas = timed(engine.compute, repeat)
+
+    return {
+        "history": count,
+        "printers": printers,
+        "active": active,
+        "load_ms": round(load_ms, 1),
+        "full_fit": summary(full),
+        "warm_refit": summary(warm),
+        "eta_pass": summary(etas),
+        **estimate_errors(engine, holdout[repeat:]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", default="10000,100000")
+    parser.add_argument("--printers", type=int, default=100)
+    parser.add_argument("--active", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    results = [measure(int(count), args.printers, args.active, args.repeat, args.seed) for count in args.history.split(",")]
+    json.dump({"benchmark": "eta", "python": sys.version.split()[0], "numpy": np.__version__, "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
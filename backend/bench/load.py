@@ -0,0 +1,382 @@
+"""End-to-end load test of the API against a seeded database and a fake fleet.
+
+    python -m bench.load --printers 50 --fleet 20 --jobs 100000 --duration 15
+    python -m bench.load --output after.json --baseline before.json
+
+Seeds DATABASE_URL with tagged printers, filaments and jobs, starts N fake
+Moonraker servers (tools.fake_moonraker) and the real app under uvicorn in
+subprocesses, then drives each scenario for --duration seconds with
+--concurrency clients: logins, /timeline, paging through /jobs/history,
+/moonraker/sync and /ws/timeline fan-out (job edits delivered to
+--ws-clients sockets). login_burst runs timeline and ws_fanout together, first
+alone and then alongside the login clients, and reports how much the non-login
+p99 moves while bcrypt is busy. Prints one JSON document with throughput and
+p50/p95/p99 per scenario (for ws_fanout: per delivered event, with the status
+of the edits); with --baseline it adds the relative change of each figure.
+Seeded rows are removed at the end unless --keep is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+import httpx
+import websockets
+from sqlalchemy import delete, insert
+
+from app.config import settings
+from app.database import engine
+from app.models import Filament, Job, Printer
+
+SCENARIOS = ("login", "timeline", "jobs_history", "moonraker_sync", "ws_fanout", "login_burst")
+MATERIALS = ["PLA", "PETG", "ABS", "ASA", "TPU"]
+STATUSES = ["completed", "completed", "completed", "cancelled", "error"]
+SEED_CHUNK = 5000
+
+
+def percentile(samples: list[float], fraction: float) -> float | None:
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 2)
+
+
+def summarize(name: str, latencies: list[float], statuses: Counter, errors: int, elapsed: float, **extra) -> dict:
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        **extra,
+    }
+
+
+def seed(tag: str, printers: int, fleet_urls: list[str], filaments: int, jobs: int, rng: random.Random) -> dict:
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        filament_ids = conn.execute(
+            insert(Filament).returning(Filament.id),
+            [
+                {"name": f"bench-{tag}-{index}", "material": rng.choice(MATERIALS), "price_per_kg": rng.uniform(80, 250), "stock_grams": 1_000_000}
+                for index in range(filaments)
+            ],
+        ).scalars().all()
+        printer_ids = conn.execute(
+            insert(Printer).returning(Printer.id),
+            [
+                {
+                    "name": f"bench-{tag}-{index}",
+                    "moonraker_url": fleet_urls[index] if index < len(fleet_urls) else None,
+                    "status": "idle",
+                    "filament_id": rng.choice(filament_ids) if filament_ids else None,
+                }
+                for index in range(printers)
+            ],
+        ).scalars().all()
+        recent = []
+        for offset in range(0, jobs, SEED_CHUNK):
+            rows = []
+            for index in range(offset, min(offset + SEED_CHUNK, jobs)):
+                start = now - timedelta(seconds=rng.randrange(0, 90 * 86400))
+                duration = rng.uniform(600, 8 * 3600)
+                rows.append({
+                    "printer_id": rng.choice(printer_ids),
+                    "filename": f"bench_{index}.gcode",
+                    "material": rng.choice(MATERIALS),
+                    "duration_estimated": duration,
+                    "duration_slicer": duration * rng.uniform(0.9, 1.1),
+                    "start_time": start,
+                    "end_time": start + timedelta(seconds=duration),
+                    "status": rng.choice(STATUSES),
+                    "progress": 1.0,
+                })
+            ids = conn.execute(insert(Job).returning(Job.id, Job.start_time), rows).all()
+            # Jobs inside the default timeline window produce WebSocket events when edited
+            recent.extend(job_id for job_id, start in ids if start > now - timedelta(days=settings.timeline_window_days - 1))
+    return {"printer_ids": printer_ids, "filament_ids": filament_ids, "recent_job_ids": recent, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def cleanup(tag: str):
+    with engine.begin() as conn:
+        # Jobs go with their printers (ON DELETE CASCADE)
+        conn.execute(delete(Printer).where(Printer.name.like(f"bench-{tag}-%")))
+        conn.execute(delete(Filament).where(Filament.name.like(f"bench-{tag}-%")))
+
+
+async def wait_ready(base_url: str, timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("A API não respondeu a tempo")
+
+
+async def drive(name: str, request, duration: float, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(index: int):
+        nonlocal errors
+        state: dict = {}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await request(index, state)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+    return summarize(name, latencies, statuses, errors, time.perf_counter() - started)
+
+
+async def ws_fanout(client: httpx.AsyncClient, base_url: str, token: str, job_ids: list[int], clients: int, duration: float, rate: float, rng: random.Random) -> dict:
+    # Latency from just before the PUT to receipt of the matching job_changed on each socket
+    sent: dict[str, float] = {}
+    latencies: list[float] = []
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/timeline?token={token}"
+    sockets = [await websockets.connect(ws_url, max_size=2**26) for _ in range(clients)]
+    for socket in sockets:
+        await socket.recv()
+
+    async def receive(socket):
+        async for raw in socket:
+            message = json.loads(raw)
+            if message.get("type") == "job_changed":
+                marker = message["job"]["filename"]
+                if marker in sent:
+                    latencies.append((time.perf_counter() - sent[marker]) * 1000)
+
+    receivers = [asyncio.create_task(receive(socket)) for socket in sockets]
+    statuses: Counter = Counter()
+    updates = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        marker = f"bench_ws_{uuid.uuid4().hex[:8]}.gcode"
+        sent[marker] = time.perf_counter()
+        response = await client.put(f"/jobs/{rng.choice(job_ids)}", json={"filename": marker})
+        statuses[response.status_code] += 1
+        updates += 1
+        await asyncio.sleep(max(0.0, updates / rate - (time.perf_counter() - started)))
+    elapsed = time.perf_counter() - started
+    # Let the last events arrive
+    expected = updates * clients
+    drain_deadline = time.perf_counter() + 5
+    while len(latencies) < expected and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.05)
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+    for socket in sockets:
+        await socket.close()
+    return summarize(
+        "ws_fanout",
+        latencies,
+        statuses,
+        0,
+        elapsed,
+        clients=clients,
+        updates=updates,
+        delivered=len(latencies),
+        expected=expected,
+    )
+
+
+def change_percent(after: float | None, before: float | None) -> float | None:
+    if after is None or not before:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+async def run(args, base_url: str, seeded: dict) -> tuple[list[dict], dict]:
+    rng = random.Random(args.seed)
+    credentials = {"username": settings.admin_email, "password": settings.admin_password}
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as anonymous:
+        token = (await anonymous.post("/auth/login", data=credentials)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    fleet_ids = seeded["printer_ids"][: args.fleet]
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+
+        async def login(index, state):
+            return (await client.post("/auth/login", data=credentials)).status_code
+
+        async def timeline(index, state):
+            return (await client.get("/timeline")).status_code
+
+        async def jobs_history(index, state):
+            # Each client pages down from the newest job and starts over after --pages
+            params = {"limit": 100}
+            if state.get("cursor") and state.get("page", 0) < args.pages:
+                params["cursor"] = state["cursor"]
+            else:
+                state["page"] = 0
+            response = await client.get("/jobs/history", params=params)
+            state["cursor"] = response.json().get("next_cursor") if response.status_code == 200 else None
+            state["page"] = state.get("page", 0) + 1
+            return response.status_code
+
+        async def moonraker_sync(index, state):
+            return (await client.get(f"/moonraker/sync/{rng.choice(fleet_ids)}")).status_code
+
+        drivers = {"login": login, "timeline": timeline, "jobs_history": jobs_history, "moonraker_sync": moonraker_sync}
+        login_concurrency = min(args.concurrency, args.login_concurrency)
+
+        async def login_burst() -> dict:
+            # Same timeline and ws_fanout load with and without logins in flight
+            phases = {}
+            for phase in ("quiet", "burst"):
+                steps = {"timeline": drive("timeline", timeline, args.duration, args.concurrency)}
+                if seeded["recent_job_ids"]:
+                    steps["ws_fanout"] = ws_fanout(client, base_url, token, seeded["recent_job_ids"], args.ws_clients, args.duration, args.ws_rate, rng)
+                if phase == "burst":
+                    steps["login"] = drive("login", login, args.duration, login_concurrency)
+                phases[phase] = dict(zip(steps, await asyncio.gather(*steps.values())))
+            return {
+                "scenario": "login_burst",
+                **phases,
+                "p99_change_percent": {
+                    name: change_percent(result["p99_ms"], phases["quiet"][name]["p99_ms"])
+                    for name, result in phases["burst"].items()
+                    if name != "login"
+                },
+            }
+
+        for name in args.scenarios.split(","):
+            if name == "ws_fanout":
+                if not seeded["recent_job_ids"]:
+                    continue
+                results.append(await ws_fanout(client, base_url, token, seeded["recent_job_ids"], args.ws_clients, args.duration, args.ws_rate, rng))
+            elif name == "login_burst":
+                results.append(await login_burst())
+            elif name == "moonraker_sync" and not fleet_ids:
+                continue
+            else:
+                concurrency = login_concurrency if name == "login" else args.concurrency
+                results.append(await drive(name, drivers[name], args.duration, concurrency))
+        health = (await client.get("/health")).json()
+    return results, health
+
+
+def compare(results: list[dict], baseline_path: str) -> dict:
+    with open(baseline_path) as handle:
+        baseline = {item["scenario"]: item for item in json.load(handle)["results"]}
+    changes = {}
+    for item in results:
+        before = baseline.get(item["scenario"])
+        if before is None:
+            continue
+        changes[item["scenario"]] = {
+            key: change_percent(item[key], before[key])
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+            if item.get(key) is not None and before.get(key)
+        }
+    return {"baseline": baseline_path, "change_percent": changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--printers", type=int, default=50)
+    parser.add_argument("--fleet", type=int, default=20, help="seeded printers backed by a fake Moonraker")
+    parser.add_argument("--filaments", type=int, default=20)
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--latency-ms", type=float, default=30, help="fake Moonraker response latency")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--login-concurrency", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=5, help="history pages walked per client before restarting")
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-rate", type=float, default=20, help="job edits per second during ws_fanout")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fleet-port", type=int, default=7600)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+    args.fleet = min(args.fleet, args.printers)
+
+    tag = uuid.uuid4().hex[:6]
+    base_url = f"http://127.0.0.1:{args.port}"
+    fleet_urls = [f"http://127.0.0.1:{args.fleet_port + index}" for index in range(args.fleet)]
+    env = {
+        **os.environ,
+        # Measure the app, not the limiter
+        "RATE_LIMIT_REQUESTS": os.environ.get("RATE_LIMIT_REQUESTS", "1000000000"),
+    }
+    if args.workers > 1:
+        env.setdefault("EVENT_BUS_BACKEND", "postgres")
+    processes = []
+    try:
+        seeded = seed(tag, args.printers, fleet_urls, args.filaments, args.jobs, random.Random(args.seed))
+        if args.fleet:
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "tools.fake_moonraker", "--count", str(args.fleet), "--base-port", str(args.fleet_port), "--latency-ms", str(args.latency_ms)],
+                env=env,
+                stdout=subprocess.DEVNULL,
+            ))
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+            env=env,
+        ))
+        asyncio.run(wait_ready(base_url))
+        # One poll round so /moonraker/sync has live state
+        time.sleep(settings.moonraker_poll_interval + 1)
+        results, health = asyncio.run(run(args, base_url, seeded))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if not args.keep:
+            cleanup(tag)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "keep")}
+    report = {
+        "benchmark": "load",
+        "python": sys.version.split()[0],
+        "config": config,
+        "seed_seconds": seeded["seconds"],
+        "results": results,
+        "health": health,
+    }
+    if args.baseline:
+        report["comparison"] = compare(results, args.baseline)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
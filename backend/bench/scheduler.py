@@ -0,0 +1,76 @@
+"""Scheduling latency as the queue and the fleet grow.
+
+    python -m bench.scheduler --queue 1000,10000,50000 --printers 10,100,500
+
+Runs app.scheduler.plan on synthetic fleets (mixed material capabilities and
+loaded spools) and prints one JSON document with p50/p95/max per combination.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from app.scheduler import PrinterSlot, QueuedJob, plan
+
+MATERIALS = ["PLA", "PETG", "ABS", "ASA", "TPU", "PA-CF"]
+CAPABILITIES = [None, frozenset({"PLA", "PETG"}), frozenset({"PLA", "PETG", "ABS", "ASA"}), frozenset({"TPU", "PLA"}), frozenset({"PA-CF", "ABS"})]
+
+
+def fleet(count: int, rng: random.Random) -> list[PrinterSlot]:
+    slots = []
+    for index in range(count):
+        materials = rng.choice(CAPABILITIES)
+        loaded = rng.choice(sorted(materials) if materials else MATERIALS)
+        slots.append(PrinterSlot(index + 1, f"P{index + 1}", rng.uniform(0, 4 * 3600), materials, loaded))
+    return slots
+
+
+def queue(count: int, rng: random.Random) -> list[QueuedJob]:
+    return [
+        QueuedJob(index + 1, f"job{index}.gcode", rng.choice(MATERIALS + [None]), rng.uniform(600, 12 * 3600), rng.choice((0, 0, 0, 1, 5)))
+        for index in range(count)
+    ]
+
+
+def measure(queue_size: int, printer_count: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    timings = []
+    result = None
+    for _ in range(repeat):
+        slots, jobs = fleet(printer_count, rng), queue(queue_size, rng)
+        started = time.perf_counter()
+        result = plan(slots, jobs, changeover_seconds=600)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "queue": queue_size,
+        "printers": printer_count,
+        "repeat": repeat,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+        "jobs_per_second": round(queue_size / (statistics.median(timings) / 1000)),
+        "unassigned": len(result.unassigned),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queue", default="1000,10000,50000")
+    parser.add_argument("--printers", default="10,100,500")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    results = [
+        measure(int(queue_size), int(printer_count), args.repeat, args.seed)
+        for queue_size in args.queue.split(",")
+        for printer_count in args.printers.split(",")
+    ]
+    json.dump({"benchmark": "scheduler", "python": sys.version.split()[0], "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Encoding cost of large job and timeline payloads: validated vs fast path.
+
+    python -m bench.serialization --rows 10000,100000
+
+Builds synthetic rows shaped like /jobs/history pages and /timeline items and
+times each encoder on the same data. "response_model" is what FastAPI does for
+a list[JobOut] endpoint (validate, dump to Python, json.dumps), "validated" is
+pydantic's own dump_json after validation, "fast" is app.serialization.dumps on
+the trusted rows. Prints one JSON document with p50/max and body sizes.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from app import schemas
+from app.serialization import dumps
+
+STATUSES = ["completed", "completed", "completed", "cancelled", "error", "printing", "queued"]
+MATERIALS = ["PLA", "PETG", "ABS", "TPU", None]
+JOB_LIST = TypeAdapter(list[schemas.JobOut])
+JOB_PAGE = TypeAdapter(schemas.JobPage)
+ANY = TypeAdapter(object)
+
+
+def job_rows(count: int, rng: random.Random) -> list[dict]:
+    origin = datetime(2024, 1, 1)
+    rows = []
+    for index in range(count):
+        start = origin + timedelta(seconds=rng.randrange(0, 365 * 86400), microseconds=rng.randrange(1_000_000))
+        duration = rng.uniform(600, 12 * 3600)
+        rows.append({
+            "id": index + 1,
+            "printer_id": rng.randrange(1, 100),
+            "filename": f"part_{index:06d}_v{rng.randrange(9)}.gcode",
+            "material": rng.choice(MATERIALS),
+            "duration_estimated": duration,
+            "duration_slicer": duration * rng.uniform(0.9, 1.1),
+            "start_time": start,
+            "end_time": start + timedelta(seconds=duration),
+            "status": rng.choice(STATUSES),
+            "progress": rng.random(),
+            "priority": rng.choice((0, 0, 1, 5)),
+            "filament_id": rng.choice((None, 1, 2, 3)),
+            "filament_used_grams": rng.uniform(1, 500),
+            "filament_cost": rng.uniform(0.1, 20),
+        })
+    return rows
+
+
+def timeline_items(rows: list[dict]) -> list[dict]:
+    printers: dict[int, dict] = {}
+    for row in rows:
+        printer = printers.setdefault(row["printer_id"], {
+            "id": row["printer_id"], "name": f"P{row['printer_id']}", "status": "idle", "progress": None, "moonraker_url": None, "jobs": [],
+        })
+        printer["jobs"].append({key: row[key] for key in ("id", "filename", "status", "start_time", "end_time")})
+    return list(printers.values())
+
+
+def legacy_timeline(items: list[dict]) -> bytes:
+    # What the timeline did before: isoformat() per job, then json.dumps
+    converted = [
+        {**item, "jobs": [
+            {**job, "start_time": job["start_time"].isoformat() if job["start_time"] else None,
+             "end_time": job["end_time"].isoformat() if job["end_time"] else None}
+            for job in item["jobs"]
+        ]}
+        for item in items
+    ]
+    return json.dumps({"items": converted}).encode()
+
+
+def timed(function, repeat: int) -> tuple[list[float], bytes]:
+    timings, body = [], b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings, body
+
+
+def measure(count: int, repeat: int, seed: int) -> dict:
+    rows = job_rows(count, random.Random(seed))
+    page = {"items": rows, "next_cursor": None}
+    items = timeline_items(rows)
+    encoders = {
+        "jobs.response_model": lambda: json.dumps(JOB_LIST.dump_python(JOB_LIST.validate_python(rows), mode="json")).encode(),
+        "jobs.validated": lambda: JOB_PAGE.dump_json(JOB_PAGE.validate_python(page)),
+        "jobs.fast": lambda: dumps(page),
+        "timeline.legacy": lambda: legacy_timeline(items),
+        "timeline.validated": lambda: ANY.dump_json(ANY.validate_python({"items": items})),
+        "timeline.fast": lambda: dumps({"items": items}),
+    }
+    results = {}
+    for name, function in encoders.items():
+        timings, body = timed(function, repeat)
+        results[name] = {"p50_ms": round(statistics.median(timings), 2), "max_ms": round(timings[-1], 2), "bytes": len(body)}
+    for payload in ("jobs", "timeline"):
+        baseline = results[f"{payload}.response_model" if payload == "jobs" else f"{payload}.legacy"]["p50_ms"]
+        results[f"{payload}.fast"]["speedup"] = round(baseline / max(results[f"{payload}.fast"]["p50_ms"], 0.001), 1)
+    # The fast path must not change what clients receive
+    assert json.loads(dumps(page))["items"] == json.loads(JOB_PAGE.dump_json(JOB_PAGE.validate_python(page)))["items"]
+    assert json.loads(dumps({"items": items})) == json.loads(legacy_timeline(items))
+    return {"rows": count, "repeat": repeat, "encoders": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    results = [measure(int(count), args.repeat, args.seed) for count in args.rows.split(",")]
+    json.dump({"benchmark": "serialization", "python": sys.version.split()[0], "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+import socket
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.database import async_engine, engine, run_migrations
+from tools.fake_moonraker import start_fleet_in_thread
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timeout"
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def database():
+    # Tests that need PostgreSQL use DATABASE_URL and are skipped without it
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except DBAPIError as exc:
+        pytest.skip(f"PostgreSQL indisponível: {type(exc.orig).__name__}")
+    run_migrations()
+    return engine
+
+
+@pytest.fixture
+async def async_database(database):
+    # asyncpg connections belong to the event loop that opened them, and every
+    # anyio test runs its own loop
+    yield async_engine
+    await async_engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def fake_url():
+    # One tools.fake_moonraker printer with long cycles and no cancellations,
+    # so it is practically always printing
+    [url] = start_fleet_in_thread(1, free_port(), print_seconds=3600, idle_seconds=1, cancel_every=0)
+    return url
@@ -0,0 +1,62 @@
+import httpx
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.models import User
+from app.security import get_password_hash
+
+EMAIL = "password-test@local"
+
+
+@pytest.fixture
+def user(database):
+    with Session(database) as db:
+        db.execute(delete(User).where(User.email == EMAIL))
+        db.add(User(email=EMAIL, hashed_password=get_password_hash("senha-antiga")))
+        db.commit()
+    yield
+    with Session(database) as db:
+        db.execute(delete(User).where(User.email == EMAIL))
+        db.commit()
+
+
+async def login(client: httpx.AsyncClient, password: str) -> httpx.Response:
+    return await client.post("/auth/login", data={"username": EMAIL, "password": password})
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.anyio
+async def test_password_change_revokes_old_tokens(async_database, database, user):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        old_token = (await login(client, "senha-antiga")).json()["access_token"]
+        # Caches the principal with the current password version
+        assert (await client.get("/jobs/eta-model", headers=bearer(old_token))).status_code == 200
+
+        wrong = await client.post(
+            "/auth/password", json={"current_password": "errada", "new_password": "senha-nova"}, headers=bearer(old_token)
+        )
+        assert wrong.status_code == 400
+        short = await client.post(
+            "/auth/password", json={"current_password": "senha-antiga", "new_password": "curta"}, headers=bearer(old_token)
+        )
+        assert short.status_code == 422
+
+        changed = await client.post(
+            "/auth/password", json={"current_password": "senha-antiga", "new_password": "senha-nova"}, headers=bearer(old_token)
+        )
+        assert changed.status_code == 200
+        new_token = changed.json()["access_token"]
+
+        revoked = await client.get("/jobs/eta-model", headers=bearer(old_token))
+        assert (revoked.status_code, revoked.json()["detail"]) == (401, "Token revogado")
+        assert (await client.get("/jobs/eta-model", headers=bearer(new_token))).status_code == 200
+        assert (await login(client, "senha-antiga")).status_code == 400
+        assert (await login(client, "senha-nova")).status_code == 200
+
+    with Session(database) as db:
+        assert db.scalar(select(User.password_version).where(User.email == EMAIL)) == 1
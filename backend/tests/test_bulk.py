@@ -0,0 +1,56 @@
+# Streaming import parsing and export encoding.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import literal, select
+
+from app.bulk import _export_rows, iter_records
+
+
+class StreamedRequest:
+    def __init__(self, content_type: str, *chunks: bytes):
+        self.headers = {"content-type": content_type}
+        self._chunks = chunks
+
+    async def stream(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+async def records(content_type: str, *chunks: bytes) -> list:
+    return [item async for item in iter_records(StreamedRequest(content_type, *chunks))]
+
+
+@pytest.mark.anyio
+async def test_csv_quoted_newlines():
+    # Chunk boundaries fall inside a quoted field and inside the UTF-8 sequence for "é"
+    body = 'name,notes\r\n\r\nPLA,"linha 1\r\nlinha ""2"""\r\nPETG,\r\nABS,"a,b",x\r\n'.encode().replace(b"PLA", "PLé".encode())
+    chunks = [body[index : index + 7] for index in range(0, len(body), 7)]
+    assert await records("text/csv", *chunks) == [
+        (3, {"name": "PLé", "notes": 'linha 1\r\nlinha "2"'}),
+        (5, {"name": "PETG", "notes": None}),
+        (6, "Esperadas 2 colunas, recebidas 3"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_csv_unterminated_quote():
+    assert await records("text/csv", b'name,notes\nPLA,"aberta\nPETG,x\n') == [(2, "CSV inválido: aspas não fechadas")]
+
+
+@pytest.mark.anyio
+async def test_ndjson_lines():
+    body = b'{"name": "PLA"}\r\n\n[1]\n{broken\n{"name": "PETG"}'
+    assert await records("application/x-ndjson", body) == [
+        (1, {"name": "PLA"}),
+        (3, "Cada linha deve ser um objeto JSON"),
+        (4, "JSON inválido"),
+        (5, {"name": "PETG"}),
+    ]
+
+
+@pytest.mark.anyio
+async def test_ndjson_export(async_database):
+    query = select(literal(7).label("id"), literal(datetime(2024, 3, 1, 10, 0, 5)).label("start_time"))
+    chunks = [chunk async for chunk in _export_rows(query, ["id", "start_time"], "ndjson")]
+    assert "".join(chunks) == '{"id":7,"start_time":"2024-03-01T10:00:05"}\n'
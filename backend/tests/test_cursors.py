@@ -0,0 +1,77 @@
+# Keyset cursors for /jobs: the opaque token and paging over start_time ties and NULLs.
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.routers.jobs import _decode_cursor, _encode_cursor, _page_jobs
+
+from .test_query_plans import filters
+
+
+@pytest.mark.parametrize("start_time", [datetime(2024, 5, 1, 12, 30, 15, 250), None])
+def test_cursor_round_trip(start_time):
+    cursor = _encode_cursor(start_time, 1234)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (start_time, 1234)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",
+        "bm90LWpzb24",
+        base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+        base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+        base64.urlsafe_b64encode(b'[null, "x"]').decode(),
+        base64.urlsafe_b64encode(b"5").decode(),
+    ],
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def seeded_printer(database):
+    with database.connect() as conn, conn.begin() as transaction:
+        printer_id = conn.execute(text("INSERT INTO printers (name) VALUES ('cursor-test') RETURNING id")).scalar_one()
+        # Ten jobs share each start_time and every seventh job has not started
+        conn.execute(
+            text(
+                """
+                INSERT INTO jobs (printer_id, filename, material, start_time, status, priority)
+                SELECT :printer_id, 'cursor_' || i || '.gcode', 'PLA',
+                       CASE WHEN i % 7 = 0 THEN NULL ELSE timestamp '2024-01-01' + (i / 10) * interval '1 hour' END,
+                       CASE WHEN i % 7 = 0 THEN 'queued' ELSE 'completed' END, 0
+                FROM generate_series(1, 250) AS i
+                """
+            ),
+            {"printer_id": printer_id},
+        )
+        yield conn, printer_id
+        transaction.rollback()
+
+
+def test_pages_cover_every_job_once(seeded_printer):
+    conn, printer_id = seeded_printer
+    db = Session(bind=conn)
+    expected = conn.execute(
+        text("SELECT id FROM jobs WHERE printer_id = :printer_id ORDER BY start_time DESC NULLS LAST, id DESC"),
+        {"printer_id": printer_id},
+    ).scalars().all()
+
+    seen, cursor = [], None
+    while True:
+        page = _page_jobs(db, filters(printer_id=[printer_id], cursor=cursor, limit=37, fields="start_time"))
+        assert len(page["items"]) <= 37
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(expected) == 250
+    assert seen == expected
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app.eta import CorrectionModel, EtaEngine, decay_weights, fit, predict
+
+
+def test_fit_recovers_factors():
+    rng = np.random.default_rng(1)
+    printer_effect = np.log([1.0, 1.3, 0.9])
+    material_effect = np.log([1.0, 1.2])
+    printer = rng.integers(0, 3, 6000)
+    material = rng.integers(0, 2, 6000)
+    log_ratio = np.log(1.1) + printer_effect[printer] + material_effect[material] + rng.normal(0, 0.02, 6000)
+
+    model = fit(printer, material, log_ratio, np.ones(6000), 3, 2)
+    factors = model.factors(np.array([0, 1, 2, 1]), np.array([0, 0, 1, 1]))
+    assert factors == pytest.approx([1.1, 1.1 * 1.3, 1.1 * 0.9 * 1.2, 1.1 * 1.3 * 1.2], rel=0.02)
+    assert model.samples == 6000
+
+    # A printer or material first seen after the fit gets no correction
+    assert model.factors(np.array([7]), np.array([9])) == pytest.approx(np.exp([model.offset]))
+
+
+def test_fit_shrinks_sparse_printers():
+    printer = np.array([0] * 1000 + [1] * 2)
+    material = np.zeros(1002, np.int64)
+    log_ratio = np.where(printer == 1, np.log(2.0), 0.0)
+    model = fit(printer, material, log_ratio, np.ones(1002), 2, 1)
+    assert 1.0 < model.factors(np.array([1]), np.array([0]))[0] < 1.2
+
+
+def test_fit_without_samples():
+    model = fit(np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), np.zeros(0), 2, 3)
+    assert model.samples == 0
+    assert model.factors(np.array([1]), np.array([2])) == pytest.approx([1.0])
+
+
+def test_decay_weights():
+    now = 100 * 86400.0
+    finished = np.array([now, now - 7 * 86400, now - 14 * 86400, now + 60])
+    assert decay_weights(finished, now, 7) == pytest.approx([1, 0.5, 0.25, 1])
+    assert decay_weights(finished, now, 0) == pytest.approx([1, 1, 1, 1])
+
+
+def test_predict_blends_with_progress():
+    model = CorrectionModel(np.log(1.5), np.zeros(1), np.zeros(1), 10)
+    codes = np.zeros(4, np.int64)
+    estimate = np.array([1000.0, 1000.0, np.nan, 1000.0])
+    elapsed = np.array([0.0, 500.0, 600.0, np.nan])
+    progress = np.array([0.0, 0.25, 0.5, np.nan])
+    predicted, remaining = predict(model, codes, codes, estimate, elapsed, progress)
+    assert predicted[:2] == pytest.approx([1500, 1500])
+    # Not started: the corrected estimate
+    assert remaining[0] == pytest.approx(1500)
+    # 25% done in 500s: 75% of 1500 plus 25% of the 2000s extrapolation, minus elapsed
+    assert remaining[1] == pytest.approx(0.75 * 1500 + 0.25 * 2000 - 500)
+    # No estimate: progress extrapolation only
+    assert remaining[2] == pytest.approx(600)
+    assert remaining[3] == pytest.approx(1500)
+
+
+@pytest.mark.anyio
+async def test_training_includes_archived_jobs(async_database, database):
+    with database.begin() as conn:
+        printer_id = conn.execute(text("INSERT INTO printers (name) VALUES ('eta-test') RETURNING id")).scalar_one()
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS jobs_archive_p196401 PARTITION OF jobs_archive "
+                "FOR VALUES FROM ('1964-01-01') TO ('1964-02-01')"
+            )
+        )
+        job_ids = [
+            conn.execute(
+                text(
+                    f"INSERT INTO {table} (id, printer_id, filename, material, start_time, end_time, status, priority, duration_slicer) "
+                    "VALUES (nextval(pg_get_serial_sequence('jobs', 'id')), :id, 'eta.gcode', 'PLA', :start, "
+                    ":start + interval '1 hour', 'completed', 0, 3000) RETURNING id"
+                ),
+                {"id": printer_id, "start": start},
+            ).scalar_one()
+            for table, start in (("jobs", datetime(1964, 1, 20, 8)), ("jobs_archive", datetime(1964, 1, 5, 8)))
+        ]
+    try:
+        engine = EtaEngine()
+        await engine._load_all()
+        assert all(job_id in engine.training._rows for job_id in job_ids)
+    finally:
+        with database.begin() as conn:
+            conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer_id})
+            conn.execute(text("DROP TABLE IF EXISTS jobs_archive_p196401"))
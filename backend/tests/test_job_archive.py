@@ -0,0 +1,101 @@
+# Archival moves old finished jobs to jobs_archive without touching job_stats.
+# The test jobs are from 1965 so a cutoff in 1970 leaves every other job alone.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.database import engine
+from app.job_archive import JobArchiver
+
+JOBS = [
+    ("jan-a.gcode", datetime(1965, 1, 5, 8), "completed"),
+    ("jan-b.gcode", datetime(1965, 1, 20, 8), "completed"),
+    ("feb.gcode", datetime(1965, 2, 2, 8), "cancelled"),
+    ("running.gcode", datetime(1965, 3, 1, 8), "printing"),
+    ("recent.gcode", datetime(1975, 6, 1, 8), "completed"),
+]
+PARTITIONS = ("jobs_archive_p196501", "jobs_archive_p196502")
+
+
+def stats(conn, printer_id: int) -> list[tuple]:
+    return conn.execute(
+        text(
+            "SELECT day, material, jobs_total, jobs_succeeded, jobs_failed, print_seconds "
+            "FROM job_stats WHERE printer_id = :id ORDER BY day"
+        ),
+        {"id": printer_id},
+    ).all()
+
+
+@pytest.fixture
+def printer(database):
+    with database.begin() as conn:
+        printer_id = conn.execute(text("INSERT INTO printers (name) VALUES ('archive-test') RETURNING id")).scalar_one()
+        for filename, start_time, status in JOBS:
+            conn.execute(
+                text(
+                    "INSERT INTO jobs (printer_id, filename, material, start_time, end_time, status, priority) "
+                    "VALUES (:printer_id, :filename, 'PLA', :start, :start + interval '1 hour', :status, 0)"
+                ),
+                {"printer_id": printer_id, "filename": filename, "start": start_time, "status": status},
+            )
+    yield printer_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer_id})
+        for partition in PARTITIONS:
+            conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+
+
+@pytest.mark.anyio
+async def test_archive_moves_old_finished_jobs(async_database, printer):
+    with engine.connect() as conn:
+        before = stats(conn, printer)
+    archiver = JobArchiver()
+    moved_counts = []
+    archiver.add_listener(moved_counts.append)
+
+    after_days = (datetime.utcnow() - datetime(1970, 1, 1)).days
+    assert await archiver.archive(after_days) >= 3
+    assert moved_counts and moved_counts[0] >= 3
+    assert archiver._partitions >= set(PARTITIONS)
+
+    with engine.connect() as conn:
+        hot = conn.execute(text("SELECT filename FROM jobs WHERE printer_id = :id ORDER BY filename"), {"id": printer}).scalars().all()
+        archived = conn.execute(
+            text("SELECT tableoid::regclass::text, filename FROM jobs_archive WHERE printer_id = :id ORDER BY filename"),
+            {"id": printer},
+        ).all()
+        assert stats(conn, printer) == before
+    assert hot == ["recent.gcode", "running.gcode"]
+    assert archived == [
+        ("jobs_archive_p196502", "feb.gcode"),
+        ("jobs_archive_p196501", "jan-a.gcode"),
+        ("jobs_archive_p196501", "jan-b.gcode"),
+    ]
+    assert [row.jobs_total for row in before] == [1, 1, 1, 1, 1]
+
+
+def test_deleting_printer_clears_archive_and_stats(database, printer):
+    with database.begin() as conn:
+        conn.execute(text("SELECT set_config('print_manager.archiving', 'on', true)"))
+        conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS jobs_archive_p196501 PARTITION OF jobs_archive "
+                "FOR VALUES FROM ('1965-01-01') TO ('1965-02-01')"
+            )
+        )
+        conn.execute(
+            text(
+                "WITH moved AS (DELETE FROM jobs WHERE printer_id = :id AND start_time < '1965-02-01' "
+                "RETURNING id, printer_id, filename, material, start_time, end_time, status, priority) "
+                "INSERT INTO jobs_archive (id, printer_id, filename, material, start_time, end_time, status, priority) "
+                "SELECT * FROM moved"
+            ),
+            {"id": printer},
+        )
+    with database.begin() as conn:
+        assert len(stats(conn, printer)) == 5
+        conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer})
+        assert stats(conn, printer) == []
+        assert conn.execute(text("SELECT count(*) FROM jobs_archive WHERE printer_id = :id"), {"id": printer}).scalar_one() == 0
@@ -0,0 +1,115 @@
+# Moonraker ingestion end to end: observed print_stats transitions become one
+# upserted job, and the triggers keep job_stats and the filament stock in step.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.job_ingest import JobIngestor
+from app.models import Job
+from app.moonraker_poller import poller
+from app.printer_state import PrinterSnapshot
+from app.routers.jobs import _active, _finished, _page_jobs
+from app.timeline_hub import job_window
+
+from .conftest import wait_for
+from .test_query_plans import filters
+
+STOCK_GRAMS = 1000.0
+PRICE_PER_KG = 20.0
+
+
+@pytest.fixture
+def printer(database, fake_url):
+    with database.begin() as conn:
+        filament_id = conn.execute(
+            text("INSERT INTO filaments (name, material, price_per_kg, stock_grams) VALUES ('ingest-test', 'PLA', :price, :stock) RETURNING id"),
+            {"price": PRICE_PER_KG, "stock": STOCK_GRAMS},
+        ).scalar_one()
+        printer_id = conn.execute(
+            text("INSERT INTO printers (name, moonraker_url, filament_id) VALUES ('ingest-test', :url, :filament_id) RETURNING id"),
+            {"url": fake_url, "filament_id": filament_id},
+        ).scalar_one()
+    yield printer_id, filament_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer_id})
+        conn.execute(text("DELETE FROM filaments WHERE id = :id"), {"id": filament_id})
+
+
+def snapshot(printer_id: int, state: str, progress: float, filament_mm: float, updated_at: datetime) -> PrinterSnapshot:
+    status = {
+        "print_stats": {"state": state, "filename": "ingest/part.gcode", "total_duration": 600.0, "filament_used": filament_mm},
+        "display_status": {"progress": progress},
+    }
+    return PrinterSnapshot(printer_id, state, "ingest/part.gcode", progress, print_duration=600.0, updated_at=updated_at, status=status)
+
+
+@pytest.mark.anyio
+async def test_print_becomes_job(async_database, printer):
+    printer_id, filament_id = printer
+    ingestor = JobIngestor()
+    await ingestor.start()
+    try:
+        ingestor.on_snapshot(snapshot(printer_id, "printing", 0.5, 2500.0, datetime(2024, 3, 1, 10, 10)), None)
+        active = ingestor._active[printer_id]
+        # Filament and slicer estimate come from the printer row and the G-code metadata
+        await wait_for(lambda: active.grams_per_mm is not None)
+        await ingestor.flush()
+        ingestor.on_snapshot(snapshot(printer_id, "printing", 0.9, 4500.0, datetime(2024, 3, 1, 10, 18)), None)
+        ingestor.on_snapshot(snapshot(printer_id, "complete", 1.0, 5000.0, datetime(2024, 3, 1, 10, 20)), None)
+    finally:
+        await ingestor.stop()
+        await poller.stop()
+    assert printer_id not in ingestor._active
+
+    with engine.connect() as conn:
+        job = conn.execute(text("SELECT * FROM jobs WHERE printer_id = :id"), {"id": printer_id}).mappings().one()
+        stats = conn.execute(text("SELECT * FROM job_stats WHERE printer_id = :id"), {"id": printer_id}).mappings().one()
+        stock = conn.execute(text("SELECT stock_grams FROM filaments WHERE id = :id"), {"id": filament_id}).scalar_one()
+        ledger = conn.execute(
+            text("SELECT job_id, delta_grams, reason FROM filament_ledger WHERE filament_id = :id"), {"id": filament_id}
+        ).all()
+
+    assert job["status"] == "complete"
+    assert job["start_time"] == datetime(2024, 3, 1, 10, 0)
+    assert job["end_time"] == datetime(2024, 3, 1, 10, 20)
+    assert job["progress"] == 1.0
+    assert job["source_key"].startswith(f"{printer_id}:ingest/part.gcode:")
+    assert job["filament_id"] == filament_id
+    assert job["duration_slicer"] == pytest.approx(3348)
+    # fake_moonraker slices 5000 mm into 14.9 g
+    assert job["filament_used_grams"] == pytest.approx(14.9)
+    assert job["filament_cost"] == pytest.approx(14.9 / 1000 * PRICE_PER_KG)
+    assert stock == pytest.approx(STOCK_GRAMS - 14.9)
+    assert [(job_id, reason) for job_id, _, reason in ledger] == [(job["id"], "job")]
+    assert ledger[0].delta_grams == pytest.approx(-14.9)
+
+    assert (stats["day"].isoformat(), stats["material"]) == ("2024-03-01", "")
+    assert (stats["jobs_total"], stats["jobs_succeeded"], stats["jobs_failed"]) == (1, 1, 0)
+    assert stats["print_seconds"] == pytest.approx(1200)
+
+
+@pytest.mark.anyio
+async def test_paused_print_stays_active(async_database, printer):
+    printer_id, _ = printer
+    ingestor = JobIngestor()
+    await ingestor.start()
+    try:
+        ingestor.on_snapshot(snapshot(printer_id, "printing", 0.3, 1500.0, datetime(2024, 3, 1, 10, 10)), None)
+        ingestor.on_snapshot(snapshot(printer_id, "paused", 0.3, 1500.0, datetime(2024, 3, 1, 10, 12)), None)
+        await ingestor.flush()
+    finally:
+        await ingestor.stop()
+        await poller.stop()
+    assert printer_id in ingestor._active
+
+    with Session(engine) as db:
+        assert db.scalar(select(Job.status).where(Job.printer_id == printer_id)) == "paused"
+        by_printer = filters(printer_id=[printer_id])
+        assert len(_page_jobs(db, by_printer, _active)["items"]) == 1
+        assert _page_jobs(db, by_printer, _finished)["items"] == []
+        # Shown on the timeline whatever the window
+        window = job_window(datetime(2030, 1, 1), datetime(2030, 1, 2))
+        assert db.scalar(select(Job.id).where(Job.printer_id == printer_id, window)) is not None
@@ -0,0 +1,123 @@
+# The poller and the websocket subscriber against tools.fake_moonraker.
+import asyncio
+
+import pytest
+
+from app import moonraker_poller, moonraker_subscriber
+from app.moonraker_poller import MoonrakerPoller
+from app.moonraker_subscriber import MoonrakerSubscriber
+from app.printer_state import PrinterStateStore
+
+from .conftest import free_port, wait_for
+
+PRINTER_ID = 7
+
+
+def targets(monkeypatch, module, value: list[tuple[int, str]]):
+    async def load_targets():
+        return list(value)
+
+    monkeypatch.setattr(module, "load_targets", load_targets)
+
+
+@pytest.mark.anyio
+async def test_poller_reads_status(fake_url):
+    store = PrinterStateStore()
+    poller = MoonrakerPoller(store)
+    try:
+        snapshot = await poller._poll_printer(PRINTER_ID, fake_url)
+    finally:
+        await poller.stop()
+    assert snapshot.error is None
+    assert snapshot.state == "printing"
+    assert snapshot.filename.startswith("fleet/printer0_part")
+    assert 0 <= snapshot.progress <= 1
+    assert snapshot.status["extruder"]["target"] > 0
+    assert store.get(PRINTER_ID) is snapshot
+    assert poller._backoff[PRINTER_ID].failures == 0
+
+
+@pytest.mark.anyio
+async def test_poller_backs_off_offline_printer():
+    store = PrinterStateStore()
+    poller = MoonrakerPoller(store)
+    url = f"http://127.0.0.1:{free_port()}"
+    try:
+        first = await poller._poll_printer(PRINTER_ID, url)
+        next_attempt = poller._backoff[PRINTER_ID].next_attempt
+        await poller._poll_printer(PRINTER_ID, url)
+    finally:
+        await poller.stop()
+    assert first.state == "offline"
+    assert first.error
+    assert poller._backoff[PRINTER_ID].failures == 2
+    assert poller._backoff[PRINTER_ID].next_attempt > next_attempt
+
+
+@pytest.mark.anyio
+async def test_poll_once_follows_targets(monkeypatch, fake_url):
+    store = PrinterStateStore()
+    poller = MoonrakerPoller(store)
+    try:
+        targets(monkeypatch, moonraker_poller, [(PRINTER_ID, fake_url)])
+        await poller.poll_once()
+        assert store.get(PRINTER_ID).state == "printing"
+
+        targets(monkeypatch, moonraker_poller, [])
+        await poller.poll_once()
+    finally:
+        await poller.stop()
+    assert store.get(PRINTER_ID) is None
+    assert PRINTER_ID not in poller._backoff
+
+
+@pytest.mark.anyio
+async def test_subscriber_applies_updates(fake_url):
+    store = PrinterStateStore()
+    snapshots = []
+    store.add_observer(lambda snapshot, previous: snapshots.append(snapshot))
+    listener = asyncio.create_task(MoonrakerSubscriber(store)._listen(PRINTER_ID, fake_url))
+    try:
+        # The subscribe reply, then notify_status_update pushes as progress moves
+        await wait_for(lambda: len(snapshots) >= 3 or listener.done())
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+    assert all(snapshot.state == "printing" and snapshot.error is None for snapshot in snapshots)
+    assert snapshots[-1].progress >= snapshots[0].progress
+    # Updates are merged into the subscribed status, not replacing it
+    assert snapshots[-1].filename == snapshots[0].filename
+    assert snapshots[-1].status["heater_bed"]["target"] > 0
+
+
+@pytest.mark.anyio
+async def test_subscriber_reconcile(monkeypatch, fake_url):
+    store = PrinterStateStore()
+    subscriber = MoonrakerSubscriber(store)
+    try:
+        targets(monkeypatch, moonraker_subscriber, [(PRINTER_ID, fake_url)])
+        await subscriber.reconcile()
+        assert list(subscriber._connections) == [PRINTER_ID]
+        await wait_for(lambda: store.get(PRINTER_ID) is not None)
+        assert store.get(PRINTER_ID).state == "printing"
+
+        targets(monkeypatch, moonraker_subscriber, [])
+        await subscriber.reconcile()
+        assert subscriber._connections == {}
+        assert store.get(PRINTER_ID) is None
+    finally:
+        await subscriber.stop()
+
+
+@pytest.mark.anyio
+async def test_subscriber_marks_unreachable_printer_offline(monkeypatch):
+    store = PrinterStateStore()
+    subscriber = MoonrakerSubscriber(store)
+    try:
+        targets(monkeypatch, moonraker_subscriber, [(PRINTER_ID, f"http://127.0.0.1:{free_port()}")])
+        await subscriber.reconcile()
+        await wait_for(lambda: store.get(PRINTER_ID) is not None)
+    finally:
+        await subscriber.stop()
+    assert store.get(PRINTER_ID).state == "offline"
+    assert store.get(PRINTER_ID).error
@@ -0,0 +1,90 @@
+# GCRA rate limiting: both stores share the same semantics.
+import uuid
+
+import pytest
+from sqlalchemy import text
+from starlette.requests import Request
+
+from app.rate_limit import SWEEP_INTERVAL_SECONDS, MemoryRateLimitStore, PostgresRateLimitStore, RateLimiter, parse_costs
+
+WINDOW = 60.0
+INCREMENT = 6.0  # 10 requests per window
+NOW = 1_000_000.0
+
+
+async def burst(store, key: str, now: float) -> int:
+    allowed = 0
+    while (await store.acquire(key, INCREMENT, WINDOW, now)).allowed:
+        allowed += 1
+    return allowed
+
+
+async def check_gcra(store, key: str):
+    assert await burst(store, key, NOW) == 10
+    decision = await store.acquire(key, INCREMENT, WINDOW, NOW)
+    assert not decision.allowed
+    assert decision.retry_after == pytest.approx(INCREMENT)
+
+    # One emission interval later exactly one more request fits
+    assert not (await store.acquire(key, INCREMENT, WINDOW, NOW + INCREMENT - 0.5)).allowed
+    assert await burst(store, key, NOW + INCREMENT) == 1
+
+    # Other clients have their own budget, and an idle client gets its full burst back
+    assert await burst(store, f"{key}-other", NOW) == 10
+    assert await burst(store, key, NOW + 2 * WINDOW) == 10
+
+    # A request costing more than the window is never allowed
+    assert not (await store.acquire(f"{key}-big", WINDOW + 1, WINDOW, NOW)).allowed
+
+
+@pytest.mark.anyio
+async def test_memory_store():
+    await check_gcra(MemoryRateLimitStore(), "client")
+
+
+@pytest.mark.anyio
+async def test_memory_store_sweeps_idle_keys():
+    store = MemoryRateLimitStore()
+    await store.acquire("idle", INCREMENT, WINDOW, NOW)
+    # Expired keys stay until the next sweep
+    await store.acquire("busy", INCREMENT, WINDOW, NOW + INCREMENT + 1)
+    assert len(store) == 2
+    await store.acquire("busy", INCREMENT, WINDOW, NOW + SWEEP_INTERVAL_SECONDS)
+    assert len(store) == 1
+
+
+@pytest.mark.anyio
+async def test_postgres_store(async_database):
+    key = f"test-{uuid.uuid4()}"
+    try:
+        await check_gcra(PostgresRateLimitStore(async_database), key)
+    finally:
+        async with async_database.begin() as conn:
+            await conn.execute(text("DELETE FROM rate_limits WHERE key LIKE :key"), {"key": f"{key}%"})
+
+
+def test_parse_costs():
+    assert parse_costs(" /auth/login = 5, /metrics=0,/jobs=,broken ,") == {"/auth/login": 5.0, "/metrics": 0.0}
+
+
+def test_longest_prefix_cost():
+    limiter = RateLimiter(MemoryRateLimitStore(), {"/auth": 2, "/auth/login": 5, "/metrics": 0})
+    assert limiter.cost_for("/auth/login") == 5
+    assert limiter.cost_for("/auth/me") == 2
+    assert limiter.cost_for("/printers") == 1
+
+
+def request(path: str, host: str = "10.0.0.1") -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b"", "client": (host, 1234)})
+
+
+@pytest.mark.anyio
+async def test_limiter_charges_path_cost():
+    limiter = RateLimiter(MemoryRateLimitStore(), {"/auth/login": 1_000_000, "/metrics": 0})
+    assert (await limiter.check(request("/metrics"))).allowed
+    assert limiter.rejections == 0
+    assert not (await limiter.check(request("/auth/login"))).allowed
+    assert limiter.rejections == 1
+    assert (await limiter.check(request("/printers"))).allowed
+    assert not (await limiter.check(request("/auth/login", host="10.0.0.2"))).allowed
+    assert limiter.rejections == 2
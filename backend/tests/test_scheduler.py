@@ -0,0 +1,47 @@
+from app.scheduler import PrinterSlot, QueuedJob, parse_materials, plan
+
+
+def starts(schedule) -> dict[int, list[tuple[int, float, float]]]:
+    return {
+        printer_id: [(assignment.job.job_id, assignment.start, assignment.end) for assignment in assignments]
+        for printer_id, assignments in schedule.assignments.items()
+    }
+
+
+def test_priority_then_id_on_earliest_finish():
+    printers = [PrinterSlot(1, "A", available_at=0), PrinterSlot(2, "B", available_at=100)]
+    jobs = [
+        QueuedJob(3, "c.gcode", None, duration=50),
+        QueuedJob(2, "b.gcode", None, duration=50),
+        QueuedJob(1, "a.gcode", None, duration=500, priority=5),
+    ]
+    schedule = plan(printers, jobs)
+    assert starts(schedule) == {1: [(1, 0, 500)], 2: [(2, 100, 150), (3, 150, 200)]}
+    assert schedule.unassigned == []
+
+
+def test_materials_and_changeover():
+    printers = [
+        PrinterSlot(1, "PLA only", available_at=0, materials=parse_materials("pla"), loaded_material="PLA"),
+        PrinterSlot(2, "Any", available_at=0, loaded_material="PETG"),
+    ]
+    jobs = [
+        QueuedJob(1, "tpu.gcode", "TPU", duration=100),
+        QueuedJob(2, "pla.gcode", "PLA", duration=100),
+        QueuedJob(3, "petg.gcode", "PETG", duration=100),
+    ]
+    schedule = plan(printers, jobs, changeover_seconds=30)
+    by_job = {assignment.job.job_id: assignment for assignments in schedule.assignments.values() for assignment in assignments}
+    # TPU only fits the open printer and needs a spool change there
+    assert (by_job[1].printer_id, by_job[1].start, by_job[1].material_change) == (2, 30, True)
+    assert (by_job[2].printer_id, by_job[2].start, by_job[2].material_change) == (1, 0, False)
+    # Printer 1 frees up first but cannot take PETG
+    assert (by_job[3].printer_id, by_job[3].start, by_job[3].end) == (2, 160, 260)
+    assert by_job[3].material_change
+
+
+def test_unassigned_reasons():
+    job = QueuedJob(1, "abs.gcode", "ABS", duration=10)
+    schedule = plan([PrinterSlot(1, "PLA only", available_at=0, materials=frozenset({"PLA"}))], [job])
+    assert schedule.unassigned == [(job, "Nenhuma impressora compatível")]
+    assert plan([], [job]).unassigned == [(job, "Nenhuma impressora disponível")]
@@ -0,0 +1,45 @@
+# Runtime settings changed by one worker reach the others through the event bus.
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.event_bus import event_bus
+from app.settings_service import SETTINGS_CHANGED, settings_service
+
+from .conftest import wait_for
+
+KEY = "telemetry_flush_seconds"
+
+
+@pytest.fixture
+def cleanup(database):
+    yield
+    with Session(database) as db:
+        db.execute(text("DELETE FROM settings WHERE key = :key"), {"key": KEY})
+        db.commit()
+        settings_service.load(db)
+
+
+def test_change_published_on_commit(database, monkeypatch):
+    published = []
+    monkeypatch.setattr(event_bus, "publish", lambda topic, data, local=True: published.append((topic, local)))
+    with Session(database) as db:
+        settings_service.notify(db)
+        db.rollback()
+        assert published == []
+        settings_service.notify(db)
+        db.commit()
+    # Not local: the worker that wrote the row reloads synchronously
+    assert published == [(SETTINGS_CHANGED, False)]
+
+
+@pytest.mark.anyio
+async def test_event_reloads_settings(async_database, database, cleanup):
+    await settings_service.start()
+    try:
+        with database.begin() as conn:
+            conn.execute(text("INSERT INTO settings (key, value) VALUES (:key, '2.5')"), {"key": KEY})
+        settings_service.on_event({})
+        await wait_for(lambda: settings_service.current.telemetry_flush_seconds == 2.5)
+    finally:
+        await settings_service.stop()
@@ -0,0 +1,30 @@
+# In-memory telemetry series live as long as their printer.
+import pytest
+
+from app.telemetry import CHANNELS, TelemetryStore
+from app.timeline_hub import TimelineHub
+
+VALUES = tuple(float(index) for index in range(len(CHANNELS)))
+PRINTER_ID = -1  # never in the database
+
+
+def test_remove_drops_series():
+    store = TelemetryStore()
+    store.record(PRINTER_ID, 1000, VALUES)
+    assert store.stats()["printers"] == 1
+    store.remove(PRINTER_ID)
+    assert store.stats()["printers"] == 0
+    # A sample still in flight does not bring it back
+    store.record(PRINTER_ID, 1001, VALUES)
+    assert store.rows(PRINTER_ID, "1s", 0, 2000) == []
+
+
+@pytest.mark.anyio
+async def test_hub_reports_removed_printers(async_database):
+    hub = TimelineHub()
+    removed = []
+    hub.add_listener(removed.append)
+    hub._printers[PRINTER_ID] = {"id": PRINTER_ID}
+    await hub._refresh_printer(PRINTER_ID)
+    assert removed == [PRINTER_ID]
+    assert PRINTER_ID not in hub._printers
@@ -0,0 +1,58 @@
+# Thumbnail URLs handed out by /metadata carry a signed token, so <img> can load them.
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.main import app
+from app.security import create_access_token, create_thumbnail_token, get_password_hash
+
+EMAIL = "thumbnail-test@local"
+FILENAME = "fleet/part.gcode"
+
+
+@pytest.fixture
+def printer_id(database, fake_url):
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE email = :email"), {"email": EMAIL})
+        conn.execute(
+            text("INSERT INTO users (email, hashed_password) VALUES (:email, :password)"),
+            {"email": EMAIL, "password": get_password_hash("thumbnail")},
+        )
+        printer_id = conn.execute(
+            text("INSERT INTO printers (name, moonraker_url) VALUES ('thumbnail-test', :url) RETURNING id"), {"url": fake_url}
+        ).scalar_one()
+    yield printer_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer_id})
+        conn.execute(text("DELETE FROM users WHERE email = :email"), {"email": EMAIL})
+
+
+@pytest.mark.anyio
+async def test_signed_thumbnail_url(async_database, printer_id):
+    headers = {"Authorization": f"Bearer {create_access_token(EMAIL)}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        metadata = await client.get(f"/moonraker/{printer_id}/metadata", params={"filename": FILENAME}, headers=headers)
+        assert metadata.status_code == 200
+        url = metadata.json()["thumbnails"][-1]["url"]
+
+        # No Authorization header, like an <img> request
+        thumbnail = await client.get(url)
+        assert thumbnail.status_code == 200
+        assert thumbnail.headers["content-type"] == "image/png"
+
+        thumbnail_url = f"/moonraker/{printer_id}/thumbnail"
+        token = parse_qs(urlsplit(url).query)["token"][0]
+        assert (await client.get(thumbnail_url, params={"filename": FILENAME})).status_code == 401
+        assert (await client.get(thumbnail_url, params={"filename": FILENAME}, headers=headers)).status_code == 200
+        for params in (
+            {"filename": "fleet/other.gcode", "token": token},
+            {"filename": FILENAME, "token": token[:-2] + "xx"},
+            {"filename": FILENAME, "token": create_access_token(EMAIL)},
+        ):
+            assert (await client.get(thumbnail_url, params=params)).status_code == 401
+
+        # A thumbnail token is not a login
+        scoped = {"Authorization": f"Bearer {create_thumbnail_token(printer_id, FILENAME)}"}
+        assert (await client.get(f"/moonraker/{printer_id}/metadata", params={"filename": FILENAME}, headers=scoped)).status_code == 401
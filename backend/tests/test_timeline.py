@@ -0,0 +1,49 @@
+# /timeline revalidates with 304 while printers only make progress.
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.main import app
+from app.printer_state import printer_state
+from app.security import create_access_token, get_password_hash
+
+EMAIL = "timeline-test@local"
+
+
+def status(state: str, progress: float) -> dict:
+    return {"print_stats": {"state": state, "filename": "part.gcode"}, "display_status": {"progress": progress}}
+
+
+@pytest.fixture
+def printer_id(database):
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE email = :email"), {"email": EMAIL})
+        conn.execute(
+            text("INSERT INTO users (email, hashed_password) VALUES (:email, :password)"),
+            {"email": EMAIL, "password": get_password_hash("timeline")},
+        )
+        printer_id = conn.execute(text("INSERT INTO printers (name) VALUES ('timeline-test') RETURNING id")).scalar_one()
+    yield printer_id
+    printer_state.remove(printer_id)
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM printers WHERE id = :id"), {"id": printer_id})
+        conn.execute(text("DELETE FROM users WHERE email = :email"), {"email": EMAIL})
+
+
+@pytest.mark.anyio
+async def test_etag_ignores_progress(async_database, printer_id):
+    headers = {"Authorization": f"Bearer {create_access_token(EMAIL)}"}
+    printer_state.apply_status(printer_id, status("printing", 0.1))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.get("/timeline", headers=headers)
+        assert first.status_code == 200
+        [item] = [item for item in first.json()["items"] if item["id"] == printer_id]
+        assert item["status"] == "printing"
+        assert "progress" not in item
+
+        revalidate = {**headers, "If-None-Match": first.headers["ETag"]}
+        printer_state.apply_status(printer_id, status("printing", 0.5))
+        assert (await client.get("/timeline", headers=revalidate)).status_code == 304
+
+        printer_state.apply_status(printer_id, status("paused", 0.5))
+        assert (await client.get("/timeline", headers=revalidate)).status_code == 200
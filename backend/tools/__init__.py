@@ -0,0 +1 @@
+# Development and benchmarking helpers
@@ -0,0 +1,219 @@
+"""Fake Moonraker fleet for local development, load tests and benchmarks.
+
+    python -m tools.fake_moonraker --count 30 --base-port 7125 --latency-ms 40
+
+Each printer listens on its own port and loops through print cycles
+(printing -> complete/cancelled -> next file). It implements the parts of the
+Moonraker API the backend uses: printer/objects/query, server/files/metadata,
+G-code thumbnails and the JSON-RPC websocket with printer.objects.subscribe.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response
+
+PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+NOTIFY_INTERVAL = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+class FakePrinter:
+    def __init__(self, index: int, print_seconds: float = 600, idle_seconds: float = 30, cancel_every: int = 5):
+        self.index = index
+        self.print_seconds = print_seconds
+        self.idle_seconds = idle_seconds
+        self.cancel_every = cancel_every
+        self.started = time.time() - random.uniform(0, print_seconds + idle_seconds)
+
+    def filename(self, cycle: int) -> str:
+        return f"fleet/printer{self.index}_part{cycle}.gcode"
+
+    def status(self, now: float | None = None) -> dict:
+        elapsed = (now or time.time()) - self.started
+        cycle_length = self.print_seconds + self.idle_seconds
+        cycle, offset = divmod(elapsed, cycle_length)
+        cycle = int(cycle)
+        cancelled = self.cancel_every and cycle % self.cancel_every == self.cancel_every - 1
+        print_length = self.print_seconds / 2 if cancelled else self.print_seconds
+        printing = offset < print_length
+        progress = min(offset / self.print_seconds, 1.0)
+        if printing:
+            state = "printing"
+        else:
+            state = "cancelled" if cancelled else "complete"
+        duration = min(offset, print_length)
+        extruder_target = 210.0 if printing else 0.0
+        bed_target = 60.0 if printing else 0.0
+        return {
+            "print_stats": {
+                "state": state,
+                "filename": self.filename(cycle),
+                "print_duration": round(duration, 2),
+                "total_duration": round(duration, 2),
+                "filament_used": round(progress * 5000, 1),
+            },
+            "display_status": {"progress": round(progress, 4), "message": None},
+            "virtual_sdcard": {"progress": round(progress, 4), "is_active": printing},
+            "extruder": {"temperature": round(extruder_target + random.uniform(-0.8, 0.8), 2) if printing else 24.0, "target": extruder_target},
+            "heater_bed": {"temperature": round(bed_target + random.uniform(-0.3, 0.3), 2) if printing else 23.0, "target": bed_target},
+            "gcode_move": {"speed_factor": 1.0, "speed": 6000.0 if printing else 0.0},
+        }
+
+    def metadata(self, filename: str) -> dict:
+        return {
+            "filename": filename,
+            "modified": round(self.started, 3),
+            "size": 4_200_000,
+            "slicer": "PrusaSlicer",
+            "slicer_version": "2.7.1",
+            "estimated_time": round(self.print_seconds * 0.93),
+            "filament_total": 5000.0,
+            "filament_weight_total": 14.9,
+            "layer_height": 0.2,
+            "object_height": 42.0,
+            "thumbnails": [
+                {"width": 32, "height": 32, "size": len(PNG_1X1), "relative_path": ".thumbs/part-32x32.png"},
+                {"width": 300, "height": 300, "size": len(PNG_1X1), "relative_path": ".thumbs/part-300x300.png"},
+            ],
+        }
+
+
+def _select(status: dict, objects) -> dict:
+    if not objects:
+        return status
+    return {name: status[name] for name in objects if name in status}
+
+
+def _changes(previous: dict, current: dict) -> dict:
+    diff = {}
+    for name, fields in current.items():
+        before = previous.get(name, {})
+        changed = {key: value for key, value in fields.items() if before.get(key) != value}
+        if changed:
+            diff[name] = changed
+    return diff
+
+
+def create_app(printer: FakePrinter, latency_ms: float = 0) -> FastAPI:
+    app = FastAPI(title=f"fake-moonraker-{printer.index}")
+
+    async def delay():
+        if latency_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+
+    @app.get("/printer/objects/query")
+    async def query(request: Request):
+        await delay()
+        return {"result": {"eventtime": time.monotonic(), "status": _select(printer.status(), list(request.query_params))}}
+
+    @app.get("/server/files/metadata")
+    async def metadata(filename: str):
+        await delay()
+        return {"result": printer.metadata(filename)}
+
+    @app.get("/server/files/gcodes/{path:path}")
+    async def gcode_file(path: str):
+        await delay()
+        return Response(PNG_1X1, media_type="image/png")
+
+    @app.get("/server/info")
+    async def server_info():
+        return {"result": {"klippy_connected": True, "klippy_state": "ready"}}
+
+    @app.websocket("/websocket")
+    async def websocket(ws: WebSocket):
+        await ws.accept()
+        subscription = None
+        last: dict = {}
+
+        async def push():
+            nonlocal last
+            while True:
+                await asyncio.sleep(NOTIFY_INTERVAL)
+                current = _select(printer.status(), subscription)
+                diff = _changes(last, current)
+                last = current
+                if diff:
+                    await ws.send_text(json.dumps({"jsonrpc": "2.0", "method": "notify_status_update", "params": [diff, time.monotonic()]}))
+
+        pusher = None
+        try:
+            while True:
+                request = json.loads(await ws.receive_text())
+                if request.get("method") == "printer.objects.subscribe":
+                    objects = request.get("params", {}).get("objects") or {}
+                    subscription = list(objects)
+                    last = _select(printer.status(), subscription)
+                    await delay()
+                    await ws.send_text(json.dumps({"jsonrpc": "2.0", "id": request.get("id"), "result": {"eventtime": time.monotonic(), "status": last}}))
+                    if pusher is None:
+                        pusher = asyncio.create_task(push())
+                else:
+                    await ws.send_text(json.dumps({"jsonrpc": "2.0", "id": request.get("id"), "result": "ok"}))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if pusher is not None:
+                pusher.cancel()
+
+    return app
+
+
+async def serve_fleet(count: int, base_port: int, host: str = "127.0.0.1", latency_ms: float = 0, **printer_options):
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_app(FakePrinter(index, **printer_options), latency_ms), host=host, port=base_port + index, log_level="warning"))
+        for index in range(count)
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def start_fleet_in_thread(count: int, base_port: int, **options) -> list[str]:
+    thread = threading.Thread(target=lambda: asyncio.run(serve_fleet(count, base_port, **options)), daemon=True)
+    thread.start()
+    time.sleep(0.5 + count * 0.02)
+    host = options.get("host", "127.0.0.1")
+    return [f"http://{host}:{base_port + index}" for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--base-port", type=int, default=7125)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--print-seconds", type=float, default=600)
+    parser.add_argument("--idle-seconds", type=float, default=30)
+    parser.add_argument("--cancel-every", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Servers run in a daemon thread so Ctrl+C stops the whole fleet at once.
+    urls = start_fleet_in_thread(
+        args.count,
+        args.base_port,
+        host=args.host,
+        latency_ms=args.latency_ms,
+        print_seconds=args.print_seconds,
+        idle_seconds=args.idle_seconds,
+        cancel_every=args.cancel_every,
+    )
+    logger.info("Fake Moonraker em:\n%s", "\n".join(urls))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
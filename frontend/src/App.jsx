@@ -2,6 +2,42 @@ import React, { useEffect, useMemo, useState } from 'react'
 import axios from 'axios'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
+const SOCKET_RETRY_MS = 3000
+
+function sortJobs(jobs) {
+  return [...jobs].sort((a, b) => {
+    if (!a.start_time || !b.start_time) return a.start_time ? -1 : b.start_time ? 1 : 0
+    return b.start_time.localeCompare(a.start_time)
+  })
+}
+
+function applyTimelineEvent(items, event) {
+  switch (event.type) {
+    case 'printer_added':
+      return [...items, { ...event.printer, jobs: [] }].sort((a, b) => a.id - b.id)
+    case 'printer_changed':
+      return items.map((p) => (p.id === event.printer.id ? { ...p, ...event.printer } : p))
+    case 'printer_removed':
+      return items.filter((p) => p.id !== event.printer_id)
+    case 'job_added':
+    case 'job_changed':
+      return items.map((p) => {
+        const jobs = (p.jobs || []).filter((job) => job.id !== event.job.id)
+        if (p.id === event.printer_id) return { ...p, jobs: sortJobs([...jobs, event.job]) }
+        if (p.id === event.previous_printer_id) return { ...p, jobs }
+        return p
+      })
+    case 'job_removed':
+      return items.map((p) => (p.id === event.printer_id ? { ...p, jobs: (p.jobs || []).filter((job) => job.id !== event.job_id) } : p))
+    case 'etas':
+      return items.map((p) => ({
+        ...p,
+        jobs: (p.jobs || []).map((job) => (job.id in event.etas ? { ...job, eta: event.etas[job.id] } : job)),
+      }))
+    default:
+      return items
+  }
+}
 
 function StatusPill({ status }) {
   const lower = (status || '').toLowerCase()
@@ -181,17 +217,44 @@ function App() {
     loadData().catch(console.error)
 
     let socket
-    try {
-      socket = new WebSocket(API_URL.replace('http', 'ws') + '/ws/timeline')
+    let retryId
+    let closed = false
+    let cursor = null
+    let resyncing = false
+
+    const connect = () => {
+      const query = cursor ? `?since=${cursor.seq}&epoch=${cursor.epoch}` : ''
+      try {
+        socket = new WebSocket(API_URL.replace('http', 'ws') + '/ws/timeline' + query)
+      } catch (err) {
+        console.error('Falha ao abrir websocket', err)
+        return
+      }
       socket.onmessage = (event) => {
         const data = JSON.parse(event.data)
-        if (data.items) setTimeline(data.items)
+        if (data.type === 'snapshot') {
+          resyncing = false
+          setTimeline(data.items)
+        } else if (resyncing) {
+          return
+        } else if (cursor && data.epoch === cursor.epoch && data.seq === cursor.seq + 1) {
+          setTimeline((items) => applyTimelineEvent(items, data))
+        } else {
+          resyncing = true
+          socket.send(JSON.stringify({ action: 'snapshot' }))
+          return
+        }
+        cursor = { seq: data.seq, epoch: data.epoch }
+      }
+      socket.onclose = () => {
+        if (!closed) retryId = setTimeout(connect, SOCKET_RETRY_MS)
       }
-    } catch (err) {
-      console.error('Falha ao abrir websocket', err)
     }
+    connect()
 
     return () => {
+      closed = true
+      clearTimeout(retryId)
       if (socket) socket.close()
     }
   }, [token])